@@ -1,15 +1,38 @@
 """
 Camera Controller - Manages camera stream configuration and relay service
+
+Every relay/recorder/systemd command runs through QProcess and reports back
+on the GUI thread via callbacks and signals, so camera operations never
+block QML rendering or touch input.
+
+When cam_supervisor.py is running (its control socket exists) it owns the
+relay and recorder; their start/stop/restart/status then go through its CLI
+instead of cam_delay_relay.sh and systemctl.
 """
 import glob
 import json
-import subprocess
 import os
+import re
+import signal
 import sys
+import time
+from collections import deque
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import (QObject, Property, Signal, Slot, QTimer, QProcess, QProcessEnvironment,
+                            QFileSystemWatcher)
+
+# on_done(exit_code, stdout, stderr); exit_code is -1 if the command failed to start or timed out
+CommandCallback = Callable[[int, str, str], None]
+
+# Delayed segments the delay server must have before the player is told to reload
+RELOAD_MIN_SEGMENTS = 3
 
-from PySide6.QtCore import QObject, Property, Signal, Slot, QTimer
+# Safety-net rescan in case the directory watcher misses an event
+HEALTH_RESCAN_MS = 5000
+
+SEGMENT_RE = re.compile(r"segment_?\d+\.ts$")
 
 
 class CameraController(QObject):
@@ -25,6 +48,8 @@ class CameraController(QObject):
     streamStatusChanged = Signal()
     errorChanged = Signal()
     forceReload = Signal()  # Emitted when video player should reconnect to new stream
+    relayStatusChecked = Signal(bool)  # running
+    commandFinished = Signal(str, bool, str)  # action, ok, message
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -37,6 +62,8 @@ class CameraController(QObject):
         self._config_file = self._app_dir / "config" / "camera.json"
         self._relay_script = self._app_dir / "scripts" / "cam_delay_relay.sh"
         self._record_script = self._app_dir / "scripts" / "cam_record_main.sh"
+        self._supervisor_script = self._app_dir / "scripts" / "cam_supervisor.py"
+        self._supervisor_socket = self._app_dir / "runtime" / "supervisor.sock"
         self._hls_dir = self._app_dir / "runtime" / "hls"
 
         # State
@@ -47,20 +74,42 @@ class CameraController(QObject):
         self._stream_status: str = "disconnected"  # disconnected, connecting, connected, error
         self._error: str = ""
         self._use_vaapi: str = "auto"
+        self._single_ingest: bool = False  # live HLS teed from the recorder's RTSP session
 
         # Camera update lock - prevents status check from overriding during restart
         self._updating_camera: bool = False
 
-        # Cache for playlist check optimization
+        # Stream health: newest segment mtime and recent arrival times (production rate)
         self._last_playlist_mtime: float = 0.0
+        self._arrivals: deque = deque(maxlen=10)
+        self._segment_sec: float = 2.0
+        self._reload_pending: bool = False
+        self._recovered_at: float = 0.0
 
         # Load config
         self._load_config()
 
-        # Status check timer with adaptive interval
+        # Health is driven by changes in the HLS directory; the timers only
+        # fire when segments stop arriving (stall) or the reload is due
+        self._stall_timer = QTimer(self)
+        self._stall_timer.setSingleShot(True)
+        self._stall_timer.timeout.connect(self._check_stream_status)
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.timeout.connect(self._emit_reload)
+
+        self._watcher = QFileSystemWatcher(self)
+        try:
+            self._hls_dir.mkdir(parents=True, exist_ok=True)
+            self._watcher.addPath(str(self._hls_dir))
+        except OSError as e:
+            print(f"[CameraController] Cannot watch {self._hls_dir}: {e}")
+        self._watcher.directoryChanged.connect(self._check_stream_status)
+
         self._status_timer = QTimer(self)
         self._status_timer.timeout.connect(self._check_stream_status)
-        self._status_timer.start(2000)  # Initial 2 seconds
+        self._status_timer.start(HEALTH_RESCAN_MS)
+        QTimer.singleShot(0, self._check_stream_status)
 
         # Startup: restart recording service once after first status check completes
         # This ensures the recording process uses the current camera.json URL,
@@ -82,14 +131,18 @@ class CameraController(QObject):
             return
         if not self._camera_url:
             return
-        if self.checkRelayStatus():
-            # Relay running (likely from systemd with possibly wrong URL)
-            # Restart it with the correct URL from camera.json
-            print(f"[CameraController] Relay running, restarting to sync URL: {self._camera_url}")
-            self.restartRelay()
-        else:
-            print(f"[CameraController] Auto-starting relay for: {self._camera_url}")
-            self.startRelay()
+
+        def _on_status(running: bool):
+            if running:
+                # Relay running (likely from systemd with possibly wrong URL)
+                # Restart it with the correct URL from camera.json
+                print(f"[CameraController] Relay running, restarting to sync URL: {self._camera_url}")
+                self.restartRelay()
+            else:
+                print(f"[CameraController] Auto-starting relay for: {self._camera_url}")
+                self.startRelay()
+
+        self._check_relay(_on_status)
 
     def _startup_restart_recording(self):
         """One-time recording service restart on app startup to sync with camera.json."""
@@ -127,6 +180,7 @@ class CameraController(QObject):
                 self._delay_sec = live.get("delaySec") or legacy.get("delaySec", 7)
                 self._local_port = live.get("hlsPort") or legacy.get("localPort", 8554)
                 self._use_vaapi = hw.get("useVaapi") or legacy.get("useVaapi", "auto")
+                self._single_ingest = bool(live.get("singleIngest", False))
 
                 # Build stream URL
                 delay_port = live.get("delayServerPort") or legacy.get("delayServerPort")
@@ -170,7 +224,9 @@ class CameraController(QObject):
                     "delayServerPort": delay_port,
                     "localStreamUrl": self._stream_url,
                     "segmentSec": existing.get("liveStream", {}).get("segmentSec", 2),
-                    "playlistLen": existing.get("liveStream", {}).get("playlistLen", 10)
+                    "playlistLen": existing.get("liveStream", {}).get("playlistLen", 10),
+                    "maxDelaySec": existing.get("liveStream", {}).get("maxDelaySec", 60),
+                    "singleIngest": self._single_ingest
                 },
                 "recording": recording,
                 "hardware": {
@@ -218,6 +274,7 @@ DELAY_SEC={self._delay_sec}
 LOCAL_PORT={self._local_port}
 SEGMENT_SEC=2
 PLAYLIST_LEN=10
+SINGLE_INGEST={1 if self._single_ingest else 0}
 
 # ==================== RECORDING ====================
 DVR_CAM_URL={recording.get('rtspUrl', '')}
@@ -234,57 +291,212 @@ USE_VAAPI={self._use_vaapi}
         except Exception as e:
             print(f"Warning: Could not update env file: {e}")
 
-    def _check_stream_status(self):
-        """Check if HLS stream is available (with mtime cache optimization)"""
+    def _run(self, argv: List[str], on_done: Optional[CommandCallback] = None,
+             timeout_ms: int = 10000, env: Optional[Dict[str, str]] = None) -> None:
+        """Run a command with QProcess; on_done is called on the GUI thread when it ends"""
+        proc = QProcess(self)
+        if env:
+            penv = QProcessEnvironment.systemEnvironment()
+            for key, value in env.items():
+                penv.insert(key, value)
+            proc.setProcessEnvironment(penv)
+
+        timer = QTimer(proc)
+        timer.setSingleShot(True)
+        state = {"done": False, "timed_out": False}
+
+        def _timeout():
+            state["timed_out"] = True
+            proc.kill()
+
+        def _finish(code: int, error: str = ""):
+            if state["done"]:
+                return
+            state["done"] = True
+            timer.stop()
+            out = bytes(proc.readAllStandardOutput()).decode(errors="replace")
+            err = error or bytes(proc.readAllStandardError()).decode(errors="replace")
+            proc.deleteLater()
+            if on_done:
+                on_done(code, out, err)
+
+        def _on_finished(code, status):
+            if state["timed_out"]:
+                _finish(-1, f"{argv[0]} timed out after {timeout_ms // 1000}s")
+            elif status != QProcess.ExitStatus.NormalExit:
+                _finish(-1, f"{argv[0]} crashed")
+            else:
+                _finish(code)
+
+        def _on_error(error):
+            if error == QProcess.ProcessError.FailedToStart:
+                _finish(-1, f"{argv[0]} failed to start: {proc.errorString()}")
+
+        timer.timeout.connect(_timeout)
+        proc.finished.connect(_on_finished)
+        proc.errorOccurred.connect(_on_error)
+        proc.start(argv[0], argv[1:])
+        timer.start(timeout_ms)
+
+    def _supervised(self) -> bool:
+        """True when cam_supervisor.py owns the relay and recorder"""
+        return self._is_linux and self._supervisor_socket.exists()
+
+    def _supervisor(self, args: List[str], on_done: Callable[[bool, dict], None],
+                    timeout_ms: int = 30000) -> None:
+        """Send one command to cam_supervisor.py; on_done(ok, reply) on the GUI thread.
+
+        Goes through the supervisor CLI (send_command) in a QProcess, since a
+        restart waits for the child to finalize its segment.
+        """
+        def _done(code: int, out: str, err: str):
+            try:
+                reply = json.loads(out) if out.strip() else {}
+            except ValueError:
+                reply = {}
+            if code != 0 and not reply.get("error"):
+                reply["error"] = (err or out).strip() or f"exit {code}"
+            on_done(code == 0 and bool(reply.get("ok")), reply)
+
+        self._run([sys.executable, str(self._supervisor_script), *args], _done, timeout_ms=timeout_ms)
+
+    def _relay(self, action: str, on_done: Optional[CommandCallback] = None,
+               timeout_ms: int = 10000, env: Optional[Dict[str, str]] = None) -> None:
+        """cam_delay_relay.sh start/stop/restart/status, or the same through the supervisor"""
+        if not self._supervised():
+            self._run([str(self._relay_script), action], on_done, timeout_ms=timeout_ms, env=env)
+            return
+        # In single-ingest mode the recorder writes the live segments and the
+        # delay server runs inside the supervisor: there is no relay to manage
+        if self._single_ingest and action != "status":
+            if on_done:
+                on_done(0, "", "")
+            return
+        service = "recorder" if self._single_ingest else "relay"
+
+        def _done(ok: bool, reply: dict):
+            if action == "status":
+                ok = reply.get("services", {}).get(service, {}).get("state") == "running"
+            if on_done:
+                on_done(0 if ok else 1, json.dumps(reply), reply.get("error", ""))
+
+        # The supervisor reads the URL from camera.json/camera.env, saved before every start
+        self._supervisor(["status"] if action == "status" else [action, service], _done)
+
+    def _report(self, action: str, ok: bool, message: str) -> None:
+        print(f"[CameraController] {action}: {message}")
+        self.commandFinished.emit(action, ok, message)
+
+    def _read_playlist(self) -> Optional[Tuple[List[str], float]]:
+        """(segment names, segment duration) of the raw playlist, None if it is missing"""
+        try:
+            content = (self._hls_dir / "playlist.m3u8").read_text()
+        except OSError:
+            return None
+        names, duration = [], self._segment_sec
+        for ln in content.splitlines():
+            ln = ln.strip()
+            if ln.startswith("#EXTINF:"):
+                try:
+                    duration = float(ln[8:].split(",", 1)[0])
+                except ValueError:
+                    pass
+            elif ln.endswith(".ts"):
+                names.append(ln)
+        return names, duration
+
+    def _stall_after(self) -> float:
+        """Seconds without a new segment before the stream counts as stalled.
+
+        Expected interval (median of recent arrivals, or the segment duration)
+        plus one segment duration of slack.
+        """
+        times = list(self._arrivals)
+        gaps = sorted(b - a for a, b in zip(times, times[1:]) if b > a)
+        expected = gaps[len(gaps) // 2] if gaps else self._segment_sec
+        return expected + self._segment_sec
+
+    def _check_stream_status(self, *_):
+        """Re-evaluate stream health from the HLS directory (watcher event, stall or rescan)"""
         # Skip status check while camera is being updated
         if self._updating_camera:
             return
 
-        playlist = self._hls_dir / "playlist.m3u8"
-
         old_status = self._stream_status
+        now = time.time()
+        playlist = self._read_playlist()
 
-        if not playlist.exists():
+        if playlist is None:
             self._stream_status = "disconnected"
             self._last_playlist_mtime = 0.0
+            self._arrivals.clear()
         else:
-            try:
-                current_mtime = playlist.stat().st_mtime
-                # Only read file if mtime changed (saves I/O)
-                if current_mtime != self._last_playlist_mtime:
-                    self._last_playlist_mtime = current_mtime
-                    with open(playlist, 'r') as f:
-                        content = f.read()
-                    # Check if playlist has segments
-                    if ".ts" in content:
-                        self._stream_status = "connected"
-                    else:
-                        self._stream_status = "connecting"
-            except Exception:
-                self._stream_status = "error"
-
-        # Adaptive timer interval: faster when connecting, slower when stable
-        if self._stream_status == "connecting":
-            self._status_timer.setInterval(1000)  # Check every 1s when connecting
-        elif self._stream_status == "connected":
-            self._status_timer.setInterval(5000)  # Check every 5s when connected
-        else:
-            self._status_timer.setInterval(3000)  # Check every 3s when disconnected
+            names, self._segment_sec = playlist
+            newest = 0.0
+            for name in names:
+                try:
+                    newest = max(newest, (self._hls_dir / name).stat().st_mtime)
+                except OSError:
+                    pass
+            if newest > self._last_playlist_mtime:
+                self._last_playlist_mtime = newest
+                self._arrivals.append(newest)
+
+            if not newest:
+                self._stream_status = "connecting"
+            else:
+                stall_after = self._stall_after()
+                age = now - newest
+                if age <= stall_after:
+                    self._stream_status = "connected"
+                    # Re-checked as soon as the next segment is overdue
+                    self._stall_timer.start(int((stall_after - age) * 1000) + 50)
+                else:
+                    if old_status == "connected":
+                        print(f"[CameraController] Stream stalled: newest segment {age:.1f}s old "
+                              f"(expected every {stall_after - self._segment_sec:.1f}s)")
+                    self._stream_status = "connecting"
 
         if old_status != self._stream_status:
             print(f"[CameraController] Stream status: {old_status} -> {self._stream_status}")
             self.streamStatusChanged.emit()
 
-            # Force video player reload when stream comes back after camera update
+            # Force video player reload when stream comes back after camera update or a stall
             if old_status == "connecting" and self._stream_status == "connected":
                 print("[CameraController] Stream recovered, waiting for delay server to buffer...")
+                self._reload_pending = True
+                self._recovered_at = self._last_playlist_mtime
+            elif self._stream_status != "connected":
+                self._reload_pending = False
+                self._reload_timer.stop()
+
+        if self._reload_pending:
+            self._schedule_reload(now)
+
+    def _schedule_reload(self, now: float):
+        """Arm the reload for when RELOAD_MIN_SEGMENTS recovered segments are past the delay"""
+        mtimes = []
+        try:
+            files = [f for f in self._hls_dir.iterdir() if SEGMENT_RE.search(f.name)]
+        except OSError:
+            return
+        for f in files:
+            try:
+                mtime = f.stat().st_mtime
+            except OSError:
+                continue
+            if mtime >= self._recovered_at:
+                mtimes.append(mtime)
+        if len(mtimes) < RELOAD_MIN_SEGMENTS:
+            return
+        mtimes.sort()
+        due = mtimes[RELOAD_MIN_SEGMENTS - 1] + self._delay_sec
+        self._reload_pending = False
+        self._reload_timer.start(max(0, int((due - now) * 1000)))
 
-                def _emit_reload():
-                    print("[CameraController] Emitting forceReload signal to video player")
-                    self.forceReload.emit()
-
-                # Wait 8s for HLS delay server to buffer enough segments (7s delay)
-                QTimer.singleShot(8000, _emit_reload)
+    def _emit_reload(self):
+        print("[CameraController] Emitting forceReload signal to video player")
+        self.forceReload.emit()
 
     # -------------------------------------------------------------------------
     # Properties for QML
@@ -344,61 +556,69 @@ USE_VAAPI={self._use_vaapi}
             print("[CameraController] startRelay: skipped (not Linux)")
             return
         self._save_config()
-        try:
-            env = os.environ.copy()
-            env["CAM_URL"] = self._camera_url
-            env["DELAY_SEC"] = str(self._delay_sec)
-            env["LOCAL_PORT"] = str(self._local_port)
-
-            subprocess.run(
-                [str(self._relay_script), "start"],
-                env=env,
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            self._stream_status = "connecting"
-            self.streamStatusChanged.emit()
-            self._error = ""
-            self.errorChanged.emit()
-
-        except subprocess.CalledProcessError as e:
-            self._error = f"Failed to start relay: {e.stderr}"
-            self._stream_status = "error"
+        env = {
+            "CAM_URL": self._camera_url,
+            "DELAY_SEC": str(self._delay_sec),
+            "LOCAL_PORT": str(self._local_port),
+        }
+
+        def _done(code: int, out: str, err: str):
+            if code == 0:
+                self._stream_status = "connecting"
+                self._error = ""
+            else:
+                self._error = f"Failed to start relay: {err or out}"
+                self._stream_status = "error"
             self.errorChanged.emit()
             self.streamStatusChanged.emit()
+            self.commandFinished.emit("startRelay", code == 0, self._error or "Relay started")
+
+        # The script waits on codec detection (up to ~20s) before it returns
+        self._relay("start", _done, timeout_ms=30000, env=env)
 
     @Slot()
     def stopRelay(self):
         """Stop the camera delay relay service"""
+        self._stop_relay()
+
+    def _stop_relay(self, then: Optional[Callable[[], None]] = None):
         if not self._is_linux:
             print("[CameraController] stopRelay: skipped (not Linux)")
             return
-        try:
-            subprocess.run(
-                [str(self._relay_script), "stop"],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            self._stream_status = "disconnected"
-            self.streamStatusChanged.emit()
 
-        except subprocess.CalledProcessError as e:
-            self._error = f"Failed to stop relay: {e.stderr}"
-            self.errorChanged.emit()
+        def _done(code: int, out: str, err: str):
+            if code == 0:
+                self._stream_status = "disconnected"
+                self.streamStatusChanged.emit()
+            else:
+                self._error = f"Failed to stop relay: {err or out}"
+                self.errorChanged.emit()
+            self.commandFinished.emit("stopRelay", code == 0, self._error if code else "Relay stopped")
+            if then:
+                then()
+
+        self._relay("stop", _done)
 
     @Slot()
     def restartRelay(self):
         """Restart the relay with new settings"""
-        self.stopRelay()
-        QTimer.singleShot(1000, self.startRelay)
+        if self._supervised():
+            self._save_config()
+            self._relay("restart", lambda code, out, err: self._report(
+                "restartRelay", code == 0, "Relay restarted" if code == 0 else f"Failed to restart relay: {err}"))
+            return
+        self._stop_relay(then=lambda: QTimer.singleShot(1000, self.startRelay))
 
     @Slot(int)
     def setDelay(self, seconds: int):
         """Set delay and restart relay"""
         self.delaySec = seconds
         self._save_config()
+        if self._supervised():
+            # The delay server in the supervisor switches without a relay restart
+            self._supervisor(["delay", str(self._delay_sec)], lambda ok, reply: self._report(
+                "setDelay", ok, f"Delay set to {self._delay_sec}s" if ok else reply.get("error", "")))
+            return
         self.restartRelay()
 
     @Slot(str)
@@ -413,92 +633,74 @@ USE_VAAPI={self._use_vaapi}
         """Save current configuration"""
         self._save_config()
 
-    @Slot(result=bool)
-    def checkRelayStatus(self) -> bool:
-        """Check if relay is running"""
+    @Slot()
+    def checkRelayStatus(self):
+        """Check if relay is running; the answer arrives via relayStatusChecked"""
+        self._check_relay(self.relayStatusChecked.emit)
+
+    def _check_relay(self, callback: Callable[[bool], None]):
         if not self._is_linux:
-            return False
-        try:
-            result = subprocess.run(
-                [str(self._relay_script), "status"],
-                capture_output=True,
-                text=True
-            )
-            return result.returncode == 0
-        except Exception:
-            return False
+            callback(False)
+            return
+        self._relay("status", lambda code, out, err: callback(code == 0))
 
-    @Slot(result=str)
-    def restartRecordService(self) -> str:
-        """Restart the recording service - returns status message"""
+    @Slot()
+    def restartRecordService(self):
+        """Restart the recording service; the outcome arrives via commandFinished"""
         if not self._is_linux:
-            return "Recording service not available (not Linux)"
-        try:
-            restart_script = self._app_dir / "scripts" / "restart_services.sh"
-            
-            # Try without sudo
-            result = subprocess.run(
-                [str(restart_script), "record"],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-
-            if result.returncode == 0:
-                print("[CameraController] Recording service restarted successfully.")
-                return "Recording service restarted"
+            self._report("restartRecordService", False, "Recording service not available (not Linux)")
+            return
+        if self._supervised():
+            self._supervisor(["restart", "recorder"], lambda ok, reply: self._report(
+                "restartRecordService", ok,
+                "Recording service restarted" if ok else f"Supervisor: {reply.get('error', '')}"))
+            return
+        restart_script = str(self._app_dir / "scripts" / "restart_services.sh")
 
+        def _with_sudo(code: int, out: str, err: str):
+            if code == 0:
+                self._report("restartRecordService", True, "Recording service restarted")
+                return
             # Try with sudo (non-interactive)
-            result = subprocess.run(
-                ["sudo", "-n", str(restart_script), "record"],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-
-            if result.returncode == 0:
-                print("[CameraController] Recording service restarted via sudo.")
-                return "Recording service restarted"
-                
-            msg = "Run manually: sudo systemctl restart cam-record.service"
-            print(f"[CameraController] {msg}")
-            return msg
+            self._run(["sudo", "-n", restart_script, "record"], _done, timeout_ms=15000)
 
-        except Exception as e:
-            msg = f"Restart failed: {e}. Run: sudo systemctl restart cam-record.service"
-            print(msg)
-            return msg
+        def _done(code: int, out: str, err: str):
+            if code == 0:
+                self._report("restartRecordService", True, "Recording service restarted via sudo")
+            else:
+                self._report("restartRecordService", False,
+                             "Run manually: sudo systemctl restart cam-record.service")
+
+        # Try without sudo first
+        self._run([restart_script, "record"], _with_sudo, timeout_ms=15000)
 
-    @Slot(result=str)
-    def stopRecordService(self) -> str:
+    @Slot()
+    def stopRecordService(self):
         """Stop the recording service"""
         if not self._is_linux:
-            return "Recording service not available (not Linux)"
-        try:
-            # Try to stop systemd service if active
-            result = subprocess.run(
-                ["systemctl", "is-active", "--quiet", "cam-record"],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                subprocess.run(
-                    ["sudo", "-n", "systemctl", "stop", "cam-record"],
-                    capture_output=True, text=True, timeout=15
-                )
-                print("[CameraController] Recording service stopped via systemctl.")
-                return "Recording service stopped"
-                
-            # Fallback: kill process directly
-            subprocess.run(["pkill", "-f", "cam_record_main"], check=False)
-            print("[CameraController] Recording process killed.")
-            return "Recording killed."
-        except Exception as e:
-            msg = f"Stop failed: {e}"
-            print(f"[CameraController] {msg}")
-            return msg
+            self._report("stopRecordService", False, "Recording service not available (not Linux)")
+            return
+        if self._supervised():
+            self._supervisor(["stop", "recorder"], lambda ok, reply: self._report(
+                "stopRecordService", ok,
+                "Recording service stopped" if ok else f"Supervisor: {reply.get('error', '')}"))
+            return
+
+        def _on_active(code: int, out: str, err: str):
+            if code == 0:
+                self._run(["sudo", "-n", "systemctl", "stop", "cam-record"],
+                          lambda *_: self._report("stopRecordService", True,
+                                                  "Recording service stopped via systemctl"),
+                          timeout_ms=15000)
+            else:
+                # Fallback: kill process directly
+                self._run(["pkill", "-f", "cam_record_main"],
+                          lambda *_: self._report("stopRecordService", True, "Recording process killed"))
+
+        self._run(["systemctl", "is-active", "--quiet", "cam-record"], _on_active, timeout_ms=5000)
 
-    @Slot(result=str)
-    def gracefulRestartRecording(self) -> str:
+    @Slot()
+    def gracefulRestartRecording(self):
         """
         Gracefully restart recording: send SIGINT to GStreamer process so it
         finalizes the current MP4 segment (via EOS from -e flag), then the
@@ -509,21 +711,15 @@ USE_VAAPI={self._use_vaapi}
         The recording loop script will then restart and pick up the new URL.
         """
         if not self._is_linux:
-            return "Recording not available (not Linux)"
-        import signal
-        import threading
+            self._report("gracefulRestartRecording", False, "Recording not available (not Linux)")
+            return
 
-        try:
-            # Find ONLY the gst-launch-1.0 processes (not timeout wrappers)
-            result = subprocess.run(
-                ["pgrep", "-x", "-f", "gst-launch-1.0 -e.*splitmuxsink"],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode != 0 or not result.stdout.strip():
+        def _on_pids(code: int, out: str, err: str):
+            pids = [int(p) for p in out.split() if p.strip().isdigit()]
+            if code != 0 or not pids:
                 print("[CameraController] No GStreamer recording process found, doing full restart...")
-                return self.restartRecordService()
-
-            pids = [int(p.strip()) for p in result.stdout.strip().split('\n') if p.strip()]
+                self.restartRecordService()
+                return
             print(f"[CameraController] Found {len(pids)} GStreamer recording process(es): {pids}")
 
             # Send SIGINT to each GStreamer process
@@ -533,80 +729,84 @@ USE_VAAPI={self._use_vaapi}
                     print(f"[CameraController] SIGINT sent to PID {pid}")
                 except ProcessLookupError:
                     print(f"[CameraController] PID {pid} already gone")
+            self._watch_recorder_exit(pids, 10)
+            self._report("gracefulRestartRecording", True, "Graceful restart initiated")
 
-            # Watchdog: if GStreamer doesn't exit in 10s, force kill
-            def _watchdog(target_pids):
-                import time
-                for i in range(10):
-                    time.sleep(1)
-                    alive = []
-                    for pid in target_pids:
-                        try:
-                            os.kill(pid, 0)  # Check if alive
-                            alive.append(pid)
-                        except ProcessLookupError:
-                            pass
-                    if not alive:
-                        print(f"[CameraController] All GStreamer processes exited after {i+1}s")
-                        return
-                # Still alive after 10s — force kill
-                for pid in alive:
-                    try:
-                        print(f"[CameraController] GStreamer PID {pid} stuck after 10s, force killing...")
-                        os.kill(pid, signal.SIGKILL)
-                    except ProcessLookupError:
-                        pass
-
-            t = threading.Thread(target=_watchdog, args=(pids,), daemon=True)
-            t.start()
-
-            print("[CameraController] Graceful restart initiated (10s timeout watchdog active)")
-            return "Graceful restart initiated"
+        # Find ONLY the gst-launch-1.0 processes (not timeout wrappers)
+        self._run(["pgrep", "-x", "-f", "gst-launch-1.0 -e.*splitmuxsink"], _on_pids, timeout_ms=5000)
 
-        except Exception as e:
-            msg = f"Graceful restart failed: {e}, falling back to hard restart"
-            print(f"[CameraController] {msg}")
-            return self.restartRecordService()
+    def _watch_recorder_exit(self, pids: List[int], seconds_left: int):
+        """Watchdog: check once a second, force kill GStreamer still alive after the timeout"""
+        alive = []
+        for pid in pids:
+            try:
+                os.kill(pid, 0)  # Check if alive
+                alive.append(pid)
+            except ProcessLookupError:
+                pass
+        if not alive:
+            print("[CameraController] All GStreamer processes exited")
+            return
+        if seconds_left > 0:
+            QTimer.singleShot(1000, lambda: self._watch_recorder_exit(alive, seconds_left - 1))
+            return
+        for pid in alive:
+            try:
+                print(f"[CameraController] GStreamer PID {pid} stuck after 10s, force killing...")
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
 
-    @Slot(result=str)
-    def applyConfigChanges(self) -> str:
-        """Save config and restart all camera services"""
+    @Slot()
+    def applyConfigChanges(self):
+        """Save config and restart all camera services; the outcome arrives via commandFinished"""
         self._save_config()
+        restart_script = str(self._app_dir / "scripts" / "restart_services.sh")
+        if self._supervised():
+            self._apply_supervised()
+            return
 
-        restart_script = self._app_dir / "scripts" / "restart_services.sh"
-        try:
-            # Try without sudo first
-            result = subprocess.run(
-                [str(restart_script), "all"],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            if result.returncode == 0:
-                self._stream_status = "connecting"
-                self.streamStatusChanged.emit()
-                return "OK"
-
-            # Try with sudo
-            result = subprocess.run(
-                ["sudo", str(restart_script), "all"],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+        def _ok():
+            self._stream_status = "connecting"
+            self.streamStatusChanged.emit()
+            self._report("applyConfigChanges", True, "OK")
+
+        def _with_sudo(code: int, out: str, err: str):
+            if code == 0:
+                _ok()
+            elif "timed out" in err:
+                self._report("applyConfigChanges", False,
+                             "Timeout. Run: sudo systemctl restart cam-delay cam-record")
+            else:
+                # Try with sudo
+                self._run(["sudo", "-n", restart_script, "all"], _done, timeout_ms=30000)
 
-            if result.returncode == 0:
+        def _done(code: int, out: str, err: str):
+            if code == 0:
+                _ok()
+            else:
+                self._report("applyConfigChanges", False, f"Run: sudo {restart_script} all")
+
+        # Try without sudo first
+        self._run([restart_script, "all"], _with_sudo, timeout_ms=30000)
+
+    def _apply_supervised(self):
+        """applyConfigChanges under the supervisor: new delay, then restart recorder and relay"""
+        steps = [["delay", str(self._delay_sec)], ["restart", "recorder"]]
+        if not self._single_ingest:
+            steps.append(["restart", "relay"])
+
+        def _next(ok: bool = True, reply: Optional[dict] = None):
+            if not ok:
+                self._report("applyConfigChanges", False, f"Supervisor: {(reply or {}).get('error', '')}")
+            elif steps:
+                self._supervisor(steps.pop(0), _next)
+            else:
                 self._stream_status = "connecting"
                 self.streamStatusChanged.emit()
-                return "OK"
+                self._report("applyConfigChanges", True, "OK")
 
-            return f"Run: sudo {restart_script} all"
-
-        except subprocess.TimeoutExpired:
-            return "Timeout. Run: sudo systemctl restart cam-delay cam-record"
-        except Exception as e:
-            return f"Error: {e}"
+        _next()
 
     @Slot(str)
     def setRecordingUrl(self, url: str):
@@ -647,7 +847,7 @@ USE_VAAPI={self._use_vaapi}
         Update camera URLs from backend server.
         Called when DeviceActivationService receives camera URLs from /device/status or /device/verify.
         Only restarts services if URLs actually changed.
-        Non-blocking: uses QTimer for delayed start after stop.
+        Non-blocking: relay stop/start run through QProcess, chained by callbacks and QTimer.
         """
         main_stream = (main_stream or "").strip()
         sub_stream = (sub_stream or "").strip()
@@ -730,31 +930,29 @@ USE_VAAPI={self._use_vaapi}
             print("[CameraController] Main stream cleared - stopping recording service...")
             QTimer.singleShot(500, self.stopRecordService)
 
-        # If sub stream didn't change, we're done here
-        if not sub_changed:
+        # If sub stream didn't change, we're done here. In single-ingest mode the
+        # live picture comes from the recorder, so the sub stream is unused.
+        if not sub_changed or self._single_ingest:
             return
 
         # If sub stream URL was cleared, just stop relay and go to disconnected
         if not sub_stream:
             print("[CameraController] Camera URL cleared, stopping relay...")
-            relay_script = str(self._relay_script)
-            try:
-                subprocess.run([relay_script, "stop"], capture_output=True, text=True, timeout=10)
-                print("[CameraController] Relay stopped")
-            except Exception as e:
-                print(f"[CameraController] Relay stop error: {e}")
-
-            # Clean HLS segments
-            try:
-                hls_dir = str(self._hls_dir)
-                for f in glob.glob(os.path.join(hls_dir, "segment*.ts")):
-                    os.remove(f)
-                playlist = self._hls_dir / "playlist.m3u8"
-                if playlist.exists():
-                    os.remove(str(playlist))
-                print("[CameraController] HLS segments cleaned")
-            except Exception as e:
-                print(f"[CameraController] HLS cleanup: {e}")
+            # Clean HLS segments once the relay has stopped writing them
+            def _on_stopped(code: int, out: str, err: str):
+                print(f"[CameraController] Relay stopped (exit {code})")
+                try:
+                    hls_dir = str(self._hls_dir)
+                    for f in glob.glob(os.path.join(hls_dir, "segment*.ts")):
+                        os.remove(f)
+                    playlist = self._hls_dir / "playlist.m3u8"
+                    if playlist.exists():
+                        os.remove(str(playlist))
+                    print("[CameraController] HLS segments cleaned")
+                except Exception as e:
+                    print(f"[CameraController] HLS cleanup: {e}")
+
+            self._relay("stop", _on_stopped)
 
             # Clear stream URL and set disconnected
             self._stream_url = ""
@@ -776,55 +974,45 @@ USE_VAAPI={self._use_vaapi}
         self._updating_camera = True
         self._stream_status = "connecting"
         self._last_playlist_mtime = 0.0
-        self._status_timer.setInterval(1000)
+        self._arrivals.clear()
         self.streamStatusChanged.emit()
         print("[CameraController] >>> Status locked to 'connecting', starting restart...")
 
-        relay_script = str(self._relay_script)
-
-        # Step 1: Stop relay (blocking - wait for it to finish)
-        try:
-            result = subprocess.run(
-                [relay_script, "stop"],
-                capture_output=True, text=True, timeout=10
-            )
-            print(f"[CameraController] Relay stopped")
-        except Exception as e:
-            print(f"[CameraController] Relay stop error: {e}")
-
         # Step 2: Clean old HLS segments so status check won't see stale data
-        try:
-            hls_dir = str(self._hls_dir)
-            for f in glob.glob(os.path.join(hls_dir, "segment*.ts")):
-                os.remove(f)
-            playlist = self._hls_dir / "playlist.m3u8"
-            if playlist.exists():
-                with open(playlist, 'w') as f:
-                    f.write("#EXTM3U\n#EXT-X-VERSION:3\n")
-            print("[CameraController] Old HLS segments cleaned")
-        except Exception as e:
-            print(f"[CameraController] HLS cleanup: {e}")
+        def _clean_hls():
+            try:
+                hls_dir = str(self._hls_dir)
+                for f in glob.glob(os.path.join(hls_dir, "segment*.ts")):
+                    os.remove(f)
+                playlist = self._hls_dir / "playlist.m3u8"
+                if playlist.exists():
+                    with open(playlist, 'w') as f:
+                        f.write("#EXTM3U\n#EXT-X-VERSION:3\n")
+                print("[CameraController] Old HLS segments cleaned")
+            except Exception as e:
+                print(f"[CameraController] HLS cleanup: {e}")
 
         # Step 3: Start relay after 3 seconds, then unlock status check
         def _delayed_start():
-            try:
-                env = {**os.environ, "CAM_URL": self._camera_url, "DELAY_SEC": str(self._delay_sec)}
-                subprocess.Popen(
-                    [relay_script, "start"],
-                    env=env,
-                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
-                    start_new_session=True
-                )
-                print("[CameraController] Relay start initiated")
-            except Exception as e:
-                print(f"[CameraController] Relay start error: {e}")
+            env = {"CAM_URL": self._camera_url, "DELAY_SEC": str(self._delay_sec)}
+            self._relay("start",
+                        lambda code, out, err: print(f"[CameraController] Relay start finished (exit {code})"),
+                        timeout_ms=30000, env=env)
+            print("[CameraController] Relay start initiated")
 
             # Unlock status check after another 5s (give relay time to produce segments)
             def _unlock_status():
                 self._updating_camera = False
                 self._last_playlist_mtime = 0.0
                 print("[CameraController] >>> Status check unlocked, will detect new stream")
+                self._check_stream_status()
 
             QTimer.singleShot(5000, _unlock_status)
 
-        QTimer.singleShot(3000, _delayed_start)
+        # Step 1: Stop relay, then clean up and schedule the start
+        def _on_stopped(code: int, out: str, err: str):
+            print(f"[CameraController] Relay stopped (exit {code})")
+            _clean_hls()
+            QTimer.singleShot(3000, _delayed_start)
+
+        self._relay("stop", _on_stopped)
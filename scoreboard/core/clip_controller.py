@@ -122,6 +122,24 @@ class ClipController(QObject):
         encoded = quote(target_url, safe="")
         return f"{self.serverUrl}/qr?url={encoded}"
 
+    @Slot(str, int, result=str)
+    def getSizedQrUrl(self, target_url: str, size: int) -> str:
+        """
+        Generate URL to get a QR code image rendered for a given pixel size.
+
+        The server caches each (url, size) rendering and answers with a strong
+        ETag, so QML can keep the image in its cache.
+
+        Args:
+            target_url: The URL to encode in the QR code
+            size: Approximate image width/height in pixels
+
+        Returns:
+            URL to fetch the QR code image
+        """
+        encoded = quote(target_url, safe="")
+        return f"{self.serverUrl}/qr?url={encoded}&size={int(size)}"
+
     @Slot(str, str, str, result=str)
     def getClipQrUrl(self, cam: str, start_iso: str, end_iso: str) -> str:
         """
@@ -0,0 +1,191 @@
+"""
+DVR Catalog - one SQLite index of every recorded segment
+
+Replaces probing per-hour index.jsonl files: a single table covers all hours
+and cameras, with an index on start time for point lookups, coverage and gap
+queries. The database lives in the recordings root (catalog.sqlite3) in WAL
+mode, so the indexer can write while the resolver, clip server and pruning
+read. The per-hour index.jsonl files are still written as a fallback for
+tools that predate the catalog.
+"""
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CATALOG_FILE = "catalog.sqlite3"
+DEFAULT_CAM = "1"
+
+# Upper bound on a segment's duration, lets overlap queries stay on the start index
+MAX_SEG_SEC = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    path    TEXT PRIMARY KEY,   -- relative to the recordings root: YYYY-MM-DD/HH/seg_xxxxx.mp4
+    hour    TEXT NOT NULL,      -- YYYY-MM-DD/HH
+    start   INTEGER NOT NULL,   -- epoch seconds
+    seg_sec INTEGER NOT NULL,
+    cam     TEXT NOT NULL DEFAULT '1'
+);
+CREATE INDEX IF NOT EXISTS idx_segments_start ON segments(cam, start);
+CREATE INDEX IF NOT EXISTS idx_segments_hour ON segments(hour);
+"""
+
+
+@dataclass
+class CatalogSegment:
+    path: str
+    start: int
+    seg_sec: int
+    cam: str
+
+    @property
+    def end(self) -> int:
+        return self.start + self.seg_sec
+
+
+class DVRCatalog:
+    """Thread-safe wrapper around the segment catalog database"""
+
+    def __init__(self, recordings_dir: str, cam: str = DEFAULT_CAM):
+        self.root = Path(recordings_dir)
+        self.db_path = self.root / CATALOG_FILE
+        self.cam = cam
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def open_if_exists(cls, recordings_dir: str, cam: str = DEFAULT_CAM) -> Optional["DVRCatalog"]:
+        """Open the catalog for reading, or None if the indexer has not created it yet"""
+        if not (Path(recordings_dir) / CATALOG_FILE).exists():
+            return None
+        try:
+            return cls(recordings_dir, cam)
+        except sqlite3.Error:
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ── writes ───────────────────────────────────────────────
+
+    def add_segments(self, hour: str, rows: Iterable[Tuple[str, int, int]]) -> None:
+        """Atomically add (file, start, seg_sec) rows for one hour directory"""
+        data = [(f"{hour}/{fn}", hour, int(start), int(seg_sec), self.cam) for fn, start, seg_sec in rows]
+        if not data:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments(path, hour, start, seg_sec, cam) VALUES (?, ?, ?, ?, ?)",
+                data,
+            )
+
+    def replace_hour(self, hour: str, rows: Iterable[Tuple[str, int, int]]) -> None:
+        """Atomically replace every row of one hour directory"""
+        data = [(f"{hour}/{fn}", hour, int(start), int(seg_sec), self.cam) for fn, start, seg_sec in rows]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM segments WHERE hour = ?", (hour,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments(path, hour, start, seg_sec, cam) VALUES (?, ?, ?, ?, ?)",
+                data,
+            )
+
+    def remove_hour(self, hour: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM segments WHERE hour = ?", (hour,))
+
+    def remove_missing_hours(self) -> List[str]:
+        """Drop rows of hour directories that no longer exist on disk"""
+        gone = [h for h in self.hours() if not (self.root / h).exists()]
+        for hour in gone:
+            self.remove_hour(hour)
+        return gone
+
+    def import_index_file(self, index_file: Path, default_seg_sec: int) -> int:
+        """Load a legacy per-hour index.jsonl into the catalog, returns rows imported"""
+        hour = f"{index_file.parent.parent.name}/{index_file.parent.name}"
+        rows = []
+        try:
+            with index_file.open("r", encoding="utf-8") as f:
+                for ln in f:
+                    ln = ln.strip()
+                    if not ln:
+                        continue
+                    try:
+                        obj = json.loads(ln)
+                        fn = str(obj.get("file") or "")
+                        start = int(obj.get("start"))
+                        if fn and start:
+                            rows.append((fn, start, int(obj.get("segSec") or default_seg_sec)))
+                    except Exception:
+                        continue
+        except Exception:
+            return 0
+        self.add_segments(hour, rows)
+        return len(rows)
+
+    # ── reads ────────────────────────────────────────────────
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM segments LIMIT 1").fetchone() is None
+
+    def hours(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT hour FROM segments ORDER BY hour")]
+
+    def files_in_hour(self, hour: str) -> Dict[str, int]:
+        """{file name: start} of one hour directory"""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, start FROM segments WHERE hour = ?", (hour,)).fetchall()
+        return {path.rsplit("/", 1)[-1]: start for path, start in rows}
+
+    def find_at(self, epoch: int) -> Optional[CatalogSegment]:
+        """Last segment starting at or before epoch (it may have ended already)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, start, seg_sec, cam FROM segments WHERE cam = ? AND start <= ? "
+                "ORDER BY start DESC LIMIT 1",
+                (self.cam, int(epoch)),
+            ).fetchone()
+        return CatalogSegment(*row) if row else None
+
+    def between(self, t0: int, t1: int) -> List[CatalogSegment]:
+        """Segments overlapping [t0, t1), ordered by start"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, start, seg_sec, cam FROM segments "
+                "WHERE cam = ? AND start > ? AND start < ? AND start + seg_sec > ? ORDER BY start",
+                (self.cam, int(t0) - MAX_SEG_SEC, int(t1), int(t0)),
+            ).fetchall()
+        return [CatalogSegment(*r) for r in rows]
+
+    def coverage(self, t0: int, t1: int, tolerance: int = 1) -> List[Tuple[int, int]]:
+        """Merged recorded intervals inside [t0, t1); holes up to `tolerance` seconds are bridged"""
+        out: List[Tuple[int, int]] = []
+        for seg in self.between(t0, t1):
+            a, b = max(t0, seg.start), min(t1, seg.end)
+            if out and a - out[-1][1] <= tolerance:
+                out[-1] = (out[-1][0], max(out[-1][1], b))
+            else:
+                out.append((a, b))
+        return out
+
+    def gaps(self, t0: int, t1: int, tolerance: int = 1) -> List[Tuple[int, int]]:
+        """Unrecorded intervals inside [t0, t1), the complement of coverage()"""
+        out: List[Tuple[int, int]] = []
+        cursor = t0
+        for a, b in self.coverage(t0, t1, tolerance):
+            if a - cursor > tolerance:
+                out.append((cursor, a))
+            cursor = max(cursor, b)
+        if t1 - cursor > tolerance:
+            out.append((cursor, t1))
+        return out
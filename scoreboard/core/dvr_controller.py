@@ -1,12 +1,17 @@
 import json
+import threading
+from datetime import datetime
 from pathlib import Path
 
-from PySide6.QtCore import QObject, Slot
+from PySide6.QtCore import QObject, Signal, Slot
 
 from core.dvr_resolver import DVRResolver
 
 
 class DVRController(QObject):
+    # Result of requestCoverage(), delivered on the GUI thread
+    coverageReady = Signal("QVariant")
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -20,6 +25,9 @@ class DVRController(QObject):
         self._load_config()
         self._resolver = DVRResolver(recordings_dir=self._recordings_dir, seg_sec=self._seg_sec)
 
+        self._coverage_lock = threading.Lock()
+        self._coverage_request = None  # latest (start_iso, end_iso) while a worker runs
+
     def _load_config(self):
         try:
             if self._config_file.exists():
@@ -59,3 +67,48 @@ class DVRController(QObject):
             }
         except Exception as e:
             return {"ok": False, "error": str(e)}
+
+    @Slot(str, str)
+    def requestCoverage(self, start_iso: str, end_iso: str):
+        """Compute recorded intervals and gaps of a window on a worker thread.
+
+        Without the catalog this walks the hour indexes and checks every
+        segment file of the window (hours of segments), so it must not run on
+        the GUI thread. The result arrives through coverageReady. Requests made
+        while one is running replace each other; only the latest is answered.
+        """
+        with self._coverage_lock:
+            running = self._coverage_request is not None
+            self._coverage_request = (start_iso, end_iso)
+        if not running:
+            threading.Thread(target=self._coverage_worker, name="dvr-coverage", daemon=True).start()
+
+    def _coverage_worker(self):
+        while True:
+            with self._coverage_lock:
+                request = self._coverage_request
+            result = self._coverage(*request)
+            with self._coverage_lock:
+                if self._coverage_request == request:
+                    self._coverage_request = None
+                    break
+        self.coverageReady.emit(result)
+
+    def _coverage(self, start_iso: str, end_iso: str):
+        """Recorded intervals and gaps of a window, for drawing the replay timeline.
+
+        Offsets are seconds from start_iso (startMs, in epoch ms):
+          { ok: true, startMs, recorded: [{ startSec, endSec }], gaps: [{ startSec, endSec }] }
+        or { ok: false, error }
+        """
+        try:
+            recorded, gaps = self._resolver.coverage(start_iso, end_iso)
+            base = int(datetime.fromisoformat(start_iso.strip().replace(" ", "T")).timestamp())
+            return {
+                "ok": True,
+                "startMs": base * 1000,
+                "recorded": [{"startSec": a - base, "endSec": b - base} for a, b in recorded],
+                "gaps": [{"startSec": a - base, "endSec": b - base} for a, b in gaps],
+            }
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
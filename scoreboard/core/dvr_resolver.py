@@ -1,9 +1,17 @@
 import json
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 
+from core.dvr_catalog import DVRCatalog
+
 
 @dataclass
 class ResolveResult:
@@ -21,13 +29,140 @@ class IndexEntry:
     seg_sec: int
 
 
+@dataclass
+class RangeSegment:
+    file_path: str
+    start: int          # segment start, epoch seconds
+    seg_sec: int
+    in_offset_ms: int   # where the requested range starts inside this segment
+    out_offset_ms: int  # where the requested range ends inside this segment
+
+
+@dataclass
+class RangeResult:
+    segments: List[RangeSegment]
+    gaps: List[Tuple[int, int]]  # uncovered (start, end) epoch intervals inside the range
+
+
+# Holes shorter than this between consecutive segments are estimation jitter, not gaps
+GAP_TOLERANCE_SEC = 1
+
+# Hour indexes kept in memory; older ones are re-read on demand
+INDEX_CACHE_HOURS = 48
+
+
+class HourIndex:
+    """Compact, incrementally tailed view of one hour's index.jsonl.
+
+    Start times and durations live in typed arrays searched with bisect and
+    file names are interned, so a full hour of segments costs a few KB
+    instead of hundreds of IndexEntry objects. refresh() parses only the bytes
+    appended since the last read; a shrunk or replaced file is reloaded.
+
+    The arrays are never modified once published: refresh() builds new ones
+    and swaps them in as a single (starts, seg_secs, files) tuple, so a reader
+    holding snapshot() keeps a consistent view while another thread refreshes.
+    """
+
+    __slots__ = ("path", "_data", "_offset", "_ino")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data: Tuple[array, array, Tuple[str, ...]] = (array("q"), array("l"), ())
+        self._offset = 0
+        self._ino = None
+
+    def __len__(self) -> int:
+        return len(self._data[0])
+
+    def snapshot(self) -> Tuple[array, array, Tuple[str, ...]]:
+        """Current (starts, seg_secs, files), safe to read without the cache lock"""
+        return self._data
+
+    def refresh(self, default_seg_sec: int) -> bool:
+        """Pick up appended lines, returns False when the index file is gone"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+
+        if st.st_ino != self._ino or st.st_size < self._offset:
+            # Rewritten (e.g. by a reindex): start over
+            self._data = (array("q"), array("l"), ())
+            self._offset = 0
+            self._ino = st.st_ino
+        if st.st_size == self._offset:
+            return True
+
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return False
+
+        # Only consume complete lines; a line being written is picked up next time
+        end = data.rfind(b"\n")
+        if end < 0:
+            return True
+        self._offset += end + 1
+
+        old_starts, old_secs, old_files = self._data
+        starts, seg_secs, files = array("q", old_starts), array("l", old_secs), list(old_files)
+        for ln in data[:end].splitlines():
+            ln = ln.strip()
+            if not ln:
+                continue
+            try:
+                obj = json.loads(ln)
+                file = str(obj.get("file") or "")
+                start = int(obj.get("start"))
+                seg_sec = int(obj.get("segSec") or default_seg_sec)
+            except Exception:
+                continue
+            if file and start:
+                self._add(starts, seg_secs, files, file, start, seg_sec)
+        self._data = (starts, seg_secs, tuple(files))
+        return True
+
+    @staticmethod
+    def _add(starts: array, seg_secs: array, files: List[str], file: str, start: int, seg_sec: int) -> None:
+        i = bisect_right(starts, start)
+        if i == len(starts):
+            # Indexer appends in time order, this is the common case
+            starts.append(start)
+            seg_secs.append(seg_sec)
+            files.append(sys.intern(file))
+        else:
+            starts.insert(i, start)
+            seg_secs.insert(i, seg_sec)
+            files.insert(i, sys.intern(file))
+
+    def find_entry(self, target_epoch: int) -> Optional[IndexEntry]:
+        """Last entry with start <= target_epoch, or None"""
+        starts, seg_secs, files = self._data
+        i = bisect_right(starts, target_epoch) - 1
+        if i < 0:
+            return None
+        return IndexEntry(file=files[i], start=starts[i], seg_sec=seg_secs[i])
+
+
 class DVRResolver:
     def __init__(self, recordings_dir: str, seg_sec: int = 12, tz_mode: str = "local"):
         self.recordings_dir = Path(recordings_dir)
         self.seg_sec = int(seg_sec)
         self.tz_mode = tz_mode
-        # Cache: {hour_dir_str: (mtime, entries)}
-        self._index_cache: Dict[str, Tuple[float, List[IndexEntry]]] = {}
+        # Cache: {hour_dir_str: HourIndex}, least recently used first
+        self._index_cache: "OrderedDict[str, HourIndex]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        # Segment catalog written by the indexer; per-hour index.jsonl is the fallback
+        self._catalog: Optional[DVRCatalog] = None
+
+    def _get_catalog(self) -> Optional[DVRCatalog]:
+        # Opened lazily: the indexer may create the catalog after we start
+        if self._catalog is None:
+            self._catalog = DVRCatalog.open_if_exists(str(self.recordings_dir))
+        return self._catalog
 
     def _parse_ts_iso(self, ts_iso: str) -> datetime:
         # Accept "YYYY-MM-DDTHH:MM:SS" or "YYYY-MM-DD HH:MM:SS" with optional timezone.
@@ -40,64 +175,21 @@ class DVRResolver:
         # Layout: OUT_DIR/YYYY-MM-DD/HH/
         return self.recordings_dir / ts.strftime("%Y-%m-%d") / ts.strftime("%H")
 
-    def _load_index(self, hour_dir: Path) -> List[IndexEntry]:
-        idx = hour_dir / "index.jsonl"
-        if not idx.exists():
-            return []
-
+    def _load_index(self, hour_dir: Path) -> Optional[HourIndex]:
         cache_key = str(hour_dir)
-        try:
-            current_mtime = idx.stat().st_mtime
-        except Exception:
-            return []
-
-        # Check cache validity
-        if cache_key in self._index_cache:
-            cached_mtime, cached_entries = self._index_cache[cache_key]
-            if cached_mtime == current_mtime:
-                return cached_entries
-
-        # Load from file
-        entries: List[IndexEntry] = []
-        try:
-            with idx.open("r", encoding="utf-8") as f:
-                for ln in f:
-                    ln = ln.strip()
-                    if not ln:
-                        continue
-                    try:
-                        obj = json.loads(ln)
-                        file = str(obj.get("file") or "")
-                        start = int(obj.get("start"))
-                        seg_sec = int(obj.get("segSec") or self.seg_sec)
-                        if file and start:
-                            entries.append(IndexEntry(file=file, start=start, seg_sec=seg_sec))
-                    except Exception:
-                        continue
-        except Exception:
-            return []
-
-        entries.sort(key=lambda e: e.start)
-
-        # Update cache
-        self._index_cache[cache_key] = (current_mtime, entries)
-        return entries
+        with self._index_lock:
+            hidx = self._index_cache.pop(cache_key, None) or HourIndex(hour_dir / "index.jsonl")
+            if not hidx.refresh(self.seg_sec):
+                return None
+            self._index_cache[cache_key] = hidx
+            while len(self._index_cache) > INDEX_CACHE_HOURS:
+                self._index_cache.popitem(last=False)
+            return hidx
 
-    def _find_entry_for_ts(self, entries: List[IndexEntry], target_epoch: int) -> Optional[IndexEntry]:
-        if not entries:
+    def _find_entry_for_ts(self, hidx: Optional[HourIndex], target_epoch: int) -> Optional[IndexEntry]:
+        if not hidx:
             return None
-        # Find last entry with start <= target_epoch
-        lo, hi = 0, len(entries) - 1
-        best = None
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            e = entries[mid]
-            if e.start <= target_epoch:
-                best = e
-                lo = mid + 1
-            else:
-                hi = mid - 1
-        return best
+        return hidx.find_entry(target_epoch)
 
     def _fallback_scan_nearest_file(self, hour_dir: Path) -> Optional[Tuple[Path, int]]:
         # Fallback: pick newest seg_*.mp4 and estimate start via mtime-seg_sec
@@ -119,13 +211,20 @@ class DVRResolver:
         target_epoch = int(ts.timestamp())
 
         hour_dir = self._hour_dir_for(ts)
-        entries = self._load_index(hour_dir)
 
         chosen_path: Optional[Path] = None
         seg_start_epoch: Optional[int] = None
         seg_sec: int = self.seg_sec
 
-        entry = self._find_entry_for_ts(entries, target_epoch)
+        catalog = self._get_catalog()
+        seg = catalog.find_at(target_epoch) if catalog else None
+        if seg is not None:
+            path = self.recordings_dir / seg.path
+            if path.exists():
+                chosen_path, seg_start_epoch, seg_sec = path, seg.start, seg.seg_sec
+
+        hidx = self._load_index(hour_dir) if chosen_path is None else None
+        entry = self._find_entry_for_ts(hidx, target_epoch)
         if entry is not None:
             seg_sec = entry.seg_sec
             seg_start_epoch = entry.start
@@ -139,8 +238,7 @@ class DVRResolver:
             # Try previous hour (because target could be near beginning of hour)
             prev_hour = ts - timedelta(hours=1)
             prev_dir = self._hour_dir_for(prev_hour)
-            prev_entries = self._load_index(prev_dir)
-            entry = self._find_entry_for_ts(prev_entries, target_epoch)
+            entry = self._find_entry_for_ts(self._load_index(prev_dir), target_epoch)
             if entry is not None:
                 seg_sec = entry.seg_sec
                 seg_start_epoch = entry.start
@@ -179,6 +277,94 @@ class DVRResolver:
         )
 
 
+    def resolve_range(self, start_iso: str, end_iso: str) -> RangeResult:
+        """Return every segment overlapping [start, end) plus the gaps between them.
+
+        With the catalog this is a single indexed query. Otherwise each hour
+        index touched by the range (starting one hour early, since a segment
+        from the previous hour may cover the start) is loaded once and
+        bisected once, then walked forward until `end`. Segments whose file
+        is missing are reported as gaps.
+        """
+        start = self._parse_ts_iso(start_iso)
+        end = self._parse_ts_iso(end_iso)
+        t0 = int(start.timestamp())
+        t1 = int(end.timestamp())
+
+        catalog = self._get_catalog()
+        if catalog is not None:
+            found = [(self.recordings_dir / s.path, s.start, s.seg_sec) for s in catalog.between(t0, t1)]
+        else:
+            found = self._scan_hour_indexes(t0, t1, start.tzinfo)
+
+        segments: List[RangeSegment] = []
+        seen = set()
+        for path, seg_start, seg_sec in found:
+            if path in seen or not path.exists():
+                continue
+            seen.add(path)
+            segments.append(RangeSegment(
+                file_path=str(path.resolve()),
+                start=seg_start,
+                seg_sec=seg_sec,
+                in_offset_ms=max(0, t0 - seg_start) * 1000,
+                out_offset_ms=min(seg_sec, t1 - seg_start) * 1000,
+            ))
+        segments.sort(key=lambda s: s.start)
+
+        gaps: List[Tuple[int, int]] = []
+        cursor = t0
+        for seg in segments:
+            if seg.start - cursor > GAP_TOLERANCE_SEC:
+                gaps.append((cursor, seg.start))
+            cursor = max(cursor, seg.start + seg.seg_sec)
+        if t1 - cursor > GAP_TOLERANCE_SEC:
+            gaps.append((cursor, t1))
+
+        return RangeResult(segments=segments, gaps=gaps)
+
+    def coverage(self, start_iso: str, end_iso: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Return (recorded, gaps) as merged epoch intervals inside [start, end).
+
+        Answered by the catalog when present, otherwise derived from
+        resolve_range. Meant for drawing a whole replay timeline in one call.
+        """
+        t0 = int(self._parse_ts_iso(start_iso).timestamp())
+        t1 = int(self._parse_ts_iso(end_iso).timestamp())
+
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return catalog.coverage(t0, t1, GAP_TOLERANCE_SEC), catalog.gaps(t0, t1, GAP_TOLERANCE_SEC)
+
+        result = self.resolve_range(start_iso, end_iso)
+        recorded: List[Tuple[int, int]] = []
+        cursor = t0
+        for a, b in result.gaps + [(t1, t1)]:
+            if a > cursor:
+                recorded.append((cursor, a))
+            cursor = max(cursor, b)
+        return recorded, result.gaps
+
+    def _scan_hour_indexes(self, t0: int, t1: int, tz) -> List[Tuple[Path, int, int]]:
+        # Fallback for resolve_range without a catalog: walk the per-hour index.jsonl files
+        found: List[Tuple[Path, int, int]] = []
+        hour = datetime.fromtimestamp(t0 - 3600, tz=tz).replace(minute=0, second=0, microsecond=0)
+        while int(hour.timestamp()) < t1:
+            hour_dir = self._hour_dir_for(hour)
+            hidx = self._load_index(hour_dir)
+            if hidx:
+                # One snapshot for the whole walk: a concurrent refresh swaps in new arrays
+                starts, seg_secs, files = hidx.snapshot()
+                for i in range(max(0, bisect_right(starts, t0) - 1), len(starts)):
+                    start = starts[i]
+                    if start >= t1:
+                        break
+                    if start + seg_secs[i] > t0:
+                        found.append((hour_dir / files[i], start, seg_secs[i]))
+            hour += timedelta(hours=1)
+        return found
+
+
 def resolve_ts(ts_iso: str, recordings_dir: str, seg_sec: int = 12) -> Dict[str, Any]:
     r = DVRResolver(recordings_dir=recordings_dir, seg_sec=seg_sec).resolve(ts_iso)
     return {
@@ -0,0 +1,70 @@
+"""
+Inotify - minimal ctypes binding of Linux inotify
+
+Used by the DVR indexer and the HLS delay server to react to files the
+recorder/relay finishes instead of polling directories. Linux only:
+constructing Inotify raises OSError elsewhere so callers can fall back to
+polling.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from typing import List, Tuple
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_IGNORED = 0x00008000
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """One inotify instance; add watches, then read (wd, mask, name) events"""
+
+    def __init__(self):
+        name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify not supported on this platform")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed for {path}: {os.strerror(err)}")
+        return wd
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Block up to `timeout` seconds; returns [(wd, mask, name)] (empty on timeout)"""
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+            pos += _EVENT.size
+            events.append((wd, mask, os.fsdecode(buf[pos:pos + length].rstrip(b"\0"))))
+            pos += length
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
@@ -0,0 +1,186 @@
+"""
+MP4 Info - read duration and keyframe times straight from MP4 box headers
+
+Only the moov box tree is read (a few KB regardless of file size), so probing
+a finished DVR segment costs a couple of seeks instead of an ffprobe
+fork/exec. Handles the plain (non-fragmented) MP4/QuickTime files written by
+splitmuxsink/qtmux; returns None for anything it cannot make sense of so the
+caller can fall back to ffprobe.
+"""
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Containers we descend into on the way to the sample tables
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+
+# Refuse absurd box sizes instead of reading them into memory
+_MAX_BOX_READ = 64 * 1024 * 1024
+
+
+@dataclass
+class Mp4Info:
+    duration: float                 # moov/mvhd duration, seconds
+    first_sample: float = 0.0       # presentation time of the first video sample
+    last_sample_end: float = 0.0    # presentation end of the last video sample
+    keyframes: List[float] = field(default_factory=list)  # sync sample times, only if requested
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload offset, payload end) for boxes in [start, end)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, btype = struct.unpack(">I4s", header)
+        hdr_len = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            hdr_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < hdr_len or pos + size > end:
+            return
+        yield btype, pos + hdr_len, pos + size
+        pos += size
+
+
+def _read(f: BinaryIO, start: int, end: int) -> bytes:
+    if end - start > _MAX_BOX_READ:
+        raise ValueError("box too large")
+    f.seek(start)
+    return f.read(end - start)
+
+
+def _find_boxes(f: BinaryIO, start: int, end: int, wanted: set) -> Dict[bytes, List[bytes]]:
+    """Collect payloads of `wanted` boxes under [start, end), descending into containers"""
+    found: Dict[bytes, List[bytes]] = {}
+    for btype, a, b in _iter_boxes(f, start, end):
+        if btype in wanted:
+            found.setdefault(btype, []).append(_read(f, a, b))
+        if btype in _CONTAINERS:
+            for k, v in _find_boxes(f, a, b, wanted).items():
+                found.setdefault(k, []).extend(v)
+    return found
+
+
+def _parse_mvhd(data: bytes) -> Optional[float]:
+    version = data[0]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, 12)
+    if not timescale:
+        return None
+    return duration / timescale
+
+
+def _parse_mdhd_timescale(data: bytes) -> int:
+    return struct.unpack_from(">I", data, 20 if data[0] == 1 else 12)[0]
+
+
+def _parse_entries(data: bytes, fmt: str) -> List[tuple]:
+    """Full-box table: version/flags, entry count, then fixed-size entries"""
+    count = struct.unpack_from(">I", data, 4)[0]
+    entry = struct.Struct(">" + fmt)
+    count = min(count, (len(data) - 8) // entry.size)
+    return [entry.unpack_from(data, 8 + i * entry.size) for i in range(count)]
+
+
+def _media_start(elst: Optional[bytes]) -> int:
+    """media_time of the first non-empty edit (what player time 0 maps to)"""
+    if not elst:
+        return 0
+    # segment_duration, media_time (signed, -1 marks an empty edit), media_rate
+    for _, media_time, _ in _parse_entries(elst, "QqI" if elst[0] == 1 else "IiI"):
+        if media_time >= 0:
+            return media_time
+    return 0
+
+
+def _video_track(f: BinaryIO, moov: Tuple[int, int]) -> Optional[Dict[bytes, List[bytes]]]:
+    """Sample tables of the first video track"""
+    wanted = {b"hdlr", b"mdhd", b"elst", b"stts", b"ctts", b"stss"}
+    for btype, a, b in _iter_boxes(f, *moov):
+        if btype != b"trak":
+            continue
+        boxes = _find_boxes(f, a, b, wanted)
+        hdlr = boxes.get(b"hdlr")
+        if hdlr and hdlr[0][8:12] == b"vide" and b"mdhd" in boxes and b"stts" in boxes:
+            return boxes
+    return None
+
+
+def probe(path: str, keyframes: bool = False) -> Optional[Mp4Info]:
+    """Read duration (and optionally keyframe times) from an MP4 file's moov box.
+
+    Returns None when the file has no usable moov (still being written,
+    fragmented, truncated or not MP4 at all).
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            size = f.tell()
+            moov = next(((a, b) for t, a, b in _iter_boxes(f, 0, size) if t == b"moov"), None)
+            if moov is None:
+                return None
+
+            mvhd = _find_boxes(f, moov[0], moov[1], {b"mvhd"}).get(b"mvhd")
+            duration = _parse_mvhd(mvhd[0]) if mvhd else None
+            if not duration:
+                return None
+            info = Mp4Info(duration=duration, last_sample_end=duration)
+
+            track = _video_track(f, moov)
+            if track is None:
+                return info
+
+            timescale = _parse_mdhd_timescale(track[b"mdhd"][0])
+            if not timescale:
+                return info
+            shift = _media_start(track.get(b"elst", [None])[0])
+            stts = _parse_entries(track[b"stts"][0], "II")
+            ctts = _parse_entries(track[b"ctts"][0], "Ii") if b"ctts" in track else []
+            sync = None
+            if keyframes and b"stss" in track:
+                sync = {row[0] for row in _parse_entries(track[b"stss"][0], "I")}
+
+            # Walk decode times once; presentation time = dts + composition offset - edit shift
+            first = None
+            last_end = 0
+            dts = 0
+            sample = 1
+            ctts_iter = iter(ctts)
+            ctts_left, ctts_off = 0, 0
+            kf: List[float] = []
+            for count, delta in stts:
+                for _ in range(count):
+                    if ctts_left == 0:
+                        ctts_left, ctts_off = next(ctts_iter, (1 << 62, 0))
+                    ctts_left -= 1
+                    pts = dts + ctts_off - shift
+                    if first is None or pts < first:
+                        first = pts
+                    last_end = max(last_end, pts + delta)
+                    if keyframes and (sync is None or sample in sync):
+                        kf.append(pts / timescale)
+                    dts += delta
+                    sample += 1
+
+            info.first_sample = (first or 0) / timescale
+            info.last_sample_end = last_end / timescale
+            info.keyframes = sorted(kf)
+            return info
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duration in seconds from moov/mvhd, or None if the file cannot be parsed"""
+    info = probe(path)
+    return info.duration if info else None
@@ -9,6 +9,9 @@ from typing import Any, Dict, Optional
 from PySide6.QtCore import QObject, Property, QTimer, QUrl, Signal, Slot
 from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 
+# Finished matches remembered for DVR retention (see scripts/dvr_retention.py)
+MATCH_WINDOW_KEEP_SEC = 7 * 24 * 3600
+
 def _to_int(value: Any, default: int = 0) -> int:
     try:
         return int(value)
@@ -226,6 +229,23 @@ class TournamentService(QObject):
             pass
         return {}
 
+    def _save_match_window(self, start: float, end: float) -> None:
+        """Append a finished match to match_windows.json, which DVR retention keeps longer."""
+        try:
+            path = os.path.join(os.path.dirname(self._start_times_path()), "match_windows.json")
+            windows = []
+            if os.path.exists(path):
+                with open(path) as f:
+                    windows = json.load(f)
+            cutoff = time.time() - MATCH_WINDOW_KEEP_SEC
+            windows = [w for w in windows if w[1] >= cutoff] + [[start, end]]
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(windows, f)
+            os.replace(tmp, path)
+        except Exception:
+            pass
+
     def _save_start_times(self) -> None:
         try:
             path = self._start_times_path()
@@ -257,6 +277,7 @@ class TournamentService(QObject):
     def clearMatchStart(self, match_id: int) -> None:
         """Called from QML when match ends — removes the stored start time."""
         if match_id in self._start_times:
+            self._save_match_window(self._start_times[match_id], time.time())
             del self._start_times[match_id]
             self._save_start_times()
 
@@ -100,9 +100,9 @@ echo ">>> Copying systemd service files..."
 cp "$SCRIPT_DIR/systemd/azpool-cam-delay.service"   "$SYSTEMD_DIR/"
 cp "$SCRIPT_DIR/systemd/azpool-cam-record.service"  "$SYSTEMD_DIR/"
 cp "$SCRIPT_DIR/systemd/azpool-cam-prune.service"   "$SYSTEMD_DIR/"
-cp "$SCRIPT_DIR/systemd/azpool-cam-prune.timer"     "$SYSTEMD_DIR/"
 cp "$SCRIPT_DIR/systemd/azpool-clip-server.service" "$SYSTEMD_DIR/"
 cp "$SCRIPT_DIR/systemd/azpool-cam-index.service"   "$SYSTEMD_DIR/"
+cp "$SCRIPT_DIR/systemd/azpool-cam-supervisor.service" "$SYSTEMD_DIR/"
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 5. Remove __pycache__ and unnecessary files
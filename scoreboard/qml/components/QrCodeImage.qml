@@ -23,11 +23,11 @@ Item {
             anchors.fill: parent
             anchors.margins: 4
             fillMode: Image.PreserveAspectFit
-            cache: false
+            cache: true
             asynchronous: true
 
             source: root.targetUrl.length > 0
-                ? ClipController.getQrUrl(root.targetUrl)
+                ? ClipController.getSizedQrUrl(root.targetUrl, root.qrSize)
                 : ""
 
             onStatusChanged: {
@@ -36,6 +36,10 @@ DialogShell {
     property bool _isSeeking: false   // true while seek in progress, blocks onPositionChanged from updating timeline
     property string _pendingSourceUrl: ""  // URL queued for source change (delayed for overlay rendering)
 
+    // Unrecorded spans of the window as absolute times [{ startMs, endMs }], from one DVRController coverage request
+    property var _gapsMs: []
+    property int _coverageAgeSec: 0
+
     // Clip mode properties
     property bool clipMode: false
     property int clipStartSec: -1  // -1 = not set
@@ -62,6 +66,50 @@ DialogShell {
         return pad2(ts.getHours()) + ":" + pad2(ts.getMinutes()) + ":" + pad2(ts.getSeconds())
     }
 
+    // Fetch recorded coverage for the whole window in one request (no per-second resolves);
+    // computed off the GUI thread and applied in onCoverageReady
+    function loadCoverage() {
+        _coverageAgeSec = 0
+        DVRController.requestCoverage(toIsoLocal(rangeStart), toIsoLocal(rangeEnd))
+    }
+
+    Connections {
+        target: DVRController
+        function onCoverageReady(cov) {
+            if (!cov || !cov.ok) {
+                root._gapsMs = []
+                return
+            }
+            var out = []
+            for (var i = 0; i < cov.gaps.length; i++) {
+                out.push({ startMs: cov.startMs + cov.gaps[i].startSec * 1000,
+                           endMs: cov.startMs + cov.gaps[i].endSec * 1000 })
+            }
+            root._gapsMs = out
+        }
+    }
+
+    // Gaps relative to the current rangeStart, for the timeline
+    function timelineGaps(start) {
+        var out = []
+        for (var i = 0; i < _gapsMs.length; i++) {
+            out.push({ startSec: Math.floor((_gapsMs[i].startMs - start.getTime()) / 1000),
+                       endSec: Math.ceil((_gapsMs[i].endMs - start.getTime()) / 1000) })
+        }
+        return out
+    }
+
+    // If secOffset falls into a gap, move it to the start of the next recording
+    function skipGap(secOffset) {
+        var gaps = timelineGaps(rangeStart)
+        for (var i = 0; i < gaps.length; i++) {
+            if (secOffset >= gaps[i].startSec && secOffset < gaps[i].endSec) {
+                return gaps[i].endSec < secondsInRange - 20 ? gaps[i].endSec : secOffset
+            }
+        }
+        return secOffset
+    }
+
     function openNow() {
         // Rolling 6h window ending at current time
         var now = new Date()
@@ -82,6 +130,7 @@ DialogShell {
 
         statusText = ""
         timeline.currentSpeed = 1.0  // Reset speed to 1x
+        loadCoverage()
         root.open()
 
         // Auto-jump to the selected time
@@ -117,6 +166,7 @@ DialogShell {
     function jumpToSeconds(secOffset, autoAdvance) {
         // secOffset is seconds from rangeStart (0 = 6h ago, secondsInRange = now)
         // autoAdvance = true when called from loadNextSegment (no loading overlay)
+        secOffset = skipGap(secOffset)
         timeline.seconds = secOffset
         _autoAdvancing = (autoAdvance === true)
         _isSeeking = true
@@ -217,6 +267,11 @@ DialogShell {
             // Don't update rangeStart while playing or scrubbing
             // Otherwise time display will run at 2x speed
             if (root.isScrubbing) return
+
+            // Pick up newly recorded segments every 30s
+            root._coverageAgeSec++
+            if (root._coverageAgeSec >= 30) root.loadCoverage()
+
             if (mediaPlayer.playbackState === MediaPlayer.PlayingState) return
 
             // Update rolling window (rangeEnd = now, rangeStart = now - 6h)
@@ -503,6 +558,7 @@ DialogShell {
             id: timeline
             Layout.fillWidth: true
             secondsInRange: root.secondsInRange
+            gaps: root.timelineGaps(root.rangeStart)
             rangeStartTime: root.rangeStart
 
             // Clip mode limits: when start is set, cannot go back before start, max 15 min forward
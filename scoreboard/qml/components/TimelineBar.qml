@@ -19,9 +19,13 @@ Item {
     property int minSec: 0                // Minimum seconds (cannot go before this)
     property int maxSec: secondsInRange   // Maximum seconds (cannot go past this)
 
+    // Unrecorded spans [{ startSec, endSec }], drawn over the bar
+    property var gaps: []
+
     // Style
     property color topRulerColor: "#163243"
     property color barColor: "#1e88e5"
+    property color gapColor: "#3a3a3a"
     property color tickColor: "#ffffff"
     property color labelColor: "#ffffff"
     property color caretColor: "#ff3b30"
@@ -116,6 +120,19 @@ Item {
                 opacity: 0.95
             }
 
+            // Gaps (no recording)
+            Repeater {
+                model: root.gaps
+                delegate: Rectangle {
+                    x: Math.max(0, modelData.startSec) * root.pixelsPerSecond
+                    width: Math.max(1, (Math.min(root.secondsInRange, modelData.endSec) - Math.max(0, modelData.startSec)) * root.pixelsPerSecond)
+                    y: root.rulerH + 18
+                    height: root.barH
+                    color: root.gapColor
+                    opacity: 0.95
+                }
+            }
+
             // Ticks and labels
             Repeater {
                 model: Math.floor(root.secondsInRange / root.minorTickSec) + 1
@@ -2,7 +2,10 @@
 # =============================================================================
 # cam_delay_relay.sh - GStreamer RTSP to HLS relay with configurable delay
 # =============================================================================
-# Usage: ./cam_delay_relay.sh [start|stop|restart|status]
+# Usage: ./cam_delay_relay.sh [start|stop|restart|status|pipeline]
+#
+#   pipeline prints the gst-launch pipeline without running it
+#   (cam_supervisor.py runs it under its own restart policy).
 #
 # Environment variables (can be set in config file or env):
 #   CAM_URL       - RTSP URL of the camera (required)
@@ -12,6 +15,10 @@
 #   USE_VAAPI     - Use Intel VAAPI hardware acceleration (default: auto)
 #   SEGMENT_SEC   - HLS segment duration in seconds (default: 2)
 #   PLAYLIST_LEN  - Number of segments in playlist (default: 5)
+#   MAX_DELAY_SEC - Largest per-request ?delay= served by the delay server (default: 60)
+#   SINGLE_INGEST - 1 = cam_record_main.sh writes the HLS segments from its own
+#                   RTSP session; only the delay server is run here
+#                   (default: liveStream.singleIngest)
 # =============================================================================
 
 set -euo pipefail
@@ -38,6 +45,8 @@ load_config() {
             USE_VAAPI="${USE_VAAPI:-$(jq -r '.hardware.useVaapi // ._legacy.useVaapi // .useVaapi // empty' "$CONFIG_FILE" 2>/dev/null)}"
             SEGMENT_SEC="${SEGMENT_SEC:-$(jq -r '.liveStream.segmentSec // ._legacy.segmentSec // .segmentSec // empty' "$CONFIG_FILE" 2>/dev/null)}"
             PLAYLIST_LEN="${PLAYLIST_LEN:-$(jq -r '.liveStream.playlistLen // ._legacy.playlistLen // .playlistLen // empty' "$CONFIG_FILE" 2>/dev/null)}"
+            MAX_DELAY_SEC="${MAX_DELAY_SEC:-$(jq -r '.liveStream.maxDelaySec // empty' "$CONFIG_FILE" 2>/dev/null)}"
+            SINGLE_INGEST="${SINGLE_INGEST:-$(jq -r '.liveStream.singleIngest // empty' "$CONFIG_FILE" 2>/dev/null)}"
         fi
     fi
 }
@@ -63,6 +72,8 @@ HLS_DIR="${HLS_DIR:-$APP_DIR/runtime/hls}"
 USE_VAAPI="${USE_VAAPI:-auto}"
 SEGMENT_SEC="${SEGMENT_SEC:-2}"
 PLAYLIST_LEN="${PLAYLIST_LEN:-5}"
+MAX_DELAY_SEC="${MAX_DELAY_SEC:-60}"
+SINGLE_INGEST="${SINGLE_INGEST:-false}"
 # Force transcode to ensure SPS/PPS in each segment (fix decode on HLS clients)
 FORCE_TRANSCODE="${FORCE_TRANSCODE:-1}"
 
@@ -70,6 +81,13 @@ FORCE_TRANSCODE="${FORCE_TRANSCODE:-1}"
 if [ "$DELAY_SEC" -lt 0 ] 2>/dev/null; then DELAY_SEC=0; fi
 if [ "$DELAY_SEC" -gt 30 ] 2>/dev/null; then DELAY_SEC=30; fi
 
+# Segments kept on disk must cover the largest delay any client can request
+KEEP_SEC=$(( MAX_DELAY_SEC > DELAY_SEC ? MAX_DELAY_SEC : DELAY_SEC ))
+
+is_single_ingest() {
+    [ "$SINGLE_INGEST" = "true" ] || [ "$SINGLE_INGEST" = "1" ]
+}
+
 # Convert delay to nanoseconds for GStreamer queue
 DELAY_NS=$((DELAY_SEC * 1000000000))
 
@@ -199,7 +217,7 @@ build_pipeline() {
             # Ensure SPS/PPS are inserted for each IDR so HLS segments can decode reliably.
             local parse_out="h264parse config-interval=-1"
             local mux="mpegtsmux"
-            local max_files=$((DELAY_SEC / SEGMENT_SEC + PLAYLIST_LEN + 5))
+            local max_files=$((KEEP_SEC / SEGMENT_SEC + PLAYLIST_LEN + 5))
             local hls_sink="hlssink location=\"$HLS_DIR/segment%05d.ts\" playlist-location=\"$HLS_DIR/playlist.m3u8\" target-duration=$SEGMENT_SEC max-files=$max_files playlist-length=$PLAYLIST_LEN"
             echo "$src ! $depay ! $parse_out ! $mux ! $hls_sink"
             return
@@ -222,7 +240,7 @@ build_pipeline() {
 
     # HLS sink - writes segments as fast as possible
     # Keep more segments for delay server to work with (delay + buffer)
-    local max_files=$((DELAY_SEC / SEGMENT_SEC + PLAYLIST_LEN + 5))
+    local max_files=$((KEEP_SEC / SEGMENT_SEC + PLAYLIST_LEN + 5))
     local hls_sink="hlssink location=\"$HLS_DIR/segment%05d.ts\" playlist-location=\"$HLS_DIR/playlist.m3u8\" target-duration=$SEGMENT_SEC max-files=$max_files playlist-length=$PLAYLIST_LEN"
 
     # Muxer
@@ -257,10 +275,10 @@ start_delay_server() {
     if [ -f "$delay_script" ]; then
         setsid bash -c '
             while true; do
-                python3 "$1" --port "$2" --delay "$3" --hls-dir "$4" >> "$5" 2>&1 || true
+                python3 "$1" --port "$2" --delay "$3" --hls-dir "$4" --max-delay "$6" >> "$5" 2>&1 || true
                 sleep 3
             done
-        ' "delay_server_loop" "$delay_script" "$port" "$delay" "$dir" "$LOG_FILE" </dev/null >/dev/null 2>&1 &
+        ' "delay_server_loop" "$delay_script" "$port" "$delay" "$dir" "$LOG_FILE" "$KEEP_SEC" </dev/null >/dev/null 2>&1 &
         echo $!
     else
         echo "ERROR: hls_delay_server.py not found at $delay_script" >&2
@@ -275,6 +293,11 @@ start_delay_server() {
 # Start relay
 # -----------------------------------------------------------------------------
 do_start() {
+    if is_single_ingest; then
+        start_single_ingest
+        return
+    fi
+
     if [ -z "$CAM_URL" ]; then
         echo "ERROR: CAM_URL is required"
         echo "Set it in $CONFIG_FILE or as environment variable"
@@ -348,6 +371,37 @@ EOF
     echo "Log file: $LOG_FILE"
 }
 
+# -----------------------------------------------------------------------------
+# Single-ingest mode: the recorder's pipeline tees the camera into $HLS_DIR,
+# so only the delay server runs here and the HLS directory is left alone.
+# -----------------------------------------------------------------------------
+start_single_ingest() {
+    if pgrep -f "delay_server_loop" >/dev/null 2>&1 || \
+       pgrep -f "hls_delay_server.py.*--port $DELAY_SERVER_PORT" >/dev/null 2>&1; then
+        echo "Stale relay processes detected. Stopping..."
+        do_stop
+    fi
+
+    mkdir -p "$HLS_DIR"
+    if [ ! -f "$HLS_DIR/playlist.m3u8" ]; then
+        cat > "$HLS_DIR/playlist.m3u8" << 'EOF'
+#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:2
+#EXT-X-MEDIA-SEQUENCE:0
+EOF
+    fi
+
+    local http_pid=$(start_delay_server "$DELAY_SERVER_PORT" "$DELAY_SEC" "$HLS_DIR")
+    # The delay server loop is the service's main process in this mode
+    echo "$http_pid" > "$PID_FILE"
+    echo "$http_pid" > "$HTTP_PID_FILE"
+
+    echo "Single-ingest mode: HLS segments come from cam_record_main.sh"
+    echo "HLS delay server started on port $DELAY_SERVER_PORT with ${DELAY_SEC}s delay (PID: $http_pid)"
+    echo "Stream URL: http://127.0.0.1:$DELAY_SERVER_PORT/playlist.m3u8"
+}
+
 # -----------------------------------------------------------------------------
 # Stop relay
 # -----------------------------------------------------------------------------
@@ -396,7 +450,10 @@ do_stop() {
     # Cleanup any remaining processes
     pkill -f "$LOOP_TAG" 2>/dev/null || true
     pkill -f "delay_server_loop" 2>/dev/null || true
-    pkill -f "gst-launch.*$HLS_DIR" 2>/dev/null || true
+    # In single-ingest mode that pipeline is the recorder's; leave it running
+    if ! is_single_ingest; then
+        pkill -f "gst-launch.*$HLS_DIR" 2>/dev/null || true
+    fi
     pkill -f "python3 -m http.server $LOCAL_PORT" 2>/dev/null || true
     pkill -f "hls_delay_server.py" 2>/dev/null || true
 }
@@ -444,8 +501,19 @@ case "${1:-start}" in
     status)
         do_status
         ;;
+    pipeline)
+        if is_single_ingest; then
+            echo "ERROR: single-ingest mode, HLS segments come from cam_record_main.sh" >&2
+            exit 1
+        fi
+        if [ -z "$CAM_URL" ]; then
+            echo "ERROR: CAM_URL is required" >&2
+            exit 1
+        fi
+        build_pipeline
+        ;;
     *)
-        echo "Usage: $0 {start|stop|restart|status}"
+        echo "Usage: $0 {start|stop|restart|status|pipeline}"
         exit 1
         ;;
 esac
@@ -9,10 +9,34 @@
 #   SEG_SEC      - Segment duration seconds (default: 60)
 #   MAX_HOURS    - Retention hours (default: 24)
 #   LATENCY_MS   - rtspsrc latency (default: 200)
+#   SINGLE_INGEST - 1 = also feed the live HLS relay from this RTSP session
+#                   (default: liveStream.singleIngest in camera.json)
+#   HLS_DIR      - Live HLS directory in single-ingest mode (default: ./runtime/hls)
 #
 # Output layout:
 #   OUT_DIR/YYYY-MM-DD/HH/seg_00000.mp4
 #
+# Single-ingest mode:
+#   The camera is pulled once and the depayloaded stream is teed into
+#   splitmuxsink (DVR) and hlssink (live relay, served delayed by
+#   hls_delay_server.py which cam_delay_relay.sh still starts). H.264 is
+#   remuxed into the HLS branch as-is; H.265 is transcoded to H.264 there
+#   with VAAPI because HLS clients cannot play it. The HLS branch sits behind
+#   a leaky queue so a slow transcode never stalls recording. The live
+#   picture then comes from recording.rtspUrl.
+#
+#   H.265 without VAAPI would need a software transcode of the main stream,
+#   so the live view falls back to the sub-stream (liveStream.rtspUrl),
+#   pulled by a separate gst-launch that this script keeps running across
+#   the hourly rotations.
+#
+#   The hourly rotation restarts gst-launch (the hour directory is fixed in
+#   splitmuxsink's location). hlssink numbers from 0 on every start and has
+#   no start index, so every run writes segment<start epoch><index>.ts: the
+#   numbers keep increasing across restarts and the delay server's
+#   MEDIA-SEQUENCE never goes back. Segments of earlier runs are kept for
+#   the delay window instead of being wiped on each rotation.
+#
 # Graceful URL switching:
 #   When camera URL changes in camera.json, the script detects it at the
 #   start of each loop iteration. If GStreamer is still running (shouldn't be
@@ -34,6 +58,9 @@ LOG_FILE="$LOG_DIR/cam_record_main.log"
 
 # Store PID of current GStreamer process for graceful stop
 GST_PID=""
+# Background sub-stream live relay (single-ingest H.265 fallback) and its pipeline
+LIVE_PID=""
+LIVE_PIPELINE=""
 
 # Trap SIGINT/SIGTERM: forward to GStreamer for graceful finalization
 cleanup() {
@@ -52,6 +79,7 @@ cleanup() {
         # Force kill if still running
         kill -9 "$GST_PID" 2>/dev/null || true
     fi
+    stop_live_fallback
     exit 0
 }
 trap cleanup SIGINT SIGTERM
@@ -67,6 +95,12 @@ load_config() {
     MAX_HOURS=""
     LATENCY_MS=""
     USE_VAAPI=""
+    SINGLE_INGEST=""
+    LIVE_SEG_SEC=""
+    PLAYLIST_LEN=""
+    DELAY_SEC=""
+    MAX_DELAY_SEC=""
+    LIVE_URL=""
 
     if [ -f "$CONFIG_FILE" ]; then
         if command -v jq &>/dev/null; then
@@ -77,6 +111,12 @@ load_config() {
             MAX_HOURS="$(jq -r '.recording.maxHours // empty' "$CONFIG_FILE" 2>/dev/null)"
             LATENCY_MS="$(jq -r '.recording.latencyMs // empty' "$CONFIG_FILE" 2>/dev/null)"
             USE_VAAPI="$(jq -r '.hardware.useVaapi // ._legacy.useVaapi // .useVaapi // empty' "$CONFIG_FILE" 2>/dev/null)"
+            SINGLE_INGEST="$(jq -r '.liveStream.singleIngest // empty' "$CONFIG_FILE" 2>/dev/null)"
+            LIVE_SEG_SEC="$(jq -r '.liveStream.segmentSec // ._legacy.segmentSec // empty' "$CONFIG_FILE" 2>/dev/null)"
+            PLAYLIST_LEN="$(jq -r '.liveStream.playlistLen // ._legacy.playlistLen // empty' "$CONFIG_FILE" 2>/dev/null)"
+            DELAY_SEC="$(jq -r '.liveStream.delaySec // ._legacy.delaySec // empty' "$CONFIG_FILE" 2>/dev/null)"
+            MAX_DELAY_SEC="$(jq -r '.liveStream.maxDelaySec // empty' "$CONFIG_FILE" 2>/dev/null)"
+            LIVE_URL="$(jq -r '.liveStream.rtspUrl // ._legacy.cameraRtspUrl // .cameraRtspUrl // empty' "$CONFIG_FILE" 2>/dev/null)"
 
             # Handle relative path for recordings dir
             if [ -n "$REC_DIR" ] && [[ ! "$REC_DIR" = /* ]]; then
@@ -94,6 +134,15 @@ load_config() {
     MAX_HOURS="${MAX_HOURS:-24}"
     LATENCY_MS="${LATENCY_MS:-200}"
     USE_VAAPI="${USE_VAAPI:-auto}"
+    SINGLE_INGEST="${SINGLE_INGEST_ENV:-${SINGLE_INGEST:-false}}"
+    LIVE_SEG_SEC="${LIVE_SEG_SEC:-2}"
+    PLAYLIST_LEN="${PLAYLIST_LEN:-5}"
+    DELAY_SEC="${DELAY_SEC:-7}"
+    MAX_DELAY_SEC="${MAX_DELAY_SEC:-60}"
+}
+
+is_single_ingest() {
+    [ "$SINGLE_INGEST" = "true" ] || [ "$SINGLE_INGEST" = "1" ]
 }
 
 # -----------------------------------------------------------------------------
@@ -119,6 +168,9 @@ check_vaapi() {
 
 # Save initial CAM_URL from env/args (used as fallback if config has no URL)
 CAM_URL_INITIAL="${DVR_CAM_URL:-${CAM_URL:-${1:-}}}"
+# Env SINGLE_INGEST wins over camera.json
+SINGLE_INGEST_ENV="${SINGLE_INGEST:-}"
+HLS_DIR="${HLS_DIR:-$APP_DIR/runtime/hls}"
 
 # Initial config load (for validation)
 load_config
@@ -170,8 +222,87 @@ echo "  OUT_DIR: $OUT_DIR" | tee -a "$LOG_FILE"
 echo "  SEG_SEC: $SEG_SEC" | tee -a "$LOG_FILE"
 echo "  MAX_HOURS: $MAX_HOURS" | tee -a "$LOG_FILE"
 echo "  LATENCY_MS: $LATENCY_MS" | tee -a "$LOG_FILE"
+echo "  SINGLE_INGEST: $SINGLE_INGEST" | tee -a "$LOG_FILE"
 echo "=======================" | tee -a "$LOG_FILE"
 
+# -----------------------------------------------------------------------------
+# Live HLS for single-ingest mode
+# -----------------------------------------------------------------------------
+# Segments kept on disk must cover the largest delay the delay server serves
+hls_keep_sec() {
+    echo $(( MAX_DELAY_SEC > DELAY_SEC ? MAX_DELAY_SEC : DELAY_SEC ))
+}
+
+# hlssink writing segment<run><index>.ts; run is the start epoch (or @RUN@, filled in per start)
+hls_sink() {
+    local run="$1"
+    local max_files=$(( $(hls_keep_sec) / LIVE_SEG_SEC + PLAYLIST_LEN + 5 ))
+    echo "hlssink location=\"$HLS_DIR/segment${run}%05d.ts\" playlist-location=\"$HLS_DIR/playlist.m3u8\" target-duration=$LIVE_SEG_SEC max-files=$max_files playlist-length=$PLAYLIST_LEN"
+}
+
+# Branch appended after "tee name=t": H.264 remuxed, H.265 transcoded with VAAPI
+build_hls_branch() {
+    local codec="$1"
+    local run="$2"
+    # Drop live frames rather than back-pressure the recorder
+    local queue="queue max-size-buffers=0 max-size-bytes=0 max-size-time=3000000000 leaky=downstream"
+
+    if [ "$codec" = "h265" ]; then
+        echo "t. ! $queue ! h265parse ! vaapih265dec ! vaapipostproc ! vaapih264enc rate-control=cbr bitrate=4000 keyframe-period=30 ! h264parse config-interval=-1 ! mpegtsmux ! $(hls_sink "$run")"
+    else
+        # Remux only: SPS/PPS repeated on every IDR so each segment decodes on its own
+        echo "t. ! $queue ! h264parse config-interval=-1 ! mpegtsmux ! $(hls_sink "$run")"
+    fi
+}
+
+# Sub-stream live pipeline for the H.265-without-VAAPI fallback
+build_live_fallback() {
+    local url="$1"
+    local codec="$2"
+    local src="rtspsrc location=\"$url\" protocols=tcp latency=$LATENCY_MS timeout=5000000 retry=5"
+
+    if [ "$codec" = "h265" ]; then
+        # Sub-stream is H.265 too: a software transcode, but at sub-stream resolution
+        echo "$src ! rtph265depay ! h265parse ! avdec_h265 ! videoconvert ! x264enc tune=zerolatency bitrate=1500 key-int-max=30 speed-preset=ultrafast ! h264parse config-interval=-1 ! mpegtsmux ! $(hls_sink @RUN@)"
+    else
+        echo "$src ! rtph264depay ! h264parse config-interval=-1 ! mpegtsmux ! $(hls_sink @RUN@)"
+    fi
+}
+
+# Keep the sub-stream relay running across rotations; restart only when its pipeline changed
+start_live_fallback() {
+    local pipeline="$1"
+    if [ -n "$LIVE_PID" ] && kill -0 "$LIVE_PID" 2>/dev/null && [ "$pipeline" = "$LIVE_PIPELINE" ]; then
+        return
+    fi
+    stop_live_fallback
+    LIVE_PIPELINE="$pipeline"
+    (
+        while true; do
+            gst-launch-1.0 -e ${pipeline//@RUN@/$(date +%s)} >> "$LOG_FILE" 2>&1 || true
+            echo "[$(date '+%Y-%m-%d %H:%M:%S')] Live sub-stream relay exited, restart in 3s..." >> "$LOG_FILE"
+            sleep 3
+        done
+    ) &
+    LIVE_PID=$!
+    echo "  Live sub-stream relay started (PID: $LIVE_PID)" | tee -a "$LOG_FILE"
+}
+
+stop_live_fallback() {
+    if [ -n "$LIVE_PID" ]; then
+        # Stop the restart loop first, then let its gst-launch finish (SIGINT = EOS)
+        local children
+        children=$(pgrep -P "$LIVE_PID" 2>/dev/null || true)
+        kill "$LIVE_PID" 2>/dev/null || true
+        if [ -n "$children" ]; then
+            kill -INT $children 2>/dev/null || true
+        fi
+        wait "$LIVE_PID" 2>/dev/null || true
+    fi
+    LIVE_PID=""
+    LIVE_PIPELINE=""
+}
+
 # Adaptive retry: short wait after normal stop, longer wait after quick crash
 RETRY_WAIT=3         # Normal retry wait (seconds)
 RETRY_WAIT_MAX=15    # Max retry wait when camera keeps rejecting
@@ -230,13 +361,42 @@ while true; do
   VAAPI_OK=$(check_vaapi)
   echo "  VAAPI available: $VAAPI_OK" | tee -a "$LOG_FILE"
 
-  if [ "$CODEC" = "h265" ]; then
+  SRC="rtspsrc location=\"$CAM_URL\" protocols=tcp latency=$LATENCY_MS do-retransmission=true timeout=5000000 retry=5"
+  SPLITMUX="splitmuxsink name=mux muxer=qtmux location=\"$LOCATION_TEMPLATE\" start-index=$START_IDX max-size-time=$((SEG_SEC * 1000000000)) max-files=$MAX_FILES async-finalize=true"
+
+  if is_single_ingest; then
+    mkdir -p "$HLS_DIR"
+    # hlssink only prunes the segments of its own run; drop earlier runs once past the delay window
+    find "$HLS_DIR" -maxdepth 1 -name 'segment*.ts' -mmin +$(( $(hls_keep_sec) / 60 + 2 )) -delete 2>/dev/null || true
+  fi
+
+  if is_single_ingest && [ "$CODEC" = "h265" ] && [ "$VAAPI_OK" != "true" ]; then
+    # Live view from the sub-stream; the recorder itself only remuxes
+    PIPELINE="$SRC ! rtph265depay ! h265parse ! $SPLITMUX"
+    if [ -n "$LIVE_URL" ]; then
+      echo "  H.265 without VAAPI: live HLS from the sub-stream $LIVE_URL" | tee -a "$LOG_FILE"
+      start_live_fallback "$(build_live_fallback "$LIVE_URL" "$(detect_codec "$LIVE_URL")")"
+    else
+      echo "  WARNING: H.265 without VAAPI and no liveStream.rtspUrl, no live HLS" | tee -a "$LOG_FILE"
+      stop_live_fallback
+    fi
+  elif is_single_ingest; then
+    # One RTSP session and one depay; each branch parses into the stream format its muxer wants
+    stop_live_fallback
+    HLS_RUN=$(date +%s)
+    if [ "$CODEC" = "h265" ]; then
+      PIPELINE="$SRC ! rtph265depay ! tee name=t t. ! queue ! h265parse ! $SPLITMUX $(build_hls_branch h265 "$HLS_RUN")"
+    else
+      PIPELINE="$SRC ! rtph264depay ! tee name=t t. ! queue ! h264parse config-interval=-1 ! $SPLITMUX $(build_hls_branch h264 "$HLS_RUN")"
+    fi
+    echo "  Live HLS branch: $HLS_DIR (run $HLS_RUN)" | tee -a "$LOG_FILE"
+  elif [ "$CODEC" = "h265" ]; then
     # H.265 PASSTHROUGH: No decode/encode needed, just remux directly to MP4
     # This uses ~0% CPU vs 110% for software transcode
-    PIPELINE="rtspsrc location=\"$CAM_URL\" protocols=tcp latency=$LATENCY_MS do-retransmission=true timeout=5000000 retry=5 ! rtph265depay ! h265parse ! splitmuxsink name=mux muxer=qtmux location=\"$LOCATION_TEMPLATE\" start-index=$START_IDX max-size-time=$((SEG_SEC * 1000000000)) max-files=$MAX_FILES async-finalize=true"
+    PIPELINE="$SRC ! rtph265depay ! h265parse ! $SPLITMUX"
   else
     # H.264 PASSTHROUGH: Same approach
-    PIPELINE="rtspsrc location=\"$CAM_URL\" protocols=tcp latency=$LATENCY_MS do-retransmission=true timeout=5000000 retry=5 ! rtph264depay ! h264parse config-interval=-1 ! splitmuxsink name=mux muxer=qtmux location=\"$LOCATION_TEMPLATE\" start-index=$START_IDX max-size-time=$((SEG_SEC * 1000000000)) max-files=$MAX_FILES async-finalize=true"
+    PIPELINE="$SRC ! rtph264depay ! h264parse config-interval=-1 ! $SPLITMUX"
   fi
 
   # Run GStreamer with -e flag: SIGINT triggers EOS → splitmuxsink finalizes current segment
@@ -252,6 +412,14 @@ while true; do
   PIPELINE_END=$(date +%s)
   RUN_DURATION=$(( PIPELINE_END - PIPELINE_START ))
 
+  # Single ingest also carries the live stream, so come back quickly after the hourly rotation
+  if is_single_ingest && [ "$RUN_DURATION" -ge "$FAIL_THRESHOLD" ]; then
+    RETRY_WAIT=1
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] Recorder stopped after ${RUN_DURATION}s (normal), restart in ${RETRY_WAIT}s..." | tee -a "$LOG_FILE"
+    sleep "$RETRY_WAIT"
+    continue
+  fi
+
   # Adaptive retry backoff:
   # - If pipeline ran longer than FAIL_THRESHOLD (normal stop / hourly rotate): reset to 3s
   # - If pipeline crashed quickly (camera rejected connection): increase wait up to 15s
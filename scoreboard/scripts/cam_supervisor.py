@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Camera Supervisor - one daemon owning the relay, recorder and DVR servers
+
+Replaces the per-service shell loops (pid files, `pkill -f`) and the three
+separate Python interpreters:
+
+  relay      gst-launch-1.0 running the pipeline from `cam_delay_relay.sh
+             pipeline` (not started in single-ingest mode, where the
+             recorder writes the HLS segments)
+  recorder   cam_record_main.sh (keeps its own hourly rotation loop)
+  indexer    dvr_indexer.main()        in-process
+  delay      hls_delay_server.main()   in-process
+  clip       clip_server.main()        in-process
+
+Children are restarted with exponential backoff (reset once a run lasted
+STABLE_RUN_SEC). The in-process servers are blocking/threaded code, so each
+runs in a daemon thread awaited by its own asyncio task; one interpreter
+serves all three. A thread cannot be stopped from outside, and one that
+died may still hold its port, so when an in-process service returns or
+raises the supervisor stops its children and exits with status 1; systemd
+(Restart=always) then starts everything again.
+
+State is exposed on a unix socket (runtime/supervisor.sock), one JSON line
+per command:
+    status                 -> {"ok": true, "services": {name: {...}}}
+    restart|stop|start NAME   (external children only)
+    delay SECONDS          default delay of the running delay server
+
+CameraController sends these through the CLI below when the socket exists,
+instead of running cam_delay_relay.sh or systemctl.
+
+Usage:
+    python3 cam_supervisor.py                 run the daemon
+    python3 cam_supervisor.py status          query a running daemon
+    python3 cam_supervisor.py restart relay
+"""
+import asyncio
+import json
+import os
+import shlex
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+APP_DIR = SCRIPT_DIR.parent
+RUNTIME_DIR = APP_DIR / "runtime"
+SOCKET_PATH = RUNTIME_DIR / "supervisor.sock"
+ENV_FILE = APP_DIR / "config" / "camera.env"
+
+sys.path.insert(0, str(SCRIPT_DIR))
+
+DEFAULT_CLIP_PORT = 8580
+
+# Restart backoff: doubles after each quick failure, reset after a stable run
+BACKOFF_MIN_SEC = 1.0
+BACKOFF_MAX_SEC = 30.0
+STABLE_RUN_SEC = 30.0
+
+# How long a child gets to finish after SIGINT (gst-launch -e finalizes the segment)
+STOP_TIMEOUT_SEC = 15.0
+
+
+class Service:
+    """Common state and restart loop; subclasses implement _run_once()"""
+
+    kind = "service"
+    restartable = True
+
+    def __init__(self, name: str):
+        self.name = name
+        # Called when a non-restartable service exits (the supervisor shuts down)
+        self.on_failed: Optional[Callable[["Service"], None]] = None
+        self.state = "stopped"       # stopped, running, backoff, failed
+        self.pid: Optional[int] = None
+        self.restarts = 0
+        self.since = time.time()
+        self.last_exit: Optional[str] = None
+        self.enabled = True
+        self._task: Optional[asyncio.Task] = None
+
+    def info(self) -> dict:
+        return {"kind": self.kind, "state": self.state, "pid": self.pid, "restarts": self.restarts,
+                "since": round(self.since, 1), "lastExit": self.last_exit, "enabled": self.enabled}
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self.since = time.time()
+
+    def start(self) -> None:
+        self.enabled = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def _loop(self) -> None:
+        backoff = BACKOFF_MIN_SEC
+        while self.enabled:
+            started = time.monotonic()
+            self._set_state("running")
+            try:
+                self.last_exit = await self._run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_exit = f"error: {e}"
+            self.pid = None
+            if not self.enabled:
+                break
+            if not self.restartable:
+                print(f"[SUPERVISOR] {self.name} exited ({self.last_exit}), cannot be restarted in-process",
+                      file=sys.stderr, flush=True)
+                self._set_state("failed")
+                if self.on_failed:
+                    self.on_failed(self)
+                return
+
+            if time.monotonic() - started >= STABLE_RUN_SEC:
+                backoff = BACKOFF_MIN_SEC
+            print(f"[SUPERVISOR] {self.name} exited ({self.last_exit}), restart in {backoff:g}s",
+                  file=sys.stderr, flush=True)
+            self._set_state("backoff")
+            await asyncio.sleep(backoff)
+            backoff = min(BACKOFF_MAX_SEC, backoff * 2)
+            self.restarts += 1
+        self._set_state("stopped")
+
+    async def _run_once(self) -> str:
+        raise NotImplementedError
+
+
+class ChildProcess(Service):
+    """External program, started in its own session so the whole group can be signalled"""
+
+    kind = "process"
+
+    def __init__(self, name: str, argv: Callable[[], Awaitable[Optional[List[str]]]],
+                 log_file: Optional[Path] = None, before_start: Optional[Callable[[], None]] = None,
+                 pid_file: Optional[Path] = None):
+        super().__init__(name)
+        self._argv = argv
+        self._log_file = log_file
+        self._before_start = before_start
+        self._pid_file = pid_file
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    async def _run_once(self) -> str:
+        argv = await self._argv()
+        if not argv:
+            return "not configured"
+        if self._before_start:
+            self._before_start()
+        out = open(self._log_file, "ab") if self._log_file else None
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                *argv, stdin=asyncio.subprocess.DEVNULL, stdout=out, stderr=out, start_new_session=True,
+                env=child_env())
+        finally:
+            if out:
+                out.close()
+        self.pid = self._proc.pid
+        if self._pid_file:
+            self._pid_file.write_text(f"{self.pid}\n")
+        print(f"[SUPERVISOR] {self.name} started (PID: {self.pid})", flush=True)
+        try:
+            code = await self._proc.wait()
+        finally:
+            self._proc = None
+            if self._pid_file:
+                self._pid_file.unlink(missing_ok=True)
+        return f"exit {code}"
+
+    def _signal_group(self, sig: int) -> None:
+        if self._proc and self._proc.returncode is None:
+            try:
+                os.killpg(self._proc.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    async def terminate(self) -> None:
+        """SIGINT first so gst-launch -e / the recorder trap can finalize, then SIGKILL"""
+        proc = self._proc
+        if proc is None:
+            return
+        self._signal_group(signal.SIGINT)
+        try:
+            await asyncio.wait_for(proc.wait(), STOP_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            self._signal_group(signal.SIGKILL)
+            await proc.wait()
+
+    async def stop(self) -> None:
+        self.enabled = False
+        await self.terminate()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._set_state("stopped")
+
+    async def restart(self) -> None:
+        """Stop and start again right away, without waiting out a pending backoff"""
+        await self.stop()
+        self.start()
+        await asyncio.sleep(0)  # let the loop pick it up so info() reports "running"
+
+
+class InProcess(Service):
+    """Blocking main() of another script, run in a daemon thread of this interpreter.
+
+    Runs once: there is no way to stop the thread or close what it left open,
+    so a returned or crashed main() marks the service failed and calls
+    on_failed, which makes the supervisor exit for systemd to restart it.
+    """
+
+    kind = "thread"
+    restartable = False
+
+    def __init__(self, name: str, target: Callable[[], None]):
+        super().__init__(name)
+        self._target = target
+
+    async def _run_once(self) -> str:
+        loop = asyncio.get_running_loop()
+        done: asyncio.Future = loop.create_future()
+
+        def finish(error: Optional[BaseException]) -> None:
+            if done.done():
+                return
+            if error is None:
+                done.set_result("returned")
+            else:
+                done.set_exception(RuntimeError(repr(error)))
+
+        def runner():
+            error = None
+            try:
+                self._target()
+            except BaseException as e:  # SystemExit from argparse, etc.
+                error = e
+            try:
+                loop.call_soon_threadsafe(finish, error)
+            except RuntimeError:
+                pass  # loop already closed: the supervisor is exiting
+
+        threading.Thread(target=runner, name=self.name, daemon=True).start()
+        return await done
+
+
+# ── configuration ────────────────────────────────────────────
+
+
+def load_config() -> dict:
+    config = {"single_ingest": False, "hls_dir": str(RUNTIME_DIR / "hls"), "clip_port": DEFAULT_CLIP_PORT}
+    config_file = APP_DIR / "config" / "camera.json"
+    if config_file.exists():
+        try:
+            with open(config_file, "r") as f:
+                data = json.load(f)
+            config["single_ingest"] = bool(data.get("liveStream", {}).get("singleIngest", False))
+            config["clip_port"] = int(data.get("clipServer", {}).get("port", DEFAULT_CLIP_PORT))
+        except Exception as e:
+            print(f"Warning: Could not load config: {e}", file=sys.stderr)
+    env = os.environ.get("SINGLE_INGEST")
+    if env:
+        config["single_ingest"] = env in ("1", "true")
+    config["hls_dir"] = os.environ.get("HLS_DIR") or config["hls_dir"]
+    return config
+
+
+def child_env() -> Dict[str, str]:
+    """Environment for children: ours, with camera.env re-read.
+
+    systemd loads camera.env once when the unit starts. CameraController
+    rewrites it together with camera.json, so reading it again on every
+    (re)start lets a restart through the control socket pick up new URLs.
+    """
+    env = dict(os.environ)
+    try:
+        lines = ENV_FILE.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return env
+    for line in lines:
+        key, sep, value = line.strip().partition("=")
+        if sep and key and not key.startswith("#"):
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                value = value[1:-1]
+            env[key.strip()] = value
+    return env
+
+
+async def relay_argv() -> Optional[List[str]]:
+    """Ask cam_delay_relay.sh for the current pipeline (re-read on every restart)"""
+    proc = await asyncio.create_subprocess_exec(
+        str(SCRIPT_DIR / "cam_delay_relay.sh"), "pipeline",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=child_env())
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        print(f"[SUPERVISOR] relay: {err.decode(errors='replace').strip()}", file=sys.stderr, flush=True)
+        return None
+    pipeline = out.decode().strip()
+    return ["gst-launch-1.0", "-e", *shlex.split(pipeline)] if pipeline else None
+
+
+def clean_hls_segments(hls_dir: Path) -> None:
+    for f in hls_dir.glob("segment*.ts"):
+        try:
+            f.unlink()
+        except OSError:
+            pass
+
+
+# ── control socket ───────────────────────────────────────────
+
+
+class Supervisor:
+    def __init__(self, config: dict):
+        self.config = config
+        self.exit_code = 0
+        self._stop: Optional[asyncio.Event] = None
+        hls_dir = Path(config["hls_dir"])
+        hls_dir.mkdir(parents=True, exist_ok=True)
+
+        self.services: Dict[str, Service] = {}
+        if not config["single_ingest"]:
+            self.services["relay"] = ChildProcess(
+                "relay", relay_argv, RUNTIME_DIR / "cam_relay.log",
+                before_start=lambda: clean_hls_segments(hls_dir), pid_file=RUNTIME_DIR / "cam_relay.pid")
+
+        async def recorder_argv():
+            return [str(SCRIPT_DIR / "cam_record_main.sh")]
+
+        self.services["recorder"] = ChildProcess("recorder", recorder_argv)
+
+        import dvr_indexer
+        import hls_delay_server
+        import clip_server
+
+        self.services["indexer"] = InProcess("indexer", lambda: dvr_indexer.main([]))
+        self.services["delay"] = InProcess(
+            "delay", lambda: hls_delay_server.main(["--hls-dir", str(hls_dir)]))
+        self.services["clip"] = InProcess(
+            "clip", lambda: clip_server.main(["--port", str(config["clip_port"])]))
+        for svc in self.services.values():
+            if isinstance(svc, InProcess):
+                svc.on_failed = self._service_failed
+
+    def _service_failed(self, svc: Service) -> None:
+        """An in-process service died: exit non-zero so systemd restarts the whole set"""
+        print(f"[SUPERVISOR] {svc.name} failed; exiting for a restart by systemd", file=sys.stderr, flush=True)
+        self.exit_code = 1
+        if self._stop is not None:
+            self._stop.set()
+
+    def status(self) -> dict:
+        return {"ok": True, "singleIngest": self.config["single_ingest"],
+                "services": {name: svc.info() for name, svc in self.services.items()}}
+
+    async def handle_command(self, line: str) -> dict:
+        parts = line.split()
+        if not parts or parts[0] == "status":
+            return self.status()
+        cmd, name = parts[0], parts[1] if len(parts) > 1 else ""
+        if cmd == "delay":
+            return self.set_delay(name)
+        svc = self.services.get(name)
+        if cmd not in ("restart", "stop", "start"):
+            return {"ok": False, "error": f"unknown command: {cmd}"}
+        if svc is None:
+            return {"ok": False, "error": f"unknown service: {name}"}
+        if not isinstance(svc, ChildProcess):
+            return {"ok": False, "error": f"{name} runs in-process; restart the supervisor instead"}
+        if cmd == "stop":
+            await svc.stop()
+        elif cmd == "start":
+            svc.start()
+        else:
+            await svc.restart()
+        return {"ok": True, "service": name, **svc.info()}
+
+    def set_delay(self, value: str) -> dict:
+        """Apply a new default delay to the in-process delay server, no restart needed"""
+        import hls_delay_server
+        try:
+            delay = float(value)
+        except ValueError:
+            return {"ok": False, "error": f"invalid delay: {value!r}"}
+        if delay < 0:
+            return {"ok": False, "error": "delay must not be negative"}
+        hls_delay_server.set_default_delay(delay)
+        return {"ok": True, "delay": delay}
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = (await asyncio.wait_for(reader.readline(), 10)).decode(errors="replace").strip()
+            reply = await self.handle_command(line)
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        try:
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self) -> int:
+        """Run until SIGTERM/SIGINT (exit status 0) or an in-process service fails (1)"""
+        loop = asyncio.get_running_loop()
+        stop = self._stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        SOCKET_PATH.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._client, path=str(SOCKET_PATH))
+        print(f"[SUPERVISOR] Control socket {SOCKET_PATH}; services: {', '.join(self.services)}"
+              f"{' (single ingest)' if self.config['single_ingest'] else ''}", flush=True)
+
+        for svc in self.services.values():
+            svc.start()
+
+        await stop.wait()
+        print("[SUPERVISOR] Shutting down...", flush=True)
+        server.close()
+        # Children get to finalize their segments; in-process threads die with us
+        await asyncio.gather(*(svc.stop() for svc in self.services.values() if isinstance(svc, ChildProcess)))
+        SOCKET_PATH.unlink(missing_ok=True)
+        return self.exit_code
+
+
+def send_command(line: str, timeout: float = 20.0) -> dict:
+    """Send one command to a running supervisor (used by the CLI and CameraController)"""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(SOCKET_PATH))
+        sock.sendall((line.strip() + "\n").encode())
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data or b"{}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        try:
+            reply = send_command(" ".join(sys.argv[1:]))
+        except OSError as e:
+            print(f"Supervisor not reachable at {SOCKET_PATH}: {e}", file=sys.stderr)
+            sys.exit(2)
+        print(json.dumps(reply, indent=2))
+        sys.exit(0 if reply.get("ok") else 1)
+
+    RUNTIME_DIR.mkdir(parents=True, exist_ok=True)
+    sys.exit(asyncio.run(Supervisor(load_config()).run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,50 @@ Clip Server - HTTP server to cut video segments and provide download links
 
 Endpoints:
     GET /clip?cam=<cam>&start=<iso>&end=<iso>
-        - Cuts video from start to end time
-        - Returns JSON with download URL
+        - Submits a cut job and redirects to its job page
+          (or straight to the download when the clip already exists)
+
+    GET /jobs?cam=<cam>&start=<iso>&end=<iso>
+        - Submits a cut job and returns JSON with the job id right away
+
+    GET /jobs/<id>
+        - Returns job state as JSON: queued, cutting, ready or failed,
+          with percent done and the download URL once ready
+
+    GET /jobs/<id>/events
+        - Same as above as a server-sent events stream
+
+    GET /job/<id>
+        - Lightweight HTML page that follows the job and offers the download
+
+    GET /stream?cam=<cam>&start=<iso>&end=<iso>
+        - Streams the clip as fragmented MP4 while ffmpeg cuts it into the
+          cache file, following the file as it grows; served from the cache
+          afterwards
 
     GET /download/<filename>
-        - Serves the clipped video file
+        - Serves the clipped video file (also HEAD), with Range/206,
+          ETag/If-None-Match and If-Range support over keep-alive
+          connections; the body is sent with zero-copy sendfile
 
     GET /status
-        - Returns server status
+        - Returns server status (including cut worker pool usage and clip
+          cache hit/miss counters)
+
+    GET /qr?url=<url>[&size=<px>][&format=png|svg]
+        - Returns QR code image for the given URL: a 1-bit PNG (default) or
+          SVG. Rendered images are kept in an in-memory LRU and served with a
+          strong ETag, so repeated loads from the scoreboard are cheap
 
-    GET /qr?url=<url>
-        - Returns QR code image (PNG) for the given URL
+Cuts run on a bounded worker pool so the cheap endpoints (/qr, /status,
+/download) are always answered right away. When the pool and its queue are
+full, /clip answers 503 with a Retry-After header instead of piling up more
+ffmpeg processes. Requests for a clip that is already being cut join the
+running job instead of starting a second ffmpeg, and the clip directory is
+kept under a disk quota by evicting the least recently used clips.
 
 Usage:
-    python3 clip_server.py [--port PORT] [--host HOST]
+    python3 clip_server.py [--port PORT] [--host HOST] [--workers N] [--max-queue N]
 """
 
 import os
@@ -28,20 +58,36 @@ import subprocess
 import hashlib
 import time
 import threading
+import tempfile
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from pathlib import Path
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs, unquote
-import io
+import struct
+import zlib
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from core.dvr_resolver import DVRResolver
+from core.mp4_info import probe as probe_mp4
 
 DEFAULT_PORT = 8580
 DEFAULT_HOST = "0.0.0.0"
 CLIP_OUTPUT_DIR = Path(__file__).resolve().parent.parent / "runtime" / "clips"
 MAX_CLIP_AGE_HOURS = 24
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_QUEUE = 4
+FFMPEG_TIMEOUT_SEC = 120
+STREAM_POLL_SEC = 0.25
+MAX_JOB_AGE_SEC = 3600
+DEFAULT_MAX_CACHE_MB = 2048
+KEYFRAME_CACHE_SIZE = 512
+QR_CACHE_SIZE = 128
+QR_DEFAULT_BOX = 10
+QR_MAX_SIZE = 2048
 
 # Try to import qrcode library
 try:
@@ -52,6 +98,437 @@ except ImportError:
     print("Warning: qrcode library not installed. QR code generation disabled.", file=sys.stderr)
 
 
+class QueueFullError(Exception):
+    """Raised when the cut worker pool and its queue are both full"""
+
+
+class ClipWorkerPool:
+    """Bounded pool for ffmpeg cut jobs.
+
+    At most `workers` cuts run at once and at most `max_queue` more wait for a
+    free worker. Anything beyond that is rejected immediately so a burst of
+    replay requests cannot saturate the kiosk CPU.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="clip-cut")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+
+    def submit(self, fn, *args) -> Future:
+        """Queue fn(*args) on the pool, raising QueueFullError when saturated"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Clip queue is full")
+        with self._lock:
+            self._pending += 1
+        try:
+            return self._executor.submit(self._run, fn, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    def _run(self, fn, args):
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "maxQueue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ClipRequestError(Exception):
+    """Invalid or unserviceable clip request, carries the HTTP status to answer"""
+
+    def __init__(self, code: int, message: str, retry_after: int = 0):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class ClipJob:
+    """State of one asynchronous clip cut.
+
+    Every change bumps `version` and wakes waiters, so status requests can
+    block until something new happens instead of busy polling.
+    """
+
+    def __init__(self, job_id: str, clip_id: str, duration: float):
+        self.job_id = job_id
+        self.clip_id = clip_id
+        self.duration = duration
+        self.state = "queued"
+        self.percent = 0.0
+        self.error = ""
+        self.created = time.time()
+        self.version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("ready", "failed")
+
+    def update(self, state: str = None, percent: float = None, error: str = None):
+        with self._cond:
+            if state is not None:
+                self.state = state
+            if percent is not None:
+                self.percent = max(0.0, min(100.0, percent))
+            if error is not None:
+                self.error = error
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until the job changes past `version` (or timeout), return current version"""
+        with self._cond:
+            if self.version == version and not self.finished:
+                self._cond.wait(timeout)
+            return self.version
+
+    def to_dict(self, base_url: str) -> dict:
+        with self._cond:
+            data = {
+                "ok": self.state != "failed",
+                "jobId": self.job_id,
+                "state": self.state,
+                "percent": round(self.percent, 1),
+                "statusUrl": f"{base_url}/jobs/{self.job_id}",
+                "pageUrl": f"{base_url}/job/{self.job_id}",
+            }
+            if self.state == "ready":
+                data["downloadUrl"] = f"{base_url}/download/{self.clip_id}.mp4"
+            if self.error:
+                data["error"] = self.error
+            return data
+
+
+class ClipJobRegistry:
+    """Thread-safe registry of clip jobs, expiring finished ones after MAX_JOB_AGE_SEC.
+
+    Unfinished jobs are also indexed by clip id so concurrent requests for the
+    same clip share a single cut (single-flight).
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._active = {}  # clip_id -> unfinished ClipJob
+        self._lock = threading.Lock()
+
+    def get_or_create(self, clip_id: str, duration: float):
+        """Return (job, created): the in-flight job for clip_id, or a new one"""
+        with self._lock:
+            job = self._active.get(clip_id)
+            if job is not None and not job.finished:
+                return job, False
+            self._prune_locked()
+            job = ClipJob(uuid.uuid4().hex[:12], clip_id, duration)
+            self._jobs[job.job_id] = job
+            self._active[clip_id] = job
+            return job, True
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune_locked(self):
+        cutoff = time.time() - MAX_JOB_AGE_SEC
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished and j.created < cutoff]:
+            del self._jobs[job_id]
+        for clip_id in [c for c, j in self._active.items() if j.finished]:
+            del self._active[clip_id]
+
+
+class ClipStore:
+    """Disk-quota LRU cache of cut clips.
+
+    Entries are kept in last-access order in memory. Last access is mirrored
+    to the file atime with os.utime, so the order survives restarts even on
+    noatime mounts. Clips are evicted oldest-access first once the directory
+    exceeds max_bytes, or when not accessed for max_age_sec.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_age_sec: int = MAX_CLIP_AGE_HOURS * 3600):
+        self.directory = Path(directory)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_age_sec = max_age_sec
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # name -> (size, last_access), least recent first
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        if not self.directory.exists():
+            return
+        # Partial outputs from a cut interrupted by a restart are useless
+        for f in self.directory.glob("*.part"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+        found = []
+        for f in self.directory.glob("*.mp4"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            found.append((st.st_atime, f.name, st.st_size))
+        found.sort()
+        with self._lock:
+            for atime, name, size in found:
+                self._entries[name] = (size, atime)
+                self._total += size
+            self._evict_locked()
+
+    def lookup(self, name: str):
+        """Return the cached clip path (counting a hit) or None (counting a miss)"""
+        with self._lock:
+            if name in self._entries and self._touch_locked(name):
+                self.hits += 1
+                return self.directory / name
+            self.misses += 1
+            return None
+
+    def touch(self, name: str) -> bool:
+        """Refresh last access of a cached clip without hit/miss accounting"""
+        with self._lock:
+            return name in self._entries and self._touch_locked(name)
+
+    def record_coalesced(self):
+        with self._lock:
+            self.coalesced += 1
+
+    def add(self, name: str):
+        """Register a freshly cut clip and evict older ones if over quota"""
+        try:
+            size = (self.directory / name).stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            if name in self._entries:
+                self._total -= self._entries.pop(name)[0]
+            self._entries[name] = (size, time.time())
+            self._total += size
+            self._evict_locked(keep=name)
+
+    def sweep(self):
+        """Drop clips not accessed for max_age_sec"""
+        cutoff = time.time() - self.max_age_sec
+        with self._lock:
+            for name in [n for n, (_, last) in self._entries.items() if last < cutoff]:
+                print(f"Removing old clip: {name}", file=sys.stderr)
+                self._remove_locked(name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clipCount": len(self._entries),
+                "totalSizeMB": round(self._total / (1024 * 1024), 2),
+                "maxSizeMB": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _touch_locked(self, name: str) -> bool:
+        path = self.directory / name
+        now = time.time()
+        try:
+            os.utime(path, (now, path.stat().st_mtime))
+        except OSError:
+            # Deleted behind our back
+            self._total -= self._entries.pop(name)[0]
+            return False
+        size, _ = self._entries.pop(name)
+        self._entries[name] = (size, now)
+        return True
+
+    def _evict_locked(self, keep: str = None):
+        while self._total > self.max_bytes and self._entries:
+            name = next(iter(self._entries))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            print(f"Evicting clip over quota: {name}", file=sys.stderr)
+            self._remove_locked(name)
+            self.evictions += 1
+
+    def _remove_locked(self, name: str):
+        size, _ = self._entries.pop(name)
+        self._total -= size
+        try:
+            (self.directory / name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing clip {name}: {e}", file=sys.stderr)
+
+
+JOB_PAGE_HTML = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>AZ Pool Arena - Video</title>
+<style>
+body {{ font-family: sans-serif; background: #111; color: #eee; text-align: center; padding: 40px 16px; }}
+.bar {{ background: #333; border-radius: 6px; height: 12px; margin: 24px auto; max-width: 360px; }}
+.fill {{ background: #1976D2; border-radius: 6px; height: 12px; width: 0; transition: width .3s; }}
+a {{ display: inline-block; background: #1565C0; color: #fff; padding: 14px 28px; border-radius: 8px; text-decoration: none; }}
+</style>
+</head>
+<body>
+<h2 id="msg">Đang chờ xử lý...</h2>
+<div class="bar"><div class="fill" id="fill"></div></div>
+<a id="dl" href="#" style="display:none">Tải video</a>
+<script>
+var statusUrl = "{status_url}";
+function show(d) {{
+  document.getElementById("fill").style.width = d.percent + "%";
+  var msg = document.getElementById("msg");
+  if (d.state === "queued") msg.textContent = "Đang chờ xử lý...";
+  if (d.state === "cutting") msg.textContent = "Đang cắt video... " + Math.round(d.percent) + "%";
+  if (d.state === "failed") msg.textContent = "Lỗi: " + (d.error || "không cắt được video");
+  if (d.state === "ready") {{
+    msg.textContent = "Video đã sẵn sàng";
+    var dl = document.getElementById("dl");
+    dl.href = d.downloadUrl;
+    dl.style.display = "inline-block";
+  }}
+  return d.state === "ready" || d.state === "failed";
+}}
+function poll() {{
+  fetch(statusUrl).then(function (r) {{ return r.json(); }})
+    .then(function (d) {{ if (!show(d)) setTimeout(poll, 1000); }})
+    .catch(function () {{ setTimeout(poll, 2000); }});
+}}
+if (window.EventSource) {{
+  var es = new EventSource(statusUrl + "/events");
+  es.onmessage = function (e) {{ if (show(JSON.parse(e.data))) es.close(); }};
+  es.onerror = function () {{ es.close(); poll(); }};
+}} else {{
+  poll();
+}}
+</script>
+</body>
+</html>
+"""
+
+
+class QrCache:
+    """In-memory LRU of rendered QR images keyed by (url, size, format).
+
+    Images are drawn straight from the QR module matrix: PNG as a 1-bit
+    grayscale image encoded with zlib, SVG as a single path. Neither needs
+    PIL, and both are far cheaper to produce and decode than an RGB PNG.
+    """
+
+    FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+    def __init__(self, max_entries: int = QR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (url, size, fmt) -> (data, content_type, etag)
+        self._lock = threading.Lock()
+
+    def get(self, url: str, size: int, fmt: str):
+        """Return (data, content_type, etag), rendering on a miss"""
+        key = (url, size, fmt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        matrix = self._matrix(url)
+        box = max(1, size // len(matrix)) if size else QR_DEFAULT_BOX
+        data = self._render_svg(matrix, box) if fmt == "svg" else self._render_png(matrix, box)
+        entry = (data, self.FORMATS[fmt], '"%s"' % hashlib.sha1(data).hexdigest()[:20])
+
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _matrix(url: str):
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_M,
+            box_size=QR_DEFAULT_BOX,
+            border=2,
+        )
+        qr.add_data(url)
+        qr.make(fit=True)
+        # Includes the quiet-zone border; True = dark module
+        return qr.get_matrix()
+
+    @staticmethod
+    def _render_png(matrix, box: int) -> bytes:
+        side = len(matrix) * box
+        raw = bytearray()
+        for row in matrix:
+            # 1-bit grayscale: bit set = white
+            bits = "".join(("0" if dark else "1") * box for dark in row)
+            bits += "0" * (-len(bits) % 8)
+            line = b"\x00" + int(bits, 2).to_bytes(len(bits) // 8, "big")
+            raw += line * box
+
+        def chunk(tag: bytes, body: bytes) -> bytes:
+            return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body))
+
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 1, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(bytes(raw), 9))
+            + chunk(b"IEND", b"")
+        )
+
+    @staticmethod
+    def _render_svg(matrix, box: int) -> bytes:
+        n = len(matrix)
+        path = "".join(
+            f"M{x} {y}h1v1h-1z"
+            for y, row in enumerate(matrix)
+            for x, dark in enumerate(row)
+            if dark
+        )
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{n * box}" height="{n * box}" '
+            f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+            f'<rect width="{n}" height="{n}" fill="#fff"/><path d="{path}" fill="#000"/></svg>'
+        ).encode("utf-8")
+
+
 class ClipHandler(BaseHTTPRequestHandler):
     """HTTP handler for video clipping"""
 
@@ -59,6 +536,21 @@ class ClipHandler(BaseHTTPRequestHandler):
     seg_sec = 60
     output_dir = CLIP_OUTPUT_DIR
     server_base_url = ""
+    resolver: DVRResolver = None
+    pool: ClipWorkerPool = None
+    store: ClipStore = None
+    jobs = ClipJobRegistry()
+    qr_cache = QrCache()
+
+    # Keyframe maps of recorded segments: {file_path: (mtime_ns, (start_time, [pts, ...]))}
+    _keyframe_cache = OrderedDict()
+    _keyframe_lock = threading.Lock()
+
+    # HTTP/1.1 for keep-alive: every response must carry Content-Length
+    # (or close the connection, like the SSE stream does)
+    protocol_version = "HTTP/1.1"
+    # Drop idle keep-alive connections so they don't pin handler threads
+    timeout = 30
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -69,6 +561,16 @@ class ClipHandler(BaseHTTPRequestHandler):
 
         if path == "clip":
             self.handle_clip(parse_qs(parsed.query))
+        elif path == "jobs":
+            self.handle_job_submit(parse_qs(parsed.query))
+        elif path.startswith("jobs/") and path.endswith("/events"):
+            self.handle_job_events(path[5:-7])
+        elif path.startswith("jobs/"):
+            self.handle_job_status(path[5:])
+        elif path.startswith("job/"):
+            self.handle_job_page(path[4:])
+        elif path == "stream":
+            self.handle_stream(parse_qs(parsed.query))
         elif path.startswith("download/"):
             filename = path[9:]  # Remove "download/"
             self.handle_download(filename)
@@ -79,134 +581,428 @@ class ClipHandler(BaseHTTPRequestHandler):
         else:
             self.send_error(404, "Not found")
 
+    def do_HEAD(self):
+        path = urlparse(self.path).path.lstrip("/")
+        if path.startswith("download/"):
+            self.handle_download(path[9:], head_only=True)
+        else:
+            self.send_error(404, "Not found")
+
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header("Content-Length", "0")
         self.send_cors_headers()
         self.end_headers()
 
     def send_cors_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Range, If-None-Match, If-Range")
+        self.send_header("Access-Control-Expose-Headers", "Content-Range, Accept-Ranges, ETag")
 
     def handle_clip(self, params):
-        """Handle clip request: cut video from start to end"""
+        """Handle clip request: submit a cut job and redirect to its job page"""
         try:
-            cam = params.get("cam", ["1"])[0]
-            start_iso = params.get("start", [None])[0]
-            end_iso = params.get("end", [None])[0]
+            job = self._submit_clip(params)
+            if job.state == "ready":
+                self.send_redirect(f"{self.server_base_url}/download/{job.clip_id}.mp4")
+            else:
+                self.send_redirect(f"{self.server_base_url}/job/{job.job_id}")
+        except ClipRequestError as e:
+            self.send_json_error(e.code, str(e), retry_after=e.retry_after)
+        except Exception as e:
+            print(f"Error handling clip request: {e}", file=sys.stderr)
+            self.send_json_error(500, str(e))
 
-            if not start_iso or not end_iso:
-                self.send_json_error(400, "Missing start or end parameter")
-                return
+    def handle_job_submit(self, params):
+        """Submit a cut job and answer with its id without waiting for ffmpeg"""
+        try:
+            job = self._submit_clip(params)
+            self.send_json_response(job.to_dict(self.server_base_url), code=202)
+        except ClipRequestError as e:
+            self.send_json_error(e.code, str(e), retry_after=e.retry_after)
+        except Exception as e:
+            print(f"Error submitting clip job: {e}", file=sys.stderr)
+            self.send_json_error(500, str(e))
 
-            start_iso = unquote(start_iso)
-            end_iso = unquote(end_iso)
+    def handle_job_status(self, job_id):
+        """Return the current state of a clip job"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            self.send_json_error(404, "Job not found")
+            return
+        self.send_json_response(job.to_dict(self.server_base_url))
 
-            # Parse timestamps
-            start_dt = self._parse_iso(start_iso)
-            end_dt = self._parse_iso(end_iso)
+    def handle_job_events(self, job_id):
+        """Stream job state changes as server-sent events until the job finishes"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            self.send_json_error(404, "Job not found")
+            return
 
-            if end_dt <= start_dt:
-                self.send_json_error(400, "End time must be after start time")
-                return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.send_cors_headers()
+        self.end_headers()
+        self.close_connection = True
 
-            duration = (end_dt - start_dt).total_seconds()
-            if duration > 900:  # 15 minutes max
-                self.send_json_error(400, "Maximum clip duration is 15 minutes")
-                return
+        version = -1
+        try:
+            while True:
+                current = job.wait_for_change(version, timeout=15)
+                if current == version:
+                    # Keep idle connections alive through proxies
+                    self.wfile.write(b": ping\n\n")
+                else:
+                    version = current
+                    data = json.dumps(job.to_dict(self.server_base_url))
+                    self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if job.finished:
+                    break
+        except OSError:
+            # Disconnected, or the socket timed out (handler timeout) on a stalled phone
+            pass
+
+    def handle_job_page(self, job_id):
+        """Serve the HTML page that follows a clip job on the phone"""
+        if self.jobs.get(job_id) is None:
+            self.send_error(404, "Job not found")
+            return
 
-            # Generate unique clip filename
-            clip_id = self._generate_clip_id(cam, start_iso, end_iso)
-            output_file = self.output_dir / f"{clip_id}.mp4"
+        content = JOB_PAGE_HTML.format(status_url=f"{self.server_base_url}/jobs/{job_id}").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", len(content))
+        self.send_cors_headers()
+        self.end_headers()
+        self.wfile.write(content)
 
-            # Check if clip already exists
-            if output_file.exists():
-                download_url = f"{self.server_base_url}/download/{clip_id}.mp4"
-                self.send_redirect(download_url)
+    def handle_stream(self, params):
+        """Stream a clip to the client while it is being cut"""
+        try:
+            clip_id, start_dt, end_dt, duration = self._parse_clip_request(params)
+            name = f"{clip_id}.mp4"
+
+            job, created = self.jobs.get_or_create(clip_id, duration)
+            if not created:
+                # Someone else is cutting this clip: wait for it and serve the cached file
+                self.store.record_coalesced()
+                version = -1
+                while not job.finished:
+                    version = job.wait_for_change(version, timeout=15)
+                if job.state != "ready":
+                    raise ClipRequestError(500, job.error or "Failed to cut video")
+                self.handle_download(name, inline=True)
                 return
 
-            # Resolve video files for the time range
-            resolver = DVRResolver(self.recordings_dir, self.seg_sec)
-
-            # Get all segments that cover the time range
-            segments = self._resolve_segments(resolver, start_dt, end_dt)
+            if self.store.lookup(name) is not None:
+                job.update(state="ready", percent=100)
+                self.handle_download(name, inline=True)
+                return
 
+            segments = self._resolve_segments(start_dt, end_dt)
             if not segments:
-                self.send_json_error(404, "No recordings found for the specified time range")
-                return
+                job.update(state="failed", error="No recordings found for the specified time range")
+                raise ClipRequestError(404, "No recordings found for the specified time range")
 
-            # Create output directory
             self.output_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                self.pool.submit(self._run_job, job, segments, start_dt, end_dt, self.output_dir / name, True)
+            except QueueFullError:
+                job.update(state="failed", error="Server busy")
+                raise ClipRequestError(503, "Server busy, please retry shortly", retry_after=10)
+            self._tail_cut(job, name)
+        except ClipRequestError as e:
+            self.send_json_error(e.code, str(e), retry_after=e.retry_after)
+        except Exception as e:
+            print(f"Error streaming clip: {e}", file=sys.stderr)
+            self.send_json_error(500, str(e))
 
-            # Cut the video using ffmpeg
-            success = self._cut_video(segments, start_dt, end_dt, output_file)
+    def _parse_clip_request(self, params):
+        """Validate clip query parameters, returning (clip_id, start_dt, end_dt, duration)"""
+        cam = params.get("cam", ["1"])[0]
+        start_iso = params.get("start", [None])[0]
+        end_iso = params.get("end", [None])[0]
 
-            if not success:
-                self.send_json_error(500, "Failed to cut video")
-                return
+        if not start_iso or not end_iso:
+            raise ClipRequestError(400, "Missing start or end parameter")
 
-            download_url = f"{self.server_base_url}/download/{clip_id}.mp4"
-            self.send_redirect(download_url)
+        start_iso = unquote(start_iso)
+        end_iso = unquote(end_iso)
 
-        except Exception as e:
-            print(f"Error handling clip request: {e}", file=sys.stderr)
-            self.send_json_error(500, str(e))
+        # Parse timestamps
+        start_dt = self._parse_iso(start_iso)
+        end_dt = self._parse_iso(end_iso)
+
+        if end_dt <= start_dt:
+            raise ClipRequestError(400, "End time must be after start time")
+
+        duration = (end_dt - start_dt).total_seconds()
+        if duration > 900:  # 15 minutes max
+            raise ClipRequestError(400, "Maximum clip duration is 15 minutes")
+
+        # Generate unique clip filename
+        clip_id = self._generate_clip_id(cam, start_iso, end_iso)
+        return clip_id, start_dt, end_dt, duration
+
+    def _submit_clip(self, params) -> ClipJob:
+        """Validate a clip request and queue its cut, raising ClipRequestError on bad input"""
+        clip_id, start_dt, end_dt, duration = self._parse_clip_request(params)
+        output_file = self.output_dir / f"{clip_id}.mp4"
+
+        # Join the running cut of the same clip instead of starting another ffmpeg
+        job, created = self.jobs.get_or_create(clip_id, duration)
+        if not created:
+            self.store.record_coalesced()
+            return job
+
+        # Check if clip already exists
+        if self.store.lookup(output_file.name) is not None:
+            job.update(state="ready", percent=100)
+            return job
+
+        # Get all segments that cover the time range
+        segments = self._resolve_segments(start_dt, end_dt)
+
+        if not segments:
+            job.update(state="failed", error="No recordings found for the specified time range")
+            raise ClipRequestError(404, "No recordings found for the specified time range")
+
+        # Create output directory
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            self.pool.submit(self._run_job, job, segments, start_dt, end_dt, output_file)
+        except QueueFullError:
+            job.update(state="failed", error="Server busy")
+            raise ClipRequestError(503, "Server busy, please retry shortly", retry_after=10)
+        return job
+
+    def _tail_cut(self, job: ClipJob, name: str):
+        """Send a clip to the client while the pool cuts it, following the growing .part file.
+
+        ffmpeg writes to disk at full speed, so a slow phone only delays its
+        own response, never the cut slot or the FFMPEG_TIMEOUT_SEC watchdog
+        shared by coalesced requests. If the phone disconnects, the cut still
+        lands in the cache. Headers are only sent with the first bytes, so an
+        early failure can still be answered with a JSON error; a failure
+        mid-stream closes the connection without the final chunk, which tells
+        the client the body is truncated.
+        """
+        part_file = self.output_dir / (name + ".part")
+        version = -1
+        f = None
+        while f is None:
+            finished = job.finished
+            try:
+                f = open(part_file, "rb")
+            except FileNotFoundError:
+                if finished:
+                    # The cut ended before ffmpeg's output could be opened
+                    if job.state == "ready":
+                        self.handle_download(name, inline=True)
+                    else:
+                        self.send_json_error(500, job.error or "Failed to cut video")
+                    return
+                version = job.wait_for_change(version, timeout=STREAM_POLL_SEC)
+
+        headers_sent = False
+        with f:
+            # The open handle keeps reading the same file after it is renamed
+            # into place (or unlinked on failure)
+            while True:
+                finished = job.finished
+                chunk = f.read(65536)
+                if not chunk:
+                    if finished:
+                        break
+                    version = job.wait_for_change(version, timeout=STREAM_POLL_SEC)
+                    continue
+                try:
+                    if not headers_sent:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "video/mp4")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.send_header("Cache-Control", "no-cache")
+                        self.send_header("Content-Disposition", f'inline; filename="{name}"')
+                        self.send_cors_headers()
+                        self.end_headers()
+                        headers_sent = True
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                except OSError:
+                    # Disconnected or timed out; the cut carries on into the cache
+                    self.close_connection = True
+                    return
+
+        if job.state == "ready" and headers_sent:
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                self.close_connection = True
+        elif job.state == "ready":
+            self.handle_download(name, inline=True)
+        elif headers_sent:
+            self.close_connection = True
+        else:
+            self.send_json_error(500, job.error or "Failed to cut video")
+
+    def _run_job(self, job: ClipJob, segments, start_dt: datetime, end_dt: datetime, output_file: Path,
+                 fragmented: bool = False):
+        """Worker pool entry point: cut the clip and record the outcome on the job"""
+        job.update(state="cutting")
+        success = self._cut_video(
+            segments, start_dt, end_dt, output_file,
+            on_progress=lambda pct: job.update(percent=pct),
+            fragmented=fragmented,
+        )
+        if success:
+            self.store.add(output_file.name)
+            job.update(state="ready", percent=100)
+        else:
+            job.update(state="failed", error="Failed to cut video")
+        return success
 
     def send_redirect(self, url: str):
         """Send HTTP redirect to the given URL"""
         self.send_response(302)
         self.send_header("Location", url)
+        self.send_header("Content-Length", "0")
         self.send_cors_headers()
         self.end_headers()
 
-    def handle_download(self, filename):
-        """Serve a clipped video file"""
+    def handle_download(self, filename, head_only: bool = False, inline: bool = False):
+        """Serve a clipped video file, honouring conditional and Range requests"""
         # Sanitize filename to prevent directory traversal
         filename = Path(filename).name
         file_path = self.output_dir / filename
 
-        if not file_path.exists():
+        try:
+            f = open(file_path, "rb")
+        except OSError:
             self.send_error(404, "File not found")
             return
+        self.store.touch(filename)
+
+        with f:
+            st = os.fstat(f.fileno())
+            file_size = st.st_size
+            # Clip ids hash cam/start/end, so size+mtime identifies the content
+            etag = f'"{file_size:x}-{st.st_mtime_ns:x}"'
+            last_modified = self.date_time_string(st.st_mtime)
+
+            if self._etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                self._send_validator_headers(etag, last_modified)
+                self.send_header("Content-Length", "0")
+                self.send_cors_headers()
+                self.end_headers()
+                return
+
+            byte_range = None
+            range_header = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if range_header and (not if_range or if_range.strip() in (etag, last_modified)):
+                byte_range = self._parse_range(range_header, file_size)
+                if byte_range == "unsatisfiable":
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{file_size}")
+                    self.send_header("Content-Length", "0")
+                    self.send_cors_headers()
+                    self.end_headers()
+                    return
+
+            if byte_range:
+                offset, last = byte_range
+                length = last - offset + 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {offset}-{last}/{file_size}")
+            else:
+                offset, length = 0, file_size
+                self.send_response(200)
 
-        try:
-            file_size = file_path.stat().st_size
-            self.send_response(200)
             self.send_header("Content-Type", "video/mp4")
-            self.send_header("Content-Length", file_size)
-            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+            self.send_header("Content-Length", length)
+            self.send_header("Accept-Ranges", "bytes")
+            self._send_validator_headers(etag, last_modified)
+            disposition = "inline" if inline else "attachment"
+            self.send_header("Content-Disposition", f'{disposition}; filename="{filename}"')
             self.send_cors_headers()
             self.end_headers()
 
-            with open(file_path, "rb") as f:
-                while chunk := f.read(65536):
-                    self.wfile.write(chunk)
-        except Exception as e:
-            print(f"Error serving file: {e}", file=sys.stderr)
+            if head_only or length == 0:
+                return
+            try:
+                # socket.sendfile uses os.sendfile where available and falls
+                # back to read/send elsewhere (e.g. Windows dev machines)
+                self.connection.sendfile(f, offset, length)
+            except (BrokenPipeError, ConnectionResetError):
+                # Phone dropped the download; it will resume with a Range request
+                self.close_connection = True
+            except Exception as e:
+                print(f"Error serving file: {e}", file=sys.stderr)
+                self.close_connection = True
+
+    def _send_validator_headers(self, etag: str, last_modified: str):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "public, max-age=86400")
+
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        """If-None-Match check: "*" or any listed tag, compared weakly (W/"x" matches "x")"""
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+    @staticmethod
+    def _parse_range(header: str, file_size: int):
+        """Parse a single "bytes=a-b" range.
+
+        Returns (first, last) inclusive, None to ignore the header (malformed or
+        multi-range, answered with the full body) or "unsatisfiable".
+        """
+        unit, _, spec = header.strip().partition("=")
+        if unit.strip().lower() != "bytes" or "," in spec:
+            return None
+        first_s, sep, last_s = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first_s == "":
+                # Suffix range: last N bytes
+                suffix = int(last_s)
+                if suffix <= 0:
+                    return "unsatisfiable"
+                return max(0, file_size - suffix), file_size - 1
+            first = int(first_s)
+            last = int(last_s) if last_s else file_size - 1
+        except ValueError:
+            return None
+        if first >= file_size or last < first:
+            return "unsatisfiable"
+        return first, min(last, file_size - 1)
 
     def handle_status(self):
         """Return server status"""
-        # Count clips and calculate total size
-        clip_count = 0
-        total_size = 0
-        if self.output_dir.exists():
-            for f in self.output_dir.glob("*.mp4"):
-                clip_count += 1
-                total_size += f.stat().st_size
-
+        cache = self.store.stats()
         self.send_json_response({
             "ok": True,
-            "clipCount": clip_count,
-            "totalSizeMB": round(total_size / (1024 * 1024), 2),
+            "clipCount": cache["clipCount"],
+            "totalSizeMB": cache["totalSizeMB"],
+            "cache": cache,
             "outputDir": str(self.output_dir),
             "recordingsDir": self.recordings_dir,
             "qrCodeEnabled": HAS_QRCODE,
             "serverBaseUrl": self.server_base_url,
+            "pool": self.pool.stats() if self.pool else None,
         })
 
     def handle_qr(self, params):
-        """Generate QR code for a URL"""
+        """Serve a (cached) QR code for a URL"""
         if not HAS_QRCODE:
             self.send_json_error(500, "QR code library not installed")
             return
@@ -217,30 +1013,32 @@ class ClipHandler(BaseHTTPRequestHandler):
             return
 
         url = unquote(url)
-
+        fmt = params.get("format", ["png"])[0].lower()
+        if fmt not in QrCache.FORMATS:
+            self.send_json_error(400, "Unsupported format, use png or svg")
+            return
         try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_M,
-                box_size=10,
-                border=2,
-            )
-            qr.add_data(url)
-            qr.make(fit=True)
-
-            img = qr.make_image(fill_color="black", back_color="white")
+            size = min(QR_MAX_SIZE, max(0, int(params.get("size", ["0"])[0])))
+        except ValueError:
+            self.send_json_error(400, "Invalid size parameter")
+            return
 
-            # Convert to bytes
-            buffer = io.BytesIO()
-            img.save(buffer, format="PNG")
-            png_data = buffer.getvalue()
+        try:
+            data, content_type, etag = self.qr_cache.get(url, size, fmt)
 
-            self.send_response(200)
-            self.send_header("Content-Type", "image/png")
-            self.send_header("Content-Length", len(png_data))
+            # The image is a pure function of the query string, so it never changes
+            if self._etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                data = b""
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", len(data))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
             self.send_cors_headers()
             self.end_headers()
-            self.wfile.write(png_data)
+            self.wfile.write(data)
 
         except Exception as e:
             print(f"Error generating QR code: {e}", file=sys.stderr)
@@ -256,131 +1054,230 @@ class ClipHandler(BaseHTTPRequestHandler):
         data = f"{cam}:{start}:{end}"
         return hashlib.sha256(data.encode()).hexdigest()[:16]
 
-    def _resolve_segments(self, resolver: DVRResolver, start_dt: datetime, end_dt: datetime):
-        """Resolve all video segments covering the time range"""
-        segments = []
-        current = start_dt
+    def _resolve_segments(self, start_dt: datetime, end_dt: datetime):
+        """Resolve all video segments covering the time range in one range query"""
+        if self.resolver is None:
+            # Shared so the hour index cache survives between requests
+            ClipHandler.resolver = DVRResolver(self.recordings_dir, self.seg_sec)
 
-        while current < end_dt:
-            try:
-                result = resolver.resolve(current.isoformat())
-                seg_info = {
-                    "file_path": result.file_path,
-                    "seg_start": datetime.fromisoformat(result.seg_start_iso),
-                    "seg_end": datetime.fromisoformat(result.seg_end_iso),
-                }
-
-                # Avoid duplicates
-                if not segments or segments[-1]["file_path"] != seg_info["file_path"]:
-                    segments.append(seg_info)
-
-                # Move to next segment
-                current = seg_info["seg_end"] + timedelta(seconds=1)
-            except FileNotFoundError:
-                current += timedelta(seconds=self.seg_sec)
-            except Exception as e:
-                print(f"Error resolving segment: {e}", file=sys.stderr)
-                current += timedelta(seconds=self.seg_sec)
+        try:
+            result = self.resolver.resolve_range(start_dt.isoformat(), end_dt.isoformat())
+        except Exception as e:
+            print(f"Error resolving segments: {e}", file=sys.stderr)
+            return []
 
+        segments = []
+        for seg in result.segments:
+            seg_start = datetime.fromtimestamp(seg.start, tz=start_dt.tzinfo)
+            segments.append({
+                "file_path": seg.file_path,
+                "seg_start": seg_start,
+                "seg_end": seg_start + timedelta(seconds=seg.seg_sec),
+            })
         return segments
 
-    def _cut_video(self, segments, start_dt: datetime, end_dt: datetime, output_file: Path) -> bool:
-        """Cut video using ffmpeg"""
+    def _cut_video(self, segments, start_dt: datetime, end_dt: datetime, output_file: Path,
+                   on_progress=None, fragmented: bool = False) -> bool:
+        """Cut video using ffmpeg, reporting percent done through on_progress.
+
+        Every clip, single or multi-segment, goes through the concat demuxer
+        with per-segment inpoint/outpoint directives (see _write_concat_list),
+        so ffmpeg seeks straight to the needed GOPs instead of reading every
+        packet from the start of the first segment.
+
+        ffmpeg writes to a .part file that is renamed into place on success,
+        so a half-written clip is never served or mistaken for a cached one.
+        With `fragmented` the output is fragmented MP4 (moov first, then one
+        fragment per GOP), which /stream can send while the file grows.
+        """
+        part_file = output_file.with_name(output_file.name + ".part")
+        concat_file = output_file.parent / f"{output_file.stem}_concat.txt"
         try:
-            if len(segments) == 1:
-                # Single segment - direct cut
-                seg = segments[0]
-                ss = (start_dt - seg["seg_start"]).total_seconds()
-                duration = (end_dt - start_dt).total_seconds()
-
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-ss", str(max(0, ss)),
-                    "-i", seg["file_path"],
-                    "-t", str(duration),
-                    "-c:v", "copy",
-                    "-c:a", "copy",
-                    "-movflags", "+faststart",
-                    str(output_file)
-                ]
-            else:
-                # Multiple segments - concat then cut
-                # Create concat file
-                concat_file = output_file.parent / f"{output_file.stem}_concat.txt"
-                with open(concat_file, "w") as f:
-                    for seg in segments:
-                        f.write(f"file '{seg['file_path']}'\n")
-
-                # Calculate overall offset and duration
-                first_seg = segments[0]
-                ss = (start_dt - first_seg["seg_start"]).total_seconds()
-                duration = (end_dt - start_dt).total_seconds()
-
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-f", "concat",
-                    "-safe", "0",
-                    "-i", str(concat_file),
-                    "-ss", str(max(0, ss)),
-                    "-t", str(duration),
-                    "-c:v", "copy",
-                    "-c:a", "copy",
-                    "-movflags", "+faststart",
-                    str(output_file)
-                ]
+            duration = self._write_concat_list(segments, start_dt, end_dt, concat_file)
+
+            cmd = [
+                "ffmpeg", "-y",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(concat_file),
+                "-c:v", "copy",
+                "-c:a", "copy",
+                "-movflags", "frag_keyframe+empty_moov+default_base_moof" if fragmented else "+faststart",
+                "-progress", "pipe:1", "-nostats", "-loglevel", "error",
+                "-f", "mp4", str(part_file)
+            ]
 
             print(f"Running ffmpeg: {' '.join(cmd)}", file=sys.stderr)
-            result = subprocess.run(cmd, capture_output=True, timeout=120)
+            returncode, stderr = self._run_ffmpeg(cmd, duration, on_progress)
 
-            # Cleanup concat file if exists
-            concat_file = output_file.parent / f"{output_file.stem}_concat.txt"
-            if concat_file.exists():
-                concat_file.unlink()
-
-            if result.returncode != 0:
-                print(f"ffmpeg error: {result.stderr.decode()}", file=sys.stderr)
+            if returncode != 0 or not part_file.exists():
+                print(f"ffmpeg error: {stderr}", file=sys.stderr)
                 return False
 
-            return output_file.exists()
+            os.replace(part_file, output_file)
+            return True
 
         except Exception as e:
             print(f"Error cutting video: {e}", file=sys.stderr)
             return False
+        finally:
+            if concat_file.exists():
+                concat_file.unlink()
+            if part_file.exists():
+                part_file.unlink()
+
+    def _write_concat_list(self, segments, start_dt: datetime, end_dt: datetime, concat_file: Path) -> float:
+        """Write the concat demuxer list for the clip and return its expected duration.
+
+        The first segment gets an inpoint snapped back to the keyframe at or
+        before the requested start, the last one an outpoint snapped forward
+        to the next keyframe after the requested end. Segments in between are
+        copied whole. Without a keyframe map the unsnapped times are used.
+
+        The concat demuxer takes inpoint/outpoint as timestamps of the file
+        itself, so offsets into the segment are counted from its start_time.
+        """
+        duration = 0.0
+        with open(concat_file, "w") as f:
+            for i, seg in enumerate(segments):
+                seg_len = (seg["seg_end"] - seg["seg_start"]).total_seconds()
+                inpoint = outpoint = None
+                if i == 0 and start_dt > seg["seg_start"]:
+                    inpoint = (start_dt - seg["seg_start"]).total_seconds()
+                if i == len(segments) - 1 and end_dt < seg["seg_end"]:
+                    outpoint = (end_dt - seg["seg_start"]).total_seconds()
+
+                start_time = 0.0
+                if inpoint is not None or outpoint is not None:
+                    start_time, keyframes = self._probe_keyframes(seg["file_path"])
+                    if inpoint is not None:
+                        inpoint += start_time
+                        if keyframes:
+                            inpoint = max([k for k in keyframes if k <= inpoint] or [start_time])
+                    if outpoint is not None:
+                        outpoint += start_time
+                        if keyframes:
+                            later = [k for k in keyframes if k >= outpoint]
+                            outpoint = min(later) if later else None
+
+                path = seg["file_path"].replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+                if inpoint is not None:
+                    f.write(f"inpoint {inpoint:.3f}\n")
+                if outpoint is not None:
+                    f.write(f"outpoint {outpoint:.3f}\n")
+                first = inpoint if inpoint is not None else start_time
+                duration += (outpoint if outpoint is not None else start_time + seg_len) - first
+        return duration
+
+    def _probe_keyframes(self, file_path: str):
+        """Return (start_time, sorted keyframe timestamps) of a recorded segment, in seconds.
+
+        Read from the MP4 sample tables (ffprobe's start_time and packet flags
+        as a fallback), so nothing is decoded. Finished DVR segments never
+        change, so results are cached by path and mtime.
+        """
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return 0.0, []
+        with self._keyframe_lock:
+            cached = self._keyframe_cache.get(file_path)
+            if cached and cached[0] == mtime_ns:
+                self._keyframe_cache.move_to_end(file_path)
+                return cached[1]
+
+        info = probe_mp4(file_path, keyframes=True)
+        keyframes = list(info.keyframes) if info else []
+        start_time = info.first_sample if info else 0.0
+        try:
+            result = None if keyframes else subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "format=start_time:packet=pts_time,flags", "-of", "csv=p=0", file_path],
+                capture_output=True, text=True, timeout=10
+            )
+            if result is not None and result.returncode == 0:
+                for line in result.stdout.splitlines():
+                    pts, sep, flags = line.strip().partition(",")
+                    try:
+                        if not sep:
+                            # The format section: a lone start_time
+                            start_time = float(pts)
+                        elif "K" in flags:
+                            keyframes.append(float(pts))
+                    except ValueError:
+                        continue
+        except Exception as e:
+            print(f"Error probing keyframes of {file_path}: {e}", file=sys.stderr)
+            return 0.0, []
+        keyframes.sort()
+
+        with self._keyframe_lock:
+            self._keyframe_cache[file_path] = (mtime_ns, (start_time, keyframes))
+            while len(self._keyframe_cache) > KEYFRAME_CACHE_SIZE:
+                self._keyframe_cache.popitem(last=False)
+        return start_time, keyframes
+
+    def _run_ffmpeg(self, cmd, duration: float, on_progress=None):
+        """Run ffmpeg with `-progress pipe:1`, turning out_time into percent done.
+
+        Returns (returncode, stderr text). The process is killed after
+        FFMPEG_TIMEOUT_SEC, like the old blocking subprocess.run call.
+        """
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True)
+            watchdog = threading.Timer(FFMPEG_TIMEOUT_SEC, proc.kill)
+            watchdog.start()
+            try:
+                for line in proc.stdout:
+                    self._report_progress(line, duration, on_progress)
+                proc.wait()
+            finally:
+                watchdog.cancel()
+            err.seek(0)
+            return proc.returncode, err.read().decode(errors="replace")
+
+    @staticmethod
+    def _report_progress(line: str, duration: float, on_progress):
+        key, _, value = line.strip().partition("=")
+        # out_time_ms is in microseconds too (historic ffmpeg naming)
+        if key in ("out_time_us", "out_time_ms") and on_progress and duration > 0:
+            try:
+                on_progress(int(value) / 1_000_000 / duration * 100)
+            except ValueError:
+                pass
 
-    def send_json_response(self, data: dict):
+    def send_json_response(self, data: dict, code: int = 200):
         content = json.dumps(data, indent=2).encode("utf-8")
-        self.send_response(200)
+        self.send_response(code)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", len(content))
         self.send_cors_headers()
         self.end_headers()
         self.wfile.write(content)
 
-    def send_json_error(self, code: int, message: str):
+    def send_json_error(self, code: int, message: str, retry_after: int = 0):
         content = json.dumps({"ok": False, "error": message}).encode("utf-8")
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", len(content))
+        if retry_after:
+            self.send_header("Retry-After", str(retry_after))
         self.send_cors_headers()
         self.end_headers()
         self.wfile.write(content)
 
     def log_message(self, format, *args):
         # Only log errors
-        if "404" in str(args) or "500" in str(args):
+        if "404" in str(args) or "500" in str(args) or "503" in str(args):
             super().log_message(format, *args)
 
 
-def cleanup_old_clips():
-    """Remove clips older than MAX_CLIP_AGE_HOURS"""
+def cleanup_old_clips(store: ClipStore):
+    """Remove clips not accessed for MAX_CLIP_AGE_HOURS (size quota is enforced on every add)"""
     while True:
         try:
-            cutoff = time.time() - (MAX_CLIP_AGE_HOURS * 3600)
-            if CLIP_OUTPUT_DIR.exists():
-                for f in CLIP_OUTPUT_DIR.glob("*.mp4"):
-                    if f.stat().st_mtime < cutoff:
-                        print(f"Removing old clip: {f.name}", file=sys.stderr)
-                        f.unlink()
+            store.sweep()
         except Exception as e:
             print(f"Error cleaning up clips: {e}", file=sys.stderr)
         time.sleep(3600)  # Check every hour
@@ -392,6 +1289,9 @@ def load_config():
     config = {
         "recordings_dir": str(Path(__file__).resolve().parent.parent / "runtime" / "recordings"),
         "seg_sec": 60,
+        "workers": DEFAULT_WORKERS,
+        "max_queue": DEFAULT_MAX_QUEUE,
+        "max_cache_mb": DEFAULT_MAX_CACHE_MB,
     }
 
     if config_file.exists():
@@ -407,6 +1307,11 @@ def load_config():
                 config["recordings_dir"] = str(rec_dir.resolve())
 
             config["seg_sec"] = int(recording.get("segmentSec", 60))
+
+            clip_config = data.get("clipServer", {})
+            config["workers"] = int(clip_config.get("workers", DEFAULT_WORKERS))
+            config["max_queue"] = int(clip_config.get("maxQueue", DEFAULT_MAX_QUEUE))
+            config["max_cache_mb"] = int(clip_config.get("maxCacheMB", DEFAULT_MAX_CACHE_MB))
         except Exception as e:
             print(f"Warning: Could not load config: {e}", file=sys.stderr)
 
@@ -460,18 +1365,26 @@ def get_local_ip():
     return "127.0.0.1"
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Clip Server - Cut and download video segments")
     parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT, help="Server port")
     parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Server host")
-    args = parser.parse_args()
+    parser.add_argument("--workers", type=int, help="Concurrent ffmpeg cuts")
+    parser.add_argument("--max-queue", type=int, help="Cuts allowed to wait for a worker")
+    parser.add_argument("--max-cache-mb", type=int, help="Disk quota for cut clips in MB")
+    args = parser.parse_args(argv)
 
     config = load_config()
+    workers = args.workers if args.workers is not None else config["workers"]
+    max_queue = args.max_queue if args.max_queue is not None else config["max_queue"]
+    max_cache_mb = args.max_cache_mb if args.max_cache_mb is not None else config["max_cache_mb"]
 
     # Set class-level config
     ClipHandler.recordings_dir = config["recordings_dir"]
     ClipHandler.seg_sec = config["seg_sec"]
     ClipHandler.output_dir = CLIP_OUTPUT_DIR
+    ClipHandler.resolver = DVRResolver(config["recordings_dir"], config["seg_sec"])
+    ClipHandler.pool = ClipWorkerPool(workers, max_queue)
 
     # Determine server base URL
     local_ip = get_local_ip()
@@ -479,28 +1392,34 @@ def main():
 
     # Create output directory
     CLIP_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    ClipHandler.store = ClipStore(CLIP_OUTPUT_DIR, max_cache_mb * 1024 * 1024)
 
     # Start cleanup thread
-    cleanup_thread = threading.Thread(target=cleanup_old_clips, daemon=True)
+    cleanup_thread = threading.Thread(target=cleanup_old_clips, args=(ClipHandler.store,), daemon=True)
     cleanup_thread.start()
 
     # Start server
-    server = HTTPServer((args.host, args.port), ClipHandler)
+    server = ThreadingHTTPServer((args.host, args.port), ClipHandler)
+    server.daemon_threads = True
     print(f"""
 === Clip Server ===
   Host: {args.host}
   Port: {args.port}
   Local IP: {local_ip}
+  Workers: {ClipHandler.pool.workers} (queue {ClipHandler.pool.max_queue})
 
   Endpoints:
-    GET /clip?cam=<cam>&start=<iso>&end=<iso>  - Cut video
+    GET /clip?cam=<cam>&start=<iso>&end=<iso>  - Cut video (redirects to job page)
+    GET /jobs?cam=<cam>&start=<iso>&end=<iso>  - Submit cut job (JSON)
+    GET /jobs/<id>[/events]                     - Job status (JSON / SSE)
+    GET /stream?cam=<cam>&start=<iso>&end=<iso> - Stream clip while cutting
     GET /download/<filename>                    - Download clip
-    GET /qr?url=<url>                          - Generate QR code
+    GET /qr?url=<url>[&size=&format=png|svg]   - Generate QR code (cached)
     GET /status                                 - Server status
 
   Recordings: {config['recordings_dir']}
-  Clips: {CLIP_OUTPUT_DIR}
-  QR Code: {'Enabled' if HAS_QRCODE else 'Disabled (pip install qrcode[pil])'}
+  Clips: {CLIP_OUTPUT_DIR} (quota {max_cache_mb} MB)
+  QR Code: {'Enabled' if HAS_QRCODE else 'Disabled (pip install qrcode)'}
 ===================
 """)
 
@@ -509,6 +1428,7 @@ def main():
     except KeyboardInterrupt:
         print("\nShutting down...")
         server.shutdown()
+        ClipHandler.pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,28 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import os
 import re
 import subprocess
+import sys
 import time
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.dvr_catalog import DVRCatalog
+from core.inotify import (IN_CLOSE_WRITE, IN_CREATE, IN_DELETE_SELF, IN_IGNORED, IN_ISDIR,
+                          IN_MOVED_TO, IN_Q_OVERFLOW, Inotify)
+from core.mp4_info import probe_duration
+
+# How often rows of pruned hour directories are dropped from the catalog
+CATALOG_SWEEP_SEC = 60
+
+# Full rescan interval when inotify drives indexing (safety net for missed events)
+SWEEP_SEC = 30
 
 SEG_RE = re.compile(r"^seg_(?:.*_)?(\d{5})\.mp4$")
 
@@ -25,8 +40,11 @@ def ensure_dir(p: Path) -> None:
 
 
 def get_video_duration(file_path: Path, fallback_sec: int = 12) -> int:
-    """Get actual video duration in seconds using ffprobe.
-    Falls back to fallback_sec if ffprobe fails."""
+    """Get actual video duration in seconds from the MP4 header.
+    Falls back to ffprobe for files the parser cannot read, then to fallback_sec."""
+    duration = probe_duration(str(file_path))
+    if duration:
+        return max(1, int(duration))
     try:
         result = subprocess.run(
             ["ffprobe", "-v", "quiet", "-show_entries", "format=duration",
@@ -40,44 +58,59 @@ def get_video_duration(file_path: Path, fallback_sec: int = 12) -> int:
     return fallback_sec
 
 
-def read_last_index_start(index_file: Path) -> Optional[int]:
-    if not index_file.exists():
-        return None
-    try:
-        # Read last non-empty line
-        with index_file.open("r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-        for ln in reversed(lines):
-            ln = ln.strip()
-            if not ln:
-                continue
-            obj = json.loads(ln)
-            return int(obj.get("start"))
-    except Exception:
-        return None
+@dataclass
+class HourState:
+    """What the indexer knows about one hour directory, kept between cycles.
+
+    Filled from index.jsonl on the first visit (startup), then only extended,
+    so a cycle never re-reads a whole index file.
+    """
+    files: Dict[str, int] = field(default_factory=dict)  # file -> start
+    last_start: Optional[int] = None
+    offset: int = 0          # bytes of index.jsonl already parsed
+    ino: Optional[int] = None
+    dir_mtime_ns: int = 0
+    pending: bool = False    # segments were skipped as still being written
 
 
-def load_index_map(index_file: Path) -> Dict[str, int]:
-    m: Dict[str, int] = {}
-    if not index_file.exists():
-        return m
+def read_index_tail(index_file: Path, state: HourState) -> None:
+    """Parse lines appended to index.jsonl since the last call into `state`."""
     try:
-        with index_file.open("r", encoding="utf-8") as f:
-            for ln in f:
-                ln = ln.strip()
-                if not ln:
-                    continue
-                try:
-                    obj = json.loads(ln)
-                    fn = str(obj.get("file"))
-                    st = int(obj.get("start"))
-                    if fn and st:
-                        m[fn] = st
-                except Exception:
-                    continue
-    except Exception:
-        pass
-    return m
+        st = index_file.stat()
+    except OSError:
+        return
+    if st.st_ino != state.ino or st.st_size < state.offset:
+        # New or rewritten (e.g. by a reindex): start over
+        state.files.clear()
+        state.last_start = None
+        state.offset = 0
+        state.ino = st.st_ino
+    if st.st_size == state.offset:
+        return
+    try:
+        with index_file.open("rb") as f:
+            f.seek(state.offset)
+            data = f.read()
+    except OSError:
+        return
+
+    end = data.rfind(b"\n")
+    if end < 0:
+        return
+    state.offset += end + 1
+    for ln in data[:end].splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        try:
+            obj = json.loads(ln)
+            fn = str(obj.get("file"))
+            st_ = int(obj.get("start"))
+        except Exception:
+            continue
+        if fn and st_:
+            state.files[fn] = st_
+            state.last_start = st_
 
 
 def scan_segments(dir_path: Path) -> Tuple[Tuple[str, Path, float], ...]:
@@ -97,52 +130,120 @@ def scan_segments(dir_path: Path) -> Tuple[Tuple[str, Path, float], ...]:
     return tuple(out)
 
 
-def append_index(index_file: Path, file_name: str, start_epoch: int, seg_sec: int) -> None:
+def append_index(index_file: Path, file_name: str, start_epoch: int, seg_sec: int) -> int:
+    """Append one record, returns the number of bytes written"""
     rec = {"file": file_name, "start": int(start_epoch), "segSec": int(seg_sec)}
-    with index_file.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+    line = (json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8")
+    with index_file.open("ab") as f:
+        f.write(line)
+    return len(line)
+
+
+def hour_key(hdir: Path) -> str:
+    """Catalog key of an hour directory: YYYY-MM-DD/HH"""
+    return f"{hdir.parent.name}/{hdir.name}"
+
 
+def import_legacy_indexes(root: Path, catalog: DVRCatalog, default_seg_sec: int) -> int:
+    """Seed an empty catalog from existing per-hour index.jsonl files."""
+    total = 0
+    for index_file in sorted(root.glob("*/*/index.jsonl")):
+        total += catalog.import_index_file(index_file, default_seg_sec)
+    return total
 
-def index_one_hour_dir(hdir: Path, default_seg_sec: int) -> None:
-    """Build/extend index.jsonl for a specific hour directory."""
+
+def hour_baseline(hdir: Path, default_seg_sec: int) -> int:
+    """Start to chain the first segment of an hour from when no index exists yet."""
+    # Align baseline to the hour start - 1 segment so the first estimate won't jump backwards.
+    # If the folder name is not parseable, fall back to now.
+    try:
+        # hdir = .../<YYYY-MM-DD>/<HH>
+        hour_start = datetime.fromisoformat(hdir.parent.name + "T" + hdir.name + ":00:00")
+    except Exception:
+        hour_start = now_local().replace(minute=0, second=0, microsecond=0)
+    return int(hour_start.timestamp()) - default_seg_sec
+
+
+def estimate_start(mtime: float, duration: int, last_start: Optional[int]) -> int:
+    """Segment start from its mtime (= end of recording), kept strictly increasing."""
+    est_start = int(mtime) - duration
+    if last_start is not None and est_start <= last_start:
+        est_start = last_start + duration
+    return est_start
+
+
+def index_one_hour_dir(hdir: Path, default_seg_sec: int, catalog: Optional[DVRCatalog] = None,
+                       closed: Iterable[str] = (), state: Optional[HourState] = None) -> HourState:
+    """Build/extend index.jsonl (and the catalog) for a specific hour directory.
+
+    Files named in `closed` are known to be finalized (reported by inotify);
+    only those are looked at and they are indexed immediately instead of
+    waiting for their mtime to settle. Without `closed`, the directory is
+    scanned, unless its mtime shows nothing was added since the last visit.
+    Returns the updated state to pass in next time.
+    """
+    closed = set(closed)
+    if state is None:
+        state = HourState()
     ensure_dir(hdir)
     index_file = hdir / "index.jsonl"
-    index_map = load_index_map(index_file)
 
-    last_start = read_last_index_start(index_file)
-    if last_start is None:
-        # Align baseline to the hour start - 1 segment so the first estimate won't jump backwards.
-        # If the folder name is not parseable, fall back to now.
+    if closed:
+        segs = []
+        for fn in sorted(closed):
+            try:
+                segs.append((fn, hdir / fn, (hdir / fn).stat().st_mtime))
+            except OSError:
+                continue
+    else:
         try:
-            # hdir = .../<YYYY-MM-DD>/<HH>
-            hour_start = datetime.fromisoformat(hdir.parent.name + "T" + hdir.name + ":00:00")
-        except Exception:
-            hour_start = now_local().replace(minute=0, second=0, microsecond=0)
-        last_start = int(hour_start.timestamp()) - default_seg_sec
+            mtime_ns = hdir.stat().st_mtime_ns
+        except OSError:
+            return state
+        if mtime_ns == state.dir_mtime_ns and not state.pending:
+            return state
+        state.dir_mtime_ns = mtime_ns
+        state.pending = False
+        segs = scan_segments(hdir)
+
+    read_index_tail(index_file, state)
+    index_map = state.files
+
+    last_start = state.last_start
+    if last_start is None:
+        last_start = hour_baseline(hdir, default_seg_sec)
 
-    segs = scan_segments(hdir)
     if not segs:
-        return
+        return state
 
+    new_rows = []
     for fn, fpath, mtime in segs:
         if fn in index_map:
             continue
             
         # Ignore files that are actively being written (mtime is within the last 5 seconds)
-        if now_local().timestamp() - mtime < 5.0:
+        if fn not in closed and now_local().timestamp() - mtime < 5.0:
+            state.pending = True
             continue
 
         # Use actual video duration from ffprobe instead of config value.
         # This ensures correct start time regardless of config changes.
         actual_duration = get_video_duration(fpath, default_seg_sec)
 
-        est_start = int(mtime) - actual_duration
-        if last_start is not None and est_start <= last_start:
-            est_start = last_start + actual_duration
+        est_start = estimate_start(mtime, actual_duration, last_start)
 
-        append_index(index_file, fn, est_start, actual_duration)
+        written = append_index(index_file, fn, est_start, actual_duration)
+        if state.offset == 0 and state.ino is None:
+            state.ino = index_file.stat().st_ino
+        state.offset += written
         index_map[fn] = est_start
         last_start = est_start
+        state.last_start = est_start
+        new_rows.append((fn, est_start, actual_duration))
+
+    if catalog is not None and new_rows:
+        catalog.add_segments(hour_key(hdir), new_rows)
+    return state
 
 
 def iter_hour_dirs_last_24h(root: Path) -> Tuple[Path, ...]:
@@ -158,6 +259,154 @@ def iter_hour_dirs_last_24h(root: Path) -> Tuple[Path, ...]:
     return tuple(out)
 
 
+# ── inotify ───────────────────────────────────────────────────
+
+class RecordingsWatcher:
+    """inotify watch on root/YYYY-MM-DD/HH, reporting finalized segment files.
+
+    Linux only; raises OSError when inotify is unavailable so the caller can
+    fall back to polling.
+    """
+
+    DIR_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF
+    HOUR_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF
+
+    def __init__(self, root: Path):
+        self._inotify = Inotify()
+        self.root = root
+        self._wd: Dict[int, Path] = {}
+        self.overflowed = False
+
+        self._watch(root, self.DIR_MASK)
+        for ddir in sorted(root.iterdir()):
+            if ddir.is_dir():
+                self._watch_date_dir(ddir)
+
+    def _watch(self, path: Path, mask: int) -> None:
+        try:
+            wd = self._inotify.add_watch(str(path), mask)
+        except OSError as e:
+            print(f"[INDEXER] {e}", file=sys.stderr, flush=True)
+            return
+        self._wd[wd] = path
+
+    def _watch_date_dir(self, ddir: Path) -> None:
+        self._watch(ddir, self.DIR_MASK)
+        for hdir in sorted(ddir.iterdir()):
+            if hdir.is_dir():
+                self._watch(hdir, self.HOUR_MASK)
+
+    def wait(self, timeout: float) -> Dict[Path, Set[str]]:
+        """Block up to `timeout` seconds; returns {hour dir: finalized segment names}.
+
+        New date/hour directories are watched as they appear and reported with an
+        empty set so they get scanned. Sets `overflowed` when the kernel queue
+        overflowed and a full sweep is needed.
+        """
+        ready: Dict[Path, Set[str]] = {}
+        for wd, mask, name in self._inotify.read_events(timeout):
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self._wd.pop(wd, None)
+                continue
+            parent = self._wd.get(wd)
+            if parent is None or not name:
+                continue
+
+            path = parent / name
+            depth = len(path.relative_to(self.root).parts)
+            if mask & IN_ISDIR:
+                if depth == 1:
+                    self._watch_date_dir(path)
+                elif depth == 2:
+                    self._watch(path, self.HOUR_MASK)
+                    ready.setdefault(path, set())
+            elif depth == 3 and SEG_RE.match(name):
+                ready.setdefault(parent, set()).add(name)
+        return ready
+
+    def close(self) -> None:
+        self._inotify.close()
+
+
+# ── reindex ───────────────────────────────────────────────────
+
+def _probe_worker(args: Tuple[str, int]) -> int:
+    """Process pool entry point: duration of one segment"""
+    path, fallback_sec = args
+    return get_video_duration(Path(path), fallback_sec)
+
+
+def iter_hour_dirs_between(root: Path, first_day: str, last_day: str) -> Tuple[Path, ...]:
+    """Hour dirs (root/YYYY-MM-DD/HH) whose date is within [first_day, last_day], sorted."""
+    out = []
+    for ddir in root.glob("????-??-??"):
+        if not ddir.is_dir() or not (first_day <= ddir.name <= last_day):
+            continue
+        out.extend(h for h in ddir.iterdir() if h.is_dir() and len(h.name) == 2 and h.name.isdigit())
+    out.sort()
+    return tuple(out)
+
+
+def write_index_atomic(index_file: Path, rows: Iterable[Tuple[str, int, int]]) -> None:
+    """Replace index.jsonl in one rename so readers never see a partial file."""
+    tmp = index_file.with_name(index_file.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for fn, start, seg_sec in rows:
+            rec = {"file": fn, "start": int(start), "segSec": int(seg_sec)}
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, index_file)
+
+
+def reindex(root: Path, first_day: str, last_day: str, default_seg_sec: int,
+            catalog: Optional[DVRCatalog] = None, jobs: Optional[int] = None) -> int:
+    """Rebuild index.jsonl (and catalog rows) of every hour dir in a date range.
+
+    Segment durations are probed in parallel by a process pool; each hour's
+    index is then rewritten atomically, with start estimates chained across
+    hours in order. Returns the number of segments indexed.
+    """
+    hour_dirs = iter_hour_dirs_between(root, first_day, last_day)
+    # Skip segments still being written (mtime within the last 5 seconds); the
+    # running indexer appends them once they settle
+    settled = now_local().timestamp() - 5.0
+    listing = [(hdir, tuple(s for s in scan_segments(hdir) if s[2] <= settled)) for hdir in hour_dirs]
+    work = [(str(fpath), default_seg_sec) for _, segs in listing for _, fpath, _ in segs]
+    if not work:
+        print(f"[REINDEX] No segments between {first_day} and {last_day}", flush=True)
+        return 0
+
+    t0 = time.monotonic()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        durations = iter(pool.map(_probe_worker, work, chunksize=32))
+
+        last_start: Optional[int] = None
+        for hdir, segs in listing:
+            # Chain on from the previous hour's last segment, like the running
+            # indexer does; only the first hour starts from the baseline
+            if last_start is None:
+                last_start = hour_baseline(hdir, default_seg_sec)
+            rows = []
+            for fn, _, mtime in segs:
+                duration = next(durations)
+                last_start = estimate_start(mtime, duration, last_start)
+                rows.append((fn, last_start, duration))
+            if not rows:
+                continue
+            write_index_atomic(hdir / "index.jsonl", rows)
+            if catalog is not None:
+                catalog.replace_hour(hour_key(hdir), rows)
+
+    elapsed = max(time.monotonic() - t0, 1e-6)
+    print(f"[REINDEX] {len(work)} segments in {len(hour_dirs)} hour dirs, "
+          f"{elapsed:.1f}s ({len(work) / elapsed:.0f} segments/s)", flush=True)
+    return len(work)
+
+
 def load_seg_sec_from_config() -> int:
     """Load segment duration from camera.json config."""
     config_file = Path(__file__).resolve().parent.parent / "config" / "camera.json"
@@ -175,32 +424,119 @@ def load_seg_sec_from_config() -> int:
     return int(os.environ.get("SEG_SEC", "12"))
 
 
-def main():
-    root = Path(os.environ.get("OUT_DIR", "runtime/recordings")).expanduser().resolve()
-    seg_sec = load_seg_sec_from_config()
-    poll = float(os.environ.get("POLL_SEC", "0.5"))
+def sweep(root: Path, seg_sec: int, catalog: DVRCatalog, states: Dict[Path, HourState]) -> None:
+    """Scan every hour dir of the last 24h (plus the current one)."""
+    # Index current hour + any existing hour dirs in the last 24h.
+    # This fixes cases where the recorder wrote segments into a non-current hour folder.
+    hour_dirs = list(iter_hour_dirs_last_24h(root))
+
+    # Always include the current hour dir even if empty (so index is created as soon as segments appear).
+    cur = hour_dir_for(now_local(), root)
+    if cur not in hour_dirs:
+        hour_dirs.append(cur)
+
+    for hdir in sorted(hour_dirs):
+        try:
+            states[hdir] = index_one_hour_dir(hdir, seg_sec, catalog, state=states.get(hdir))
+        except Exception:
+            # Keep indexer resilient
+            continue
+
+    # Drop state of hours that aged out of the window
+    for stale in set(states) - set(hour_dirs):
+        del states[stale]
 
-    ensure_dir(root)
 
+def forget_pruned_hours(catalog: DVRCatalog) -> None:
+    """Forget hours removed by the pruning job"""
+    try:
+        catalog.remove_missing_hours()
+    except Exception:
+        pass
+
+
+def run_poll_loop(root: Path, seg_sec: int, catalog: DVRCatalog, poll: float) -> None:
+    states: Dict[Path, HourState] = {}
+    last_sweep = 0.0
+    while True:
+        sweep(root, seg_sec, catalog, states)
+        if time.time() - last_sweep >= CATALOG_SWEEP_SEC:
+            last_sweep = time.time()
+            forget_pruned_hours(catalog)
+        time.sleep(poll)
+
+
+def run_event_loop(root: Path, seg_sec: int, catalog: DVRCatalog, watcher: RecordingsWatcher,
+                   sweep_sec: float = SWEEP_SEC) -> None:
+    """Index segments as the recorder closes them; rescan only every sweep_sec."""
+    states: Dict[Path, HourState] = {}
+    last_sweep = 0.0
+    last_catalog_sweep = time.time()
     while True:
-        # Index current hour + any existing hour dirs in the last 24h.
-        # This fixes cases where the recorder wrote segments into a non-current hour folder.
-        hour_dirs = list(iter_hour_dirs_last_24h(root))
+        if watcher.overflowed or time.time() - last_sweep >= sweep_sec:
+            watcher.overflowed = False
+            last_sweep = time.time()
+            sweep(root, seg_sec, catalog, states)
 
-        # Always include the current hour dir even if empty (so index is created as soon as segments appear).
-        cur = hour_dir_for(now_local(), root)
-        if cur not in hour_dirs:
-            hour_dirs.append(cur)
+        if time.time() - last_catalog_sweep >= CATALOG_SWEEP_SEC:
+            last_catalog_sweep = time.time()
+            forget_pruned_hours(catalog)
 
-        for hdir in sorted(hour_dirs):
+        timeout = max(0.0, sweep_sec - (time.time() - last_sweep))
+        for hdir, names in watcher.wait(timeout).items():
             try:
-                index_one_hour_dir(hdir, seg_sec)
+                states[hdir] = index_one_hour_dir(hdir, seg_sec, catalog, closed=names,
+                                                  state=states.get(hdir))
             except Exception:
-                # Keep indexer resilient
                 continue
 
-        time.sleep(poll)
 
+def reindex_main(argv) -> None:
+    today = now_local().strftime("%Y-%m-%d")
+    parser = argparse.ArgumentParser(prog="dvr_indexer.py reindex",
+                                     description="Rebuild DVR indexes for a date range")
+    parser.add_argument("--from", dest="first_day", default=today, help="First day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--to", dest="last_day", help="Last day, YYYY-MM-DD (default: --from)")
+    parser.add_argument("--root", help="Recordings root (default: $OUT_DIR)")
+    parser.add_argument("--jobs", "-j", type=int, help="Probe processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    root = Path(args.root or os.environ.get("OUT_DIR", "runtime/recordings")).expanduser().resolve()
+    last_day = args.last_day or args.first_day
+    reindex(root, args.first_day, last_day, load_seg_sec_from_config(), DVRCatalog(str(root)), args.jobs)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "reindex":
+        reindex_main(argv[1:])
+        return
+
+    root = Path(os.environ.get("OUT_DIR", "runtime/recordings")).expanduser().resolve()
+    seg_sec = load_seg_sec_from_config()
+    poll = float(os.environ.get("POLL_SEC", "0.5"))
+    sweep_sec = float(os.environ.get("SWEEP_SEC", SWEEP_SEC))
+
+    ensure_dir(root)
+
+    catalog = DVRCatalog(str(root))
+    if catalog.is_empty():
+        imported = import_legacy_indexes(root, catalog, seg_sec)
+        if imported:
+            print(f"[INDEXER] Imported {imported} segments from index.jsonl into catalog", flush=True)
+
+    watcher = None
+    if os.environ.get("INDEXER_MODE", "inotify") != "poll":
+        try:
+            watcher = RecordingsWatcher(root)
+            print(f"[INDEXER] Watching {root} with inotify, sweep every {sweep_sec:g}s", flush=True)
+        except OSError as e:
+            print(f"[INDEXER] inotify unavailable ({e}), polling every {poll}s", file=sys.stderr, flush=True)
+
+    if watcher is not None:
+        run_event_loop(root, seg_sec, catalog, watcher, sweep_sec)
+    else:
+        run_poll_loop(root, seg_sec, catalog, poll)
 
 if __name__ == "__main__":
     main()
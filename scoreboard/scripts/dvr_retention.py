@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+DVR Retention - keeps the recordings root within its age and disk budget
+
+Replaces prune_recordings.sh. Works on whole hour directories
+(root/YYYY-MM-DD/HH), so a pass costs O(hour directories) instead of a
+`find` over every segment:
+
+  1. Hours older than recording.maxHours are deleted. Only the boundary hour
+     is trimmed file by file, its index.jsonl rewritten atomically.
+  2. If disk usage is above the high watermark, the oldest remaining hours
+     are deleted until usage drops below the low watermark.
+
+Hours overlapping a tournament match (TournamentService start times) are kept
+for protectMatchHours instead of maxHours, and are only sacrificed by the
+watermark pass after every ordinary hour is gone. Deleted hours are removed
+from the shared DVR catalog first, so nothing resolves to a missing file.
+
+Config (camera.json, all optional):
+    recording.maxHours                      default 24 (env MAX_HOURS)
+    recording.retention.highWatermarkPct    default 90
+    recording.retention.lowWatermarkPct     default 80
+    recording.retention.protectMatchHours   default 72
+    recording.retention.intervalSec         default 300
+
+Usage:
+    python3 dvr_retention.py [--once] [--dry-run]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.dvr_catalog import DVRCatalog
+from dvr_indexer import hour_key, write_index_atomic
+
+APP_DIR = Path(__file__).resolve().parent.parent
+RUNTIME_DIR = APP_DIR / "runtime"
+
+DEFAULT_MAX_HOURS = 24
+DEFAULT_HIGH_WATERMARK = 90
+DEFAULT_LOW_WATERMARK = 80
+DEFAULT_PROTECT_MATCH_HOURS = 72
+DEFAULT_INTERVAL_SEC = 300
+
+# Footage kept on either side of a match
+MATCH_PAD_SEC = 15 * 60
+
+# Hours that ended less than this ago may still receive the last segment
+ACTIVE_GRACE_SEC = 120
+
+
+@dataclass
+class HourDir:
+    path: Path
+    start: int   # epoch of HH:00:00 local time
+
+    @property
+    def end(self) -> int:
+        return self.start + 3600
+
+    @property
+    def key(self) -> str:
+        return hour_key(self.path)
+
+
+def list_hour_dirs(root: Path) -> List[HourDir]:
+    """Hour directories under root, oldest first"""
+    out = []
+    with os.scandir(root) as days:
+        for day in days:
+            if not day.is_dir() or len(day.name) != 10:
+                continue
+            with os.scandir(day.path) as hours:
+                for hour in hours:
+                    if not hour.is_dir():
+                        continue
+                    try:
+                        start = datetime.fromisoformat(f"{day.name}T{hour.name}:00:00")
+                    except ValueError:
+                        continue
+                    out.append(HourDir(Path(hour.path), int(start.timestamp())))
+    out.sort(key=lambda h: h.start)
+    return out
+
+
+def load_match_windows(now: float) -> List[Tuple[float, float]]:
+    """(start, end) of tournament matches, padded; running matches end at now"""
+    windows = []
+    try:
+        starts = json.loads((RUNTIME_DIR / "match_start_times.json").read_text())
+        windows += [(float(v), now) for v in starts.values()]
+    except Exception:
+        pass
+    try:
+        finished = json.loads((RUNTIME_DIR / "match_windows.json").read_text())
+        windows += [(float(a), float(b)) for a, b in finished]
+    except Exception:
+        pass
+    return [(a - MATCH_PAD_SEC, b + MATCH_PAD_SEC) for a, b in windows]
+
+
+def is_protected(hour: HourDir, windows: List[Tuple[float, float]]) -> bool:
+    return any(a < hour.end and b > hour.start for a, b in windows)
+
+
+def disk_used_pct(root: Path) -> float:
+    usage = shutil.disk_usage(root)
+    return 100.0 * usage.used / usage.total if usage.total else 0.0
+
+
+class Retention:
+    def __init__(self, root: Path, max_hours: float, high_pct: float, low_pct: float,
+                 protect_hours: float, dry_run: bool = False):
+        self.root = root
+        self.max_hours = max_hours
+        self.high_pct = high_pct
+        self.low_pct = low_pct
+        self.protect_hours = protect_hours
+        self.dry_run = dry_run
+        self.catalog = DVRCatalog(str(root))
+
+    def delete_hour(self, hour: HourDir, reason: str) -> None:
+        print(f"[RETENTION] Deleting {hour.key} ({reason})", flush=True)
+        if self.dry_run:
+            return
+        # Catalog first: once the rows are gone nothing resolves into the directory
+        self.catalog.remove_hour(hour.key)
+        shutil.rmtree(hour.path, ignore_errors=True)
+        try:
+            hour.path.parent.rmdir()  # date dir, only succeeds when empty
+        except OSError:
+            pass
+
+    def trim_hour(self, hour: HourDir, cutoff: float) -> None:
+        """Delete segments of one hour that ended before cutoff, rewriting its index atomically"""
+        index_file = hour.path / "index.jsonl"
+        keep, drop = [], []
+        try:
+            with index_file.open("r", encoding="utf-8") as f:
+                for ln in f:
+                    try:
+                        obj = json.loads(ln)
+                        row = (str(obj["file"]), int(obj["start"]), int(obj.get("segSec") or 0))
+                    except Exception:
+                        continue
+                    (drop if row[1] + row[2] < cutoff else keep).append(row)
+        except OSError:
+            return
+        if not drop:
+            return
+        print(f"[RETENTION] Trimming {len(drop)} segments from {hour.key}", flush=True)
+        if self.dry_run:
+            return
+        write_index_atomic(index_file, keep)
+        self.catalog.replace_hour(hour.key, keep)
+        for fn, _, _ in drop:
+            try:
+                (hour.path / fn).unlink()
+            except OSError:
+                pass
+
+    def run_once(self) -> None:
+        if not self.root.is_dir():
+            return
+        now = time.time()
+        windows = load_match_windows(now)
+        age_cutoff = now - self.max_hours * 3600
+        protect_cutoff = now - self.protect_hours * 3600
+
+        # 1. Age
+        remaining = []
+        for hour in list_hour_dirs(self.root):
+            protected = is_protected(hour, windows)
+            cutoff = protect_cutoff if protected else age_cutoff
+            if hour.end <= cutoff:
+                self.delete_hour(hour, "match hour expired" if protected else "older than maxHours")
+                continue
+            if hour.start < cutoff:
+                self.trim_hour(hour, cutoff)
+            remaining.append((hour, protected))
+
+        # 2. Disk watermark: ordinary hours first, then protected ones
+        used = disk_used_pct(self.root)
+        if used < self.high_pct:
+            return
+        print(f"[RETENTION] Disk {used:.1f}% used (high watermark {self.high_pct}%)", flush=True)
+        candidates = [h for h, p in remaining if not p] + [h for h, p in remaining if p]
+        for hour in candidates:
+            if hour.end > now - ACTIVE_GRACE_SEC:
+                continue
+            self.delete_hour(hour, f"disk above {self.high_pct}%")
+            if self.dry_run or disk_used_pct(self.root) <= self.low_pct:
+                break
+
+        used = disk_used_pct(self.root)
+        if used > self.low_pct and not self.dry_run:
+            print(f"[RETENTION] Disk still {used:.1f}% used, nothing left to delete", file=sys.stderr, flush=True)
+
+
+def load_config() -> dict:
+    config = {
+        "recordings_dir": os.environ.get("OUT_DIR") or str(APP_DIR / "runtime" / "recordings"),
+        "max_hours": float(os.environ.get("MAX_HOURS", DEFAULT_MAX_HOURS)),
+        "high_pct": DEFAULT_HIGH_WATERMARK,
+        "low_pct": DEFAULT_LOW_WATERMARK,
+        "protect_hours": DEFAULT_PROTECT_MATCH_HOURS,
+        "interval": DEFAULT_INTERVAL_SEC,
+    }
+    config_file = APP_DIR / "config" / "camera.json"
+    if config_file.exists():
+        try:
+            with open(config_file, "r") as f:
+                data = json.load(f)
+            rec = data.get("recording", {})
+            retention = rec.get("retention", {})
+            out_dir = rec.get("outputDir") or data.get("_legacy", {}).get("recordingsDir")
+            if out_dir and "OUT_DIR" not in os.environ:
+                p = Path(out_dir)
+                config["recordings_dir"] = str(p if p.is_absolute() else APP_DIR / p)
+            if rec.get("maxHours") and "MAX_HOURS" not in os.environ:
+                config["max_hours"] = float(rec["maxHours"])
+            config["high_pct"] = float(retention.get("highWatermarkPct", config["high_pct"]))
+            config["low_pct"] = float(retention.get("lowWatermarkPct", config["low_pct"]))
+            config["protect_hours"] = float(retention.get("protectMatchHours", config["protect_hours"]))
+            config["interval"] = float(retention.get("intervalSec", config["interval"]))
+        except Exception as e:
+            print(f"Warning: Could not load config: {e}", file=sys.stderr)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DVR Retention - prune recordings by age and disk usage")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be deleted")
+    args = parser.parse_args()
+
+    config = load_config()
+    root = Path(config["recordings_dir"]).expanduser().resolve()
+    root.mkdir(parents=True, exist_ok=True)
+    retention = Retention(root, config["max_hours"], config["high_pct"], config["low_pct"],
+                          max(config["protect_hours"], config["max_hours"]), args.dry_run)
+    print(f"[RETENTION] {root}: maxHours={config['max_hours']:g}, "
+          f"watermarks {config['high_pct']:g}%/{config['low_pct']:g}%, "
+          f"match hours kept {config['protect_hours']:g}h", flush=True)
+
+    while True:
+        try:
+            retention.run_once()
+        except Exception as e:
+            print(f"[RETENTION] Pass failed: {e}", file=sys.stderr, flush=True)
+        if args.once:
+            return
+        time.sleep(config["interval"])
+
+
+if __name__ == "__main__":
+    main()
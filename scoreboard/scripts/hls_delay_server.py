@@ -5,6 +5,10 @@ HLS Delay Server - Serves HLS segments with configurable delay
 This server acts as a proxy between the HLS segment files and the client,
 introducing a configurable delay by only serving segments that are old enough.
 
+Playlists support LL-HLS blocking reload: `?_HLS_msn=N` holds the request
+until segment N is due at the requested delay (at most three target
+durations), so LL-HLS players wait for the next segment instead of polling.
+
 Usage:
     python3 hls_delay_server.py [--port PORT] [--delay SECONDS] [--hls-dir DIR]
 """
@@ -14,16 +18,493 @@ import time
 import json
 import argparse
 import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
 import re
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.inotify import IN_CLOSE_WRITE, IN_DELETE, IN_MOVED_TO, IN_Q_OVERFLOW, Inotify
+
 # Default configuration
 DEFAULT_PORT = 8555
 DEFAULT_DELAY = 7
 DEFAULT_HLS_DIR = None  # Will be set from config or args
 
+# Segments remembered by the ring (hlssink keeps max-files on disk anyway)
+RING_SIZE = 256
+
+# Without inotify, how often a request may re-check the raw playlist's mtime
+POLL_INTERVAL_SEC = 0.2
+
+# Segment bodies kept in RAM (2s segments: ~1 minute)
+DEFAULT_CACHE_SEGMENTS = 32
+
+# Largest ?delay= a client may ask for (the relay must keep that much on disk)
+DEFAULT_MAX_DELAY = 60
+
+# Distinct delays whose playlists are kept built
+MAX_DELAY_VIEWS = 8
+
+# Blocking reload (EXT-X-SERVER-CONTROL) needs protocol version 9
+HLS_VERSION = 9
+SERVER_CONTROL = '#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES'
+
+EMPTY_PLAYLIST = f"""#EXTM3U\n#EXT-X-VERSION:{HLS_VERSION}\n#EXT-X-TARGETDURATION:2\n{SERVER_CONTROL}\n#EXT-X-MEDIA-SEQUENCE:{{}}\n"""
+
+SEG_NUM_RE = re.compile(r'segment_?(\d+)\.ts$')
+
+
+def _extract_seg_num(filename: str) -> int:
+    # Allow segment_00001.ts and segment00001.ts
+    m = SEG_NUM_RE.search(filename)
+    return int(m.group(1)) if m else -1
+
+
+def _format_pdt(epoch: float) -> str:
+    """ISO-8601 local time with milliseconds and offset, as EXT-X-PROGRAM-DATE-TIME wants"""
+    return datetime.fromtimestamp(epoch).astimezone().isoformat(timespec='milliseconds')
+
+
+@dataclass
+class Segment:
+    num: int
+    name: str
+    duration: float
+    arrived: float  # wall clock when the relay finished writing it
+    disc: int = -1  # discontinuity sequence number, assigned once in _sorted_nums
+
+
+class SegmentRing:
+    """Live in-memory view of the HLS directory.
+
+    Holds segment numbers, durations and arrival times, updated from inotify
+    events (segment closed, raw playlist rewritten, segment deleted) instead
+    of re-reading the directory on every request. Where inotify is
+    unavailable the raw playlist's mtime is checked at most every
+    POLL_INTERVAL_SEC. The delayed playlist is rebuilt once per change and
+    served from memory.
+
+    Only finished segments are admitted: those hlssink has listed (or
+    numbered at or before its newest listed one, which it wrote earlier) and
+    those whose IN_CLOSE_WRITE was seen. The file hlssink is still writing
+    is never published, timed or cached.
+    """
+
+    def __init__(self, hls_dir: str, delay_seconds: float, cache_segments: int = DEFAULT_CACHE_SEGMENTS):
+        self.hls_dir = Path(hls_dir)
+        self.playlist_path = self.hls_dir / 'playlist.m3u8'
+        self.delay_seconds = delay_seconds
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # notified on every ring change
+        self._segments: Dict[int, Segment] = {}
+        self._raw = ''
+        self._raw_nums: List[int] = []   # segment numbers listed in the raw playlist
+        self._target_duration = 2.0
+        self._version = 0
+        # delay -> (cache key, playlist text, segments due next); one entry per view
+        self._views: "OrderedDict[float, tuple]" = OrderedDict()
+        self._nums: List[int] = []
+        self._nums_version = -1
+        self._raw_mtime_ns = 0
+        self._last_poll = 0.0
+        self._inotify: Optional[Inotify] = None
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_size = max(1, cache_segments)
+        self._closed: "OrderedDict[int, None]" = OrderedDict()  # IN_CLOSE_WRITE seen
+
+    # ── updates ──────────────────────────────────────────────
+
+    def load(self) -> None:
+        """(Re)build from the raw playlist and the finished segments on disk"""
+        parsed = self._read_playlist()
+        newest = max((num for num, _, _ in parsed[2]), default=-1) if parsed else -1
+        with self._lock:
+            segments = {}
+            for f in self.hls_dir.glob('segment*.ts'):
+                num = _extract_seg_num(f.name)
+                if num < 0 or (num > newest and num not in self._closed):
+                    continue  # possibly still being written
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                segments[num] = self._segments.get(num) or Segment(num, f.name, 0.0, st.st_mtime)
+                cached = self._cache.get(num)
+                if cached is not None and len(cached) != st.st_size:
+                    del self._cache[num]
+            self._segments = segments
+            for num in [n for n in self._cache if n not in segments]:
+                del self._cache[num]
+            self._bump()
+        if parsed:
+            self._apply_playlist(*parsed)
+
+    def reload_playlist(self) -> None:
+        """Re-parse the raw playlist written by hlssink"""
+        parsed = self._read_playlist()
+        if parsed:
+            self._apply_playlist(*parsed)
+
+    def _read_playlist(self) -> Optional[Tuple[str, int, List[Tuple[int, str, float]], float]]:
+        """(raw text, mtime_ns, [(num, filename, duration)], target duration) of hlssink's playlist"""
+        try:
+            st = self.playlist_path.stat()
+            with open(self.playlist_path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        except OSError:
+            return None
+
+        target_duration = self._target_duration
+        entries = []  # (num, filename, duration)
+        duration = None
+        for ln in raw.splitlines():
+            ln = ln.strip()
+            if ln.startswith('#EXT-X-TARGETDURATION:'):
+                try:
+                    target_duration = float(ln.split(':', 1)[1])
+                except ValueError:
+                    pass
+            elif ln.startswith('#EXTINF:'):
+                try:
+                    duration = float(ln.split(':', 1)[1].split(',', 1)[0])
+                except ValueError:
+                    duration = None
+            elif ln.endswith('.ts'):
+                num = _extract_seg_num(ln)
+                if num >= 0:
+                    entries.append((num, ln, duration or target_duration))
+                duration = None
+        return raw, st.st_mtime_ns, entries, target_duration
+
+    def _apply_playlist(self, raw: str, mtime_ns: int, entries: List[Tuple[int, str, float]],
+                        target_duration: float) -> None:
+        # Arrival = when hlssink closed the file
+        now = time.time()
+        arrived = {}
+        for num, name, _ in entries:
+            try:
+                arrived[num] = (self.hls_dir / name).stat().st_mtime
+            except OSError:
+                arrived[num] = now
+
+        with self._lock:
+            self._raw = raw
+            self._raw_mtime_ns = mtime_ns
+            self._target_duration = target_duration
+            self._raw_nums = [num for num, _, _ in entries]
+            for num, name, dur in entries:
+                seg = self._segments.get(num)
+                if seg is None:
+                    self._segments[num] = Segment(num, name, dur, arrived[num])
+                else:
+                    seg.duration = dur
+            if len(self._segments) > RING_SIZE:
+                for num in sorted(self._segments)[:len(self._segments) - RING_SIZE]:
+                    del self._segments[num]
+                    self._cache.pop(num, None)
+            self._bump()
+
+    def _bump(self) -> None:
+        """Record a ring change and wake blocked playlist requests (caller holds the lock)"""
+        self._version += 1
+        self._changed.notify_all()
+
+    def segment_closed(self, name: str) -> None:
+        """hlssink finished writing a segment: admit it, timed now, and forget stale cached bytes"""
+        num = _extract_seg_num(name)
+        now = time.time()
+        with self._lock:
+            self._closed[num] = None
+            while len(self._closed) > RING_SIZE:
+                self._closed.popitem(last=False)
+            self._cache.pop(num, None)
+            seg = self._segments.get(num)
+            if seg is None:
+                # Duration is corrected once the raw playlist lists it
+                self._segments[num] = Segment(num, name, self._target_duration, now)
+            elif seg.name == name:
+                seg.arrived = now
+            self._bump()
+
+    def remove_segment(self, name: str) -> None:
+        num = _extract_seg_num(name)
+        with self._lock:
+            self._cache.pop(num, None)
+            self._closed.pop(num, None)
+            if self._segments.pop(num, None) is not None:
+                self._bump()
+
+    def start_watching(self) -> bool:
+        """Follow the HLS dir with inotify in a background thread; False if unavailable"""
+        try:
+            self._inotify = Inotify()
+            self._inotify.add_watch(str(self.hls_dir), IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE)
+        except OSError as e:
+            print(f"[DELAY_SERVER] inotify unavailable ({e}), checking playlist mtime per request",
+                  file=sys.stderr)
+            self._inotify = None
+            return False
+        threading.Thread(target=self._watch_loop, daemon=True).start()
+        return True
+
+    def _watch_loop(self) -> None:
+        while True:
+            changed = False
+            for _wd, mask, name in self._inotify.read_events(5.0):
+                if mask & IN_Q_OVERFLOW:
+                    self.load()
+                elif name == 'playlist.m3u8' and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed = True
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and SEG_NUM_RE.search(name):
+                    self.segment_closed(name)
+                    changed = True
+                elif mask & IN_DELETE and SEG_NUM_RE.search(name):
+                    self.remove_segment(name)
+            if changed:
+                self.reload_playlist()
+                self._rebuild_views()
+
+    def _rebuild_views(self) -> None:
+        """Rebuild every delay's playlist after a change and prefetch what they need next"""
+        for delay in self.delays():
+            self.playlist(delay=delay)
+        self.prefetch()
+
+    def _poll(self) -> None:
+        """Fallback when not watching: reload if the raw playlist changed"""
+        if self._inotify is not None:
+            return
+        now = time.monotonic()
+        if now - self._last_poll < POLL_INTERVAL_SEC:
+            return
+        self._last_poll = now
+        try:
+            mtime_ns = self.playlist_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns != self._raw_mtime_ns:
+            self.load()
+            # Throttled above, so the playlist() calls in here return without polling again
+            self._rebuild_views()
+
+    # ── segment bodies ───────────────────────────────────────
+
+    def _read_into_cache(self, num: int) -> Optional[bytes]:
+        with self._lock:
+            seg = self._segments.get(num)
+        if seg is None:
+            return None
+        try:
+            data = (self.hls_dir / seg.name).read_bytes()
+        except OSError:
+            return None
+        with self._lock:
+            if num in self._segments:
+                self._cache[num] = data
+                self._cache.move_to_end(num)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return data
+
+    def prefetch(self) -> None:
+        """Load the delayed windows and the next due segments into RAM ahead of playback"""
+        with self._lock:
+            due = dict.fromkeys(n for view in self._views.values() for n in view[2])
+            wanted = [n for n in due if n not in self._cache][:self._cache_size]
+        for num in wanted:
+            self._read_into_cache(num)
+
+    def get_segment(self, name: str) -> Optional[bytes]:
+        """Segment body from RAM, read from disk (and cached) on a miss"""
+        num = _extract_seg_num(name)
+        with self._lock:
+            data = self._cache.get(num)
+            seg = self._segments.get(num)
+            if data is not None and seg is not None and seg.name == name:
+                self._cache.move_to_end(num)
+                return data
+            if seg is None or seg.name != name:
+                return None
+        return self._read_into_cache(num)
+
+    # ── reads ────────────────────────────────────────────────
+
+    @property
+    def target_duration(self) -> float:
+        return self._target_duration
+
+    def raw_playlist(self) -> str:
+        self._poll()
+        with self._lock:
+            return self._raw
+
+    def delays(self) -> List[float]:
+        """Delays with a built playlist (the default one first)"""
+        with self._lock:
+            return [self.delay_seconds] + [d for d in self._views if d != self.delay_seconds]
+
+    def playlist(self, now: Optional[float] = None, delay: Optional[float] = None) -> str:
+        """Delayed playlist for `delay` seconds (default: the configured delay).
+
+        Every delay is cut from the same segments; each view is rebuilt only
+        when the ring or its eligible window changed.
+        """
+        self._poll()
+        now = time.time() if now is None else now
+        delay = self.delay_seconds if delay is None else round(delay, 1)
+        with self._lock:
+            end_num = self._eligible_end(now, delay)
+            key = (self._version, end_num)
+            view = self._views.get(delay)
+            if view is None or view[0] != key:
+                text, due, next_seq = self._build_playlist(end_num, delay, view[3] if view else 0)
+                view = (key, text, due, next_seq)
+                self._views[delay] = view
+            self._views.move_to_end(delay)
+            while len(self._views) > MAX_DELAY_VIEWS:
+                self._views.popitem(last=False)
+            return view[1]
+
+    def wait_for_msn(self, msn: int, delay: Optional[float] = None, timeout: float = 6.0) -> Optional[bool]:
+        """Block until segment `msn` is in the delayed playlist (LL-HLS `_HLS_msn`).
+
+        Segments become due on wall-clock time, so the wait sleeps until the
+        segment's arrival + delay, or until the ring changes if it has not
+        arrived yet. Returns True when available, False on timeout and None when
+        msn is too far ahead of the playlist to ever be waited for.
+        """
+        delay = self.delay_seconds if delay is None else round(delay, 1)
+        deadline = time.monotonic() + timeout
+        while True:
+            self._poll()
+            with self._changed:
+                now = time.time()
+                end_num = self._eligible_end(now, delay)
+                if end_num is not None and end_num >= msn:
+                    return True
+                # Per the LL-HLS spec, more than two past the playlist's last segment is an error
+                last = end_num if end_num is not None else (self._sorted_nums() or [None])[-1]
+                if last is not None and msn > last + 2:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                seg = self._segments.get(msn)
+                if seg is not None:
+                    remaining = min(remaining, max(0.01, seg.arrived + delay - now))
+                if self._inotify is None:
+                    remaining = min(remaining, POLL_INTERVAL_SEC)
+                self._changed.wait(remaining)
+
+    def _sorted_nums(self) -> List[int]:
+        if self._nums_version != self._version:
+            self._nums = sorted(self._segments)
+            self._nums_version = self._version
+            self._number_discontinuities()
+        return self._nums
+
+    def _number_discontinuities(self) -> None:
+        """Give new segments their discontinuity sequence number (caller holds the lock).
+
+        A gap in segment numbers starts a new discontinuity. Numbers are kept
+        once assigned, so EXT-X-DISCONTINUITY-SEQUENCE never goes back when
+        the tagged segment slides out of the window or the ring.
+        """
+        segments = [self._segments[num] for num in self._nums]
+        # Segments older than every numbered one (e.g. re-read from disk) join the oldest run
+        first = next((seg.disc for seg in segments if seg.disc >= 0), 0)
+        prev = None
+        for seg in segments:
+            if seg.disc < 0:
+                seg.disc = first if prev is None else prev.disc + (seg.num != prev.num + 1)
+            prev = seg
+
+    def _eligible_end(self, now: float, delay: float) -> Optional[int]:
+        """Newest segment that finished at least `delay` seconds ago (caller holds the lock)"""
+        cutoff = now - delay
+        nums = self._sorted_nums()
+        i = len(nums)
+        while i > 0 and self._segments[nums[i - 1]].arrived > cutoff:
+            i -= 1
+        return nums[i - 1] if i else None
+
+    def _build_playlist(self, end_num: Optional[int], delay: float,
+                        next_seq: int = 0) -> Tuple[str, List[int], int]:
+        """Tạo playlist delay theo thời gian thực (gọi khi đang giữ lock).
+
+        Lý do phải làm kiểu này:
+        - Playlist gốc của `hlssink` chỉ có `playlist-length` segment (vd 5).
+        - Nếu delaySec lớn hơn window này, muốn delay đúng bắt buộc phải "lùi" về
+          các segment cũ hơn trong thư mục.
+
+        Chiến lược:
+        - Mỗi segment có thời điểm hoàn tất (`arrived`, theo mtime của file).
+        - Cửa sổ kết thúc ở segment mới nhất đã "đủ tuổi" (now - arrived >= delaySec),
+          nên delay không lệch theo độ dài segment và không nhảy khi segment không đều.
+        - Cửa sổ gồm N segment (N = số segment trong playlist gốc).
+        - Mỗi segment kèm `EXT-X-PROGRAM-DATE-TIME` = thời điểm bắt đầu ghi,
+          để player/replay khớp đúng với giờ của DVR.
+
+        Playlist rỗng (chưa đủ tuổi, hoặc segment đã bị xoá hết) giữ MEDIA-SEQUENCE
+        = `next_seq` (ngay sau segment cuối đã phát) để sequence không lùi về 0.
+
+        Trả về (playlist, các segment sắp đến lượt để prefetch, next_seq mới).
+        """
+        nums = self._sorted_nums()
+        if end_num is None or not self._raw_nums:
+            if nums:
+                print(f"[DELAY_SERVER] INFO: Not enough segments to meet {delay}s delay. Waiting...", file=sys.stderr)
+            return EMPTY_PLAYLIST.format(next_seq), nums[:2], next_seq
+
+        window = max(1, len(self._raw_nums))
+        end_idx = nums.index(end_num)
+        window_nums = nums[max(0, end_idx - window + 1):end_idx + 1]
+        # The window plus everything that will become due next, for prefetch
+        due = nums[max(0, end_idx - window + 1):]
+
+        durations = [self._segments[n].duration or self._target_duration for n in window_nums]
+        target = max([int(self._target_duration)] + [int(math.ceil(d)) for d in durations])
+        out = [
+            '#EXTM3U',
+            f'#EXT-X-VERSION:{HLS_VERSION}',
+            f'#EXT-X-TARGETDURATION:{target}',
+            SERVER_CONTROL,
+            f'#EXT-X-MEDIA-SEQUENCE:{window_nums[0]}',
+            f'#EXT-X-DISCONTINUITY-SEQUENCE:{self._segments[window_nums[0]].disc}',
+            ''
+        ]
+
+        prev = None
+        for n, dur in zip(window_nums, durations):
+            seg = self._segments[n]
+            if prev is not None and seg.disc != prev:
+                out.append('#EXT-X-DISCONTINUITY')
+            out.append(f'#EXT-X-PROGRAM-DATE-TIME:{_format_pdt(seg.arrived - dur)}')
+            out.append(f'#EXTINF:{dur:.6f},')
+            out.append(seg.name)
+            prev = seg.disc
+
+        return '\n'.join(out), due, window_nums[-1] + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            nums = sorted(self._segments)
+            return {
+                'segments': len(nums),
+                'oldest': nums[0] if nums else None,
+                'newest': nums[-1] if nums else None,
+                'cached': len(self._cache),
+                'cached_bytes': sum(len(d) for d in self._cache.values()),
+                'watching': self._inotify is not None,
+                'delays': list(self._views),
+            }
+
 
 class DelayedHLSHandler(SimpleHTTPRequestHandler):
     """HTTP handler that serves HLS with delay"""
@@ -31,6 +512,12 @@ class DelayedHLSHandler(SimpleHTTPRequestHandler):
     # Class-level config (set before server starts)
     hls_dir = "."
     delay_seconds = 7
+    max_delay = DEFAULT_MAX_DELAY
+    ring: SegmentRing = None
+
+    # Keep-alive: the player fetches playlist + segments over one connection
+    protocol_version = "HTTP/1.1"
+    timeout = 30
 
     def __init__(self, *args, **kwargs):
         # Set the directory to serve from
@@ -42,30 +529,52 @@ class DelayedHLSHandler(SimpleHTTPRequestHandler):
         path = parsed.path.lstrip('/')
 
         if path == 'playlist.m3u8' or path.endswith('/playlist.m3u8'):
-            self.serve_delayed_playlist()
+            self.serve_delayed_playlist(parse_qs(parsed.query))
         elif path.endswith('.ts'):
-            # Serve segment files normally (delay is in playlist)
-            super().do_GET()
+            # Segments come from the RAM ring (delay is in playlist)
+            self.serve_segment(path.rsplit('/', 1)[-1])
         elif path == 'status':
             self.serve_status()
         else:
             super().do_GET()
 
-    def serve_delayed_playlist(self):
-        """Generate and serve a delayed playlist"""
-        playlist_path = Path(self.hls_dir) / 'playlist.m3u8'
+    def serve_delayed_playlist(self, params):
+        """Serve the delayed playlist from the segment ring.
 
-        if not playlist_path.exists():
+        ?delay=N picks another offset (0 = near-live) from the same segments.
+        ?_HLS_msn=N holds the request until segment N is due (blocking reload),
+        at most 3 target durations. There are no partial segments, so
+        _HLS_part=M waits for all of segment N.
+        """
+        delay = None
+        if 'delay' in params:
+            try:
+                delay = float(params['delay'][0])
+            except ValueError:
+                delay = -1
+            if not 0 <= delay <= self.max_delay:
+                self.send_error(400, f"delay must be between 0 and {self.max_delay:g}")
+                return
+
+        if not self.ring.playlist_path.exists():
             self.send_error(404, "Playlist not found")
             return
 
-        try:
-            with open(playlist_path, 'r', encoding='utf-8') as f:
-                original = f.read()
-
-            delayed_playlist = self.create_delayed_playlist(original)
+        if '_HLS_msn' in params or '_HLS_part' in params:
+            try:
+                msn = int(params['_HLS_msn'][0])
+                if '_HLS_part' in params:
+                    int(params['_HLS_part'][0])
+            except (KeyError, ValueError):
+                self.send_error(400, "_HLS_msn must be an integer (and _HLS_part needs it)")
+                return
+            timeout = 3 * max(1.0, self.ring.target_duration)
+            if self.ring.wait_for_msn(msn, delay, timeout) is None:
+                self.send_error(400, "_HLS_msn is too far ahead of the playlist")
+                return
 
-            content = delayed_playlist.encode('utf-8')
+        try:
+            content = self.ring.playlist(delay=delay).encode('utf-8')
             self.send_response(200)
             self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
             self.send_header('Content-Length', len(content))
@@ -78,130 +587,27 @@ class DelayedHLSHandler(SimpleHTTPRequestHandler):
             self.log_error(f"Error serving playlist: {e}")
             self.send_error(500, str(e))
 
-    @staticmethod
-    def _extract_seg_num(filename: str) -> int:
-        # Allow segment_00001.ts and segment00001.ts
-        m = re.search(r'segment_?(\d+)\.ts', filename)
-        return int(m.group(1)) if m else -1
-
-    def create_delayed_playlist(self, original_playlist):
-        """Tạo playlist delay ổn định.
-
-        Lý do phải làm kiểu này:
-        - Playlist gốc của `hlssink` chỉ có `playlist-length` segment (vd 5).
-        - Nếu delaySec lớn hơn window này, muốn delay đúng bắt buộc phải "lùi" về
-          các segment cũ hơn trong thư mục.
-
-        Chiến lược:
-        - Parse playlist gốc để lấy `target_duration`, `media_sequence` và segment mới nhất.
-        - Tính `delay_segments = ceil(delaySec / segment_duration)`.
-        - Scan thư mục `segment*.ts` để lấy danh sách segment theo số thứ tự.
-        - Chọn một "cửa sổ" gồm N segment kết thúc ở (latest - delay_segments).
-        """
-        raw_lines = [ln.strip() for ln in original_playlist.splitlines()]
-
-        target_duration = 2.0
-        seg_entries = []  # (duration, filename) from original playlist
-
-        for ln in raw_lines:
-            if not ln:
-                continue
-            if ln.startswith('#EXT-X-TARGETDURATION:'):
-                try:
-                    target_duration = float(ln.split(':', 1)[1])
-                except Exception:
-                    target_duration = 2.0
-            elif ln.startswith('#EXTINF:'):
-                try:
-                    dur_part = ln.split(':', 1)[1]
-                    dur = float(dur_part.split(',', 1)[0])
-                except Exception:
-                    dur = target_duration
-                seg_entries.append([dur, None])
-            elif ln.endswith('.ts'):
-                if seg_entries and seg_entries[-1][1] is None:
-                    seg_entries[-1][1] = ln
-
-        seg_entries = [(d, f) for (d, f) in seg_entries if f]
-
-        if not seg_entries:
-            return """#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n"""
-
-        seg_duration = seg_entries[0][0] if seg_entries[0][0] > 0 else target_duration
-        if seg_duration <= 0: seg_duration = 2.0
-
-        delay_segments = int(math.ceil(self.delay_seconds / seg_duration)) if self.delay_seconds > 0 else 0
-
-        # Parse MEDIA-SEQUENCE của raw playlist để "bám" sát delaySec.
-        raw_media_sequence = None
-        for ln in raw_lines:
-            if ln.startswith('#EXT-X-MEDIA-SEQUENCE:'):
-                try:
-                    raw_media_sequence = int(ln.split(':', 1)[1])
-                except Exception:
-                    raw_media_sequence = None
-                break
-
-        if raw_media_sequence is None:
-            return """#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n"""
-
-        # Với HLS live: MEDIA-SEQUENCE là số của segment ĐẦU TIÊN trong playlist raw.
-        # segment cuối (latest trong raw window) = raw_media_sequence + (len(seg_entries)-1)
-        latest_num = raw_media_sequence + (len(seg_entries) - 1)
-
-        # Scan thư mục để map num -> filename (dùng để lấy đúng file segment)
-        hls_path = Path(self.hls_dir)
-        all_files = sorted(
-            [
-                (self._extract_seg_num(f.name), f.name)
-                for f in hls_path.glob('segment*.ts')
-                if self._extract_seg_num(f.name) >= 0
-            ]
-        )
-        if not all_files:
-            return original_playlist
-
-        min_num, max_num = all_files[0][0], all_files[-1][0]
-
-        # Tính end_num theo delaySegments để bám sát delaySec
-        end_num = latest_num - delay_segments
-
-        if end_num < min_num:
-            print(f"[DELAY_SERVER] INFO: Not enough segments to meet {self.delay_seconds}s delay. Waiting... (end_num={end_num} < min_num={min_num})", file=sys.stderr)
-            return """#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n"""
-
-        window = max(1, len(seg_entries))
-        start_num = max(min_num, end_num - (window - 1))
-
-        file_map = dict(all_files)
-        out = [
-            '#EXTM3U',
-            '#EXT-X-VERSION:3',
-            f'#EXT-X-TARGETDURATION:{int(target_duration)}',
-            f'#EXT-X-MEDIA-SEQUENCE:{start_num}',
-            ''
-        ]
-
-        for n in range(start_num, end_num + 1):
-            f = file_map.get(n)
-            if f:
-                out.append(f'#EXTINF:{seg_duration:.6f},')
-                out.append(f)
-
-        # Debug log
-        # print(f"[DELAY_SERVER] latest={latest_num}, delay_segs={delay_segments}, start={start_num}, end={end_num}", file=sys.stderr)
-
-        return '\n'.join(out)
+    def serve_segment(self, name: str):
+        """Serve a .ts segment from memory"""
+        data = self.ring.get_segment(name)
+        if data is None:
+            self.send_error(404, "Segment not found")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp2t')
+        self.send_header('Content-Length', len(data))
+        self.send_header('Cache-Control', 'max-age=60')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
 
     def serve_status(self):
         """Serve status information as JSON"""
-        playlist_path = Path(self.hls_dir) / 'playlist.m3u8'
-        status = {'delay_seconds': self.delay_seconds, 'hls_dir': str(self.hls_dir)}
+        status = {'delay_seconds': self.delay_seconds, 'max_delay': self.max_delay, 'hls_dir': str(self.hls_dir)}
         try:
-            with open(playlist_path, 'r', encoding='utf-8') as f:
-                original = f.read()
-            status['raw_playlist'] = original
-            status['delayed_playlist'] = self.create_delayed_playlist(original)
+            status['raw_playlist'] = self.ring.raw_playlist()
+            status['delayed_playlist'] = self.ring.playlist()
+            status['ring'] = self.ring.stats()
         except Exception as e:
             status['error'] = str(e)
 
@@ -221,7 +627,8 @@ class DelayedHLSHandler(SimpleHTTPRequestHandler):
 def load_config():
     """Load configuration from camera.json (new structure first, then legacy)"""
     config_file = Path(__file__).resolve().parent.parent / 'config' / 'camera.json'
-    config = {'delay': DEFAULT_DELAY, 'port': DEFAULT_PORT, 'hls_dir': str(config_file.parent.parent / 'runtime' / 'hls')}
+    config = {'delay': DEFAULT_DELAY, 'port': DEFAULT_PORT, 'max_delay': DEFAULT_MAX_DELAY,
+              'hls_dir': str(config_file.parent.parent / 'runtime' / 'hls')}
     if config_file.exists():
         try:
             with open(config_file, 'r') as f:
@@ -233,16 +640,28 @@ def load_config():
 
             config['delay'] = live.get('delaySec') or legacy.get('delaySec', DEFAULT_DELAY)
             config['port'] = live.get('delayServerPort') or legacy.get('delayServerPort', DEFAULT_PORT)
+            config['max_delay'] = live.get('maxDelaySec') or DEFAULT_MAX_DELAY
         except Exception as e:
             print(f"Warning: Could not load config: {e}", file=sys.stderr)
     return config
 
-def main():
+def set_default_delay(delay: float) -> None:
+    """Change the delay of playlists requested without ?delay= while serving (cam_supervisor `delay`)"""
+    DelayedHLSHandler.delay_seconds = delay
+    DelayedHLSHandler.max_delay = max(DelayedHLSHandler.max_delay, delay)
+    if DelayedHLSHandler.ring is not None:
+        DelayedHLSHandler.ring.delay_seconds = delay
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description='HLS Delay Server')
     parser.add_argument('--port', '-p', type=int, help='Server port')
     parser.add_argument('--delay', '-d', type=float, help='Delay in seconds')
     parser.add_argument('--hls-dir', type=str, help='HLS segments directory')
-    args = parser.parse_args()
+    parser.add_argument('--cache-segments', type=int, default=DEFAULT_CACHE_SEGMENTS,
+                        help='Segments kept in RAM')
+    parser.add_argument('--max-delay', type=float, help='Largest ?delay= clients may request')
+    args = parser.parse_args(argv)
 
     config = load_config()
     port = args.port or config['port']
@@ -254,9 +673,14 @@ def main():
 
     DelayedHLSHandler.hls_dir = str(hls_path)
     DelayedHLSHandler.delay_seconds = delay
-
-    server = HTTPServer(('127.0.0.1', port), DelayedHLSHandler)
-    print(f"=== HLS Delay Server ===\n  Port: {port}\n  Delay: {delay} seconds\n  HLS Dir: {hls_dir}\n  Stream URL: http://127.0.0.1:{port}/playlist.m3u8\n  Status URL: http://127.0.0.1:{port}/status\n========================")
+    DelayedHLSHandler.max_delay = max(delay, args.max_delay if args.max_delay is not None else config['max_delay'])
+    DelayedHLSHandler.ring = SegmentRing(str(hls_path), delay, args.cache_segments)
+    DelayedHLSHandler.ring.load()
+    DelayedHLSHandler.ring.start_watching()
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), DelayedHLSHandler)
+    server.daemon_threads = True
+    print(f"=== HLS Delay Server ===\n  Port: {port}\n  Delay: {delay} seconds\n  HLS Dir: {hls_dir}\n  Stream URL: http://127.0.0.1:{port}/playlist.m3u8 (?delay=0..{DelayedHLSHandler.max_delay:g})\n  Status URL: http://127.0.0.1:{port}/status\n========================")
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# The app is not an installed package: core.* resolves from the scoreboard
+# directory and the standalone servers are imported straight from scripts/
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
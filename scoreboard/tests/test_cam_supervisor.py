@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import cam_supervisor
+from cam_supervisor import ChildProcess, InProcess, Supervisor
+
+
+def make_supervisor(tmp_path, monkeypatch, services):
+    monkeypatch.setattr(cam_supervisor, "SOCKET_PATH", tmp_path / "supervisor.sock")
+    sup = Supervisor({"single_ingest": True, "hls_dir": str(tmp_path / "hls"), "clip_port": 0})
+    for svc in services.values():
+        if isinstance(svc, InProcess):
+            svc.on_failed = sup._service_failed
+    sup.services = services
+    return sup
+
+
+def test_failed_in_process_service_exits_non_zero(tmp_path, monkeypatch):
+    keep_running = threading.Event()
+
+    def crash():
+        raise OSError("address in use")
+
+    async def sleeper_argv():
+        return ["sleep", "30"]
+
+    sleeper = ChildProcess("sleeper", sleeper_argv)
+    sup = make_supervisor(tmp_path, monkeypatch, {
+        "ok": InProcess("ok", keep_running.wait),
+        "crash": InProcess("crash", crash),
+        "sleeper": sleeper,
+    })
+    try:
+        assert asyncio.run(asyncio.wait_for(sup.run(), 20)) == 1
+    finally:
+        keep_running.set()
+    assert sup.services["crash"].state == "failed"
+    assert "address in use" in sup.services["crash"].last_exit
+    # Children were stopped on the way out, not left behind
+    assert sleeper.state == "stopped" and sleeper.pid is None
+    assert not (tmp_path / "supervisor.sock").exists()
+
+
+def test_delay_command_updates_the_running_delay_server(tmp_path, monkeypatch):
+    import hls_delay_server
+    from hls_delay_server import DelayedHLSHandler, SegmentRing
+
+    ring = SegmentRing(str(tmp_path), 7)
+    monkeypatch.setattr(DelayedHLSHandler, "ring", ring)
+    monkeypatch.setattr(DelayedHLSHandler, "delay_seconds", 7)
+    monkeypatch.setattr(DelayedHLSHandler, "max_delay", 10)
+    sup = make_supervisor(tmp_path, monkeypatch, {})
+
+    assert asyncio.run(sup.handle_command("delay 12")) == {"ok": True, "delay": 12.0}
+    assert ring.delay_seconds == DelayedHLSHandler.delay_seconds == 12.0
+    assert DelayedHLSHandler.max_delay == 12.0
+    assert hls_delay_server.DelayedHLSHandler.ring is ring
+    assert not asyncio.run(sup.handle_command("delay soon"))["ok"]
+    assert not asyncio.run(sup.handle_command("delay -1"))["ok"]
+
+
+def test_children_see_the_current_env_file(tmp_path, monkeypatch):
+    env_file = tmp_path / "camera.env"
+    monkeypatch.setattr(cam_supervisor, "ENV_FILE", env_file)
+    monkeypatch.setenv("CAM_URL", "rtsp://old")
+    assert cam_supervisor.child_env()["CAM_URL"] == "rtsp://old"
+
+    env_file.write_text('# comment\nCAM_URL=rtsp://new/1\nDVR_CAM_URL="rtsp://dvr"\n\nDELAY_SEC=9\n')
+    env = cam_supervisor.child_env()
+    assert (env["CAM_URL"], env["DVR_CAM_URL"], env["DELAY_SEC"]) == ("rtsp://new/1", "rtsp://dvr", "9")
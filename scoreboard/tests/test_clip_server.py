@@ -0,0 +1,430 @@
+import http.client
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import clip_server
+from clip_server import (ClipHandler, ClipJob, ClipJobRegistry, ClipRequestError, ClipStore,
+                         ClipWorkerPool, QrCache, QueueFullError)
+
+parse_range = ClipHandler._parse_range
+etag_matches = ClipHandler._etag_matches
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-19", (10, 19)),
+    ("bytes=90-500", (90, 99)),        # last clamped to the file
+    ("bytes=50-", (50, 99)),           # open-ended
+    ("bytes=-10", (90, 99)),           # suffix: last 10 bytes
+    ("bytes=-500", (0, 99)),           # suffix longer than the file
+    (" Bytes = 5-6 ", (5, 6)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=20-10", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    assert parse_range(header, 100) == "unsatisfiable"
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-9,20-29",                 # multiple ranges: served as a plain 200
+    "bytes=-5, 0-1",
+    "items=0-9",
+    "bytes=abc-",
+    "bytes=5",
+])
+def test_parse_range_ignored(header):
+    assert parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('W/"ab"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches_weak_comparison(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    (tmp_path / "clip.mp4").write_bytes(bytes(range(100)))
+    monkeypatch.setattr(ClipHandler, "output_dir", tmp_path)
+    monkeypatch.setattr(ClipHandler, "store", ClipStore(tmp_path, 10 * 1024 * 1024))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ClipHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(port, method="GET", headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, "/download/clip.mp4", headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+
+def test_download_range_requests(server):
+    status, headers, body = fetch(server, headers={"Range": "bytes=-10"})
+    assert status == 206
+    assert headers["Content-Range"] == "bytes 90-99/100"
+    assert body == bytes(range(90, 100))
+
+    status, headers, body = fetch(server, headers={"Range": "bytes=95-"})
+    assert status == 206
+    assert body == bytes(range(95, 100))
+
+    status, headers, body = fetch(server, headers={"Range": "bytes=0-1,5-9"})
+    assert status == 200
+    assert body == bytes(range(100))
+
+    status, headers, body = fetch(server, headers={"Range": "bytes=100-"})
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */100"
+    assert body == b""
+
+
+def test_download_conditional_requests(server):
+    status, headers, _ = fetch(server, method="HEAD")
+    assert status == 200
+    etag = headers["ETag"]
+
+    assert fetch(server, headers={"If-None-Match": etag})[0] == 304
+    assert fetch(server, headers={"If-None-Match": "W/" + etag})[0] == 304
+    assert fetch(server, headers={"If-None-Match": '"stale"'})[0] == 200
+
+    # If-Range with a stale validator ignores the Range header
+    status, _, body = fetch(server, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert status == 200 and len(body) == 100
+    status, _, body = fetch(server, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert status == 206 and body == bytes(range(10))
+
+
+
+# ── worker pool and job registry ─────────────────────────────
+
+
+def test_worker_pool_rejects_beyond_workers_plus_queue():
+    pool = ClipWorkerPool(workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(release.wait, 5)
+        with pytest.raises(QueueFullError):
+            pool.submit(release.wait, 5)
+        deadline = time.monotonic() + 5
+        while pool.stats()["running"] != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.stats() == {"workers": 1, "maxQueue": 1, "running": 1, "queued": 1}
+
+        release.set()
+        running.result(5)
+        queued.result(5)
+        # Slots are given back once jobs finish
+        assert pool.submit(lambda: 42).result(5) == 42
+        assert pool.stats()["running"] == 0 and pool.stats()["queued"] == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_job_registry_single_flight():
+    jobs = ClipJobRegistry()
+    job, created = jobs.get_or_create("clip", 10)
+    assert created and jobs.get(job.job_id) is job
+    assert jobs.get_or_create("clip", 10) == (job, False)
+    assert jobs.get_or_create("other", 10)[1]
+
+    # A finished job is not joined: the next request starts a new cut
+    job.update(state="failed", error="boom")
+    again, created = jobs.get_or_create("clip", 10)
+    assert created and again is not job
+    assert jobs.get(job.job_id) is job
+
+
+def test_job_wait_for_change_and_to_dict():
+    job = ClipJob("j1", "c1", 10)
+    started = time.monotonic()
+    assert job.wait_for_change(job.version, timeout=0.1) == 0
+    assert time.monotonic() - started >= 0.1
+
+    threading.Timer(0.05, job.update, kwargs={"state": "cutting", "percent": 140}).start()
+    assert job.wait_for_change(0, timeout=5) == 1
+    assert job.to_dict("http://x") == {
+        "ok": True, "jobId": "j1", "state": "cutting", "percent": 100.0,
+        "statusUrl": "http://x/jobs/j1", "pageUrl": "http://x/job/j1",
+    }
+
+    job.update(state="ready")
+    # Finished jobs never block
+    assert job.wait_for_change(job.version, timeout=5) == 2
+    assert job.to_dict("http://x")["downloadUrl"] == "http://x/download/c1.mp4"
+
+    job.update(state="failed", error="No recordings")
+    data = job.to_dict("http://x")
+    assert data["ok"] is False and data["error"] == "No recordings" and "downloadUrl" not in data
+
+
+@pytest.fixture
+def submitter(tmp_path, monkeypatch):
+    """A handler (no socket) whose cuts block until released"""
+    handler = ClipHandler.__new__(ClipHandler)
+    handler.output_dir = tmp_path
+    handler.store = ClipStore(tmp_path, 10 * 1024 * 1024)
+    handler.jobs = ClipJobRegistry()
+    handler.pool = ClipWorkerPool(workers=1, max_queue=0)
+    handler.release = threading.Event()
+    handler.cuts = []
+    handler._resolve_segments = lambda start_dt, end_dt: [{"file_path": "seg.mp4"}]
+
+    def run_job(job, segments, start_dt, end_dt, output_file):
+        handler.cuts.append(output_file.name)
+        handler.release.wait(5)
+        output_file.write_bytes(b"clip")
+        handler.store.add(output_file.name)
+        job.update(state="ready", percent=100)
+    handler._run_job = run_job
+    yield handler
+    handler.release.set()
+    handler.pool.shutdown()
+
+
+def clip_params(start="2026-01-01T10:00:00", end="2026-01-01T10:00:20"):
+    return {"cam": ["1"], "start": [start], "end": [end]}
+
+
+def test_concurrent_requests_for_one_clip_share_a_cut(submitter):
+    job = submitter._submit_clip(clip_params())
+    assert submitter._submit_clip(clip_params()) is job
+    assert submitter.store.stats()["coalesced"] == 1
+
+    # The only worker is busy and there is no queue
+    with pytest.raises(ClipRequestError) as err:
+        submitter._submit_clip(clip_params(end="2026-01-01T10:00:30"))
+    assert err.value.code == 503 and err.value.retry_after > 0
+
+    submitter.release.set()
+    deadline = time.monotonic() + 5
+    while not job.finished and time.monotonic() < deadline:
+        job.wait_for_change(job.version, timeout=0.1)
+    assert job.state == "ready"
+
+    # Cut once; the next request is a cache hit
+    cached = submitter._submit_clip(clip_params())
+    assert cached is not job and cached.state == "ready"
+    assert len(submitter.cuts) == 1
+    assert submitter.store.stats()["hits"] == 1
+
+
+def test_submit_rejects_bad_ranges(submitter):
+    for params in ({"cam": ["1"]}, clip_params(end="2026-01-01T09:59:00"),
+                   clip_params(end="2026-01-01T10:30:00")):
+        with pytest.raises(ClipRequestError) as err:
+            submitter._submit_clip(params)
+        assert err.value.code == 400
+
+
+# ── clip store ────────────────────────────────────────────────
+
+
+def put_clip(directory, name, size, atime):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (atime, atime))
+    return path
+
+
+def test_store_evicts_least_recently_used_over_quota(tmp_path):
+    now = time.time()
+    for i, name in enumerate(["a.mp4", "b.mp4", "c.mp4"]):
+        put_clip(tmp_path, name, 100, now - 300 + i * 10)
+    (tmp_path / "d.mp4.part").write_bytes(b"partial")
+    store = ClipStore(tmp_path, 350)
+    assert not (tmp_path / "d.mp4.part").exists()
+    assert store.stats()["clipCount"] == 3
+
+    # Access order survives: "a" was used last, so "b" is the oldest now
+    assert store.lookup("a.mp4") == tmp_path / "a.mp4"
+    put_clip(tmp_path, "e.mp4", 100, now)
+    store.add("e.mp4")
+    assert not (tmp_path / "b.mp4").exists()
+    assert sorted(p.name for p in tmp_path.glob("*.mp4")) == ["a.mp4", "c.mp4", "e.mp4"]
+    assert store.stats()["evictions"] == 1
+
+    # touch() refreshes "c" without counting a lookup; "a" goes next
+    assert store.touch("c.mp4")
+    put_clip(tmp_path, "f.mp4", 100, now)
+    store.add("f.mp4")
+    assert not (tmp_path / "a.mp4").exists()
+
+    # A new clip bigger than the quota is still kept on its own
+    put_clip(tmp_path, "big.mp4", 1000, now)
+    store.add("big.mp4")
+    assert [p.name for p in tmp_path.glob("*.mp4")] == ["big.mp4"]
+
+
+def test_store_lookup_counts_hits_and_misses(tmp_path):
+    put_clip(tmp_path, "a.mp4", 10, time.time())
+    store = ClipStore(tmp_path, 1000)
+    assert store.lookup("a.mp4") is not None
+    assert store.lookup("missing.mp4") is None
+    # Deleted behind the store's back: a miss, and forgotten
+    (tmp_path / "a.mp4").unlink()
+    assert store.lookup("a.mp4") is None
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["hitRatio"], stats["clipCount"]) == (1, 2, 0.333, 0)
+    assert not store.touch("a.mp4")
+
+
+def test_store_sweep_drops_clips_not_accessed_recently(tmp_path):
+    now = time.time()
+    put_clip(tmp_path, "old.mp4", 10, now - 7200)
+    put_clip(tmp_path, "new.mp4", 10, now - 60)
+    store = ClipStore(tmp_path, 1000, max_age_sec=3600)
+    store.sweep()
+    assert [p.name for p in tmp_path.glob("*.mp4")] == ["new.mp4"]
+    assert store.stats()["clipCount"] == 1
+
+
+# ── QR images ─────────────────────────────────────────────────
+
+# 3x3 stand-in for a QR matrix (True = dark)
+MATRIX = [[True, False, True], [False, True, False], [True, True, False]]
+
+
+def read_png(data):
+    """(width, height, rows of 0/1 with 1 = dark) of a 1-bit grayscale PNG"""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, tag = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(tag + body)
+        chunks[tag] = body
+        pos += 12 + length
+    width, height, depth, color = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color) == (1, 0)
+    raw = zlib.decompress(chunks[b"IDAT"])
+    stride = 1 + (width + 7) // 8
+    rows = []
+    for y in range(height):
+        line = raw[y * stride:(y + 1) * stride]
+        assert line[0] == 0
+        bits = "".join(f"{b:08b}" for b in line[1:])[:width]
+        rows.append([1 - int(bit) for bit in bits])
+    return width, height, rows
+
+
+def test_qr_png_draws_the_module_matrix():
+    width, height, rows = read_png(QrCache._render_png(MATRIX, 3))
+    assert (width, height) == (9, 9)
+    for y in range(9):
+        assert rows[y] == [int(MATRIX[y // 3][x // 3]) for x in range(9)]
+
+
+def test_qr_svg_draws_the_module_matrix():
+    svg = QrCache._render_svg(MATRIX, 4).decode()
+    assert 'width="12" height="12" viewBox="0 0 3 3"' in svg
+    assert svg.count("h1v1h-1z") == 5
+    assert "M0 0h1v1h-1z" in svg and "M1 0h1" not in svg
+
+
+def test_qr_cache_renders_once_per_key(monkeypatch):
+    rendered = []
+    monkeypatch.setattr(QrCache, "_matrix", staticmethod(lambda url: rendered.append(url) or MATRIX))
+    cache = QrCache(max_entries=2)
+    png = cache.get("http://a", 0, "png")
+    assert png[1] == "image/png" and png[2].startswith('"')
+    assert cache.get("http://a", 0, "png") is png
+    assert read_png(png[0])[0] == 3 * clip_server.QR_DEFAULT_BOX
+    # size picks the module box; format and size are part of the key
+    assert read_png(cache.get("http://a", 30, "png")[0])[0] == 30
+    assert cache.get("http://a", 0, "svg")[1] == "image/svg+xml"
+    assert rendered == ["http://a"] * 3
+    # Oldest entry evicted beyond max_entries
+    cache.get("http://a", 0, "png")
+    assert rendered == ["http://a"] * 4
+
+
+@pytest.mark.skipif(not clip_server.HAS_QRCODE, reason="qrcode not installed")
+def test_qr_cache_with_qrcode():
+    data, content_type, _ = QrCache().get("http://192.168.1.2:8580/job/abc", 0, "png")
+    width, height, rows = read_png(data)
+    assert width == height and content_type == "image/png"
+    # Quiet zone (border=2) is white
+    assert not any(rows[0])
+
+
+# ── concat list ───────────────────────────────────────────────
+
+T0 = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def seg(path, start_sec, length=60):
+    return {"file_path": path, "seg_start": T0 + timedelta(seconds=start_sec),
+            "seg_end": T0 + timedelta(seconds=start_sec + length)}
+
+
+def concat_lines(tmp_path, segments, start_sec, end_sec, keyframes):
+    """Write the concat list with _probe_keyframes stubbed to {path: (start_time, keyframes)}"""
+    handler = ClipHandler.__new__(ClipHandler)
+    probed = []
+    handler._probe_keyframes = lambda path: probed.append(path) or keyframes.get(path, (0.0, []))
+    concat_file = tmp_path / "concat.txt"
+    duration = handler._write_concat_list(segments, T0 + timedelta(seconds=start_sec),
+                                          T0 + timedelta(seconds=end_sec), concat_file)
+    return concat_file.read_text().splitlines(), round(duration, 3), probed
+
+
+def test_concat_snaps_to_keyframes_around_the_range(tmp_path):
+    segments = [seg("/rec/a.mp4", 0), seg("/rec/b.mp4", 60), seg("/rec/c.mp4", 120)]
+    keyframes = {"/rec/a.mp4": (0.0, [0.0, 10.0, 20.0, 30.0]),
+                 "/rec/c.mp4": (0.0, [0.0, 8.0, 16.0])}
+    lines, duration, probed = concat_lines(tmp_path, segments, 25, 130, keyframes)
+    assert lines == [
+        "file '/rec/a.mp4'", "inpoint 20.000",
+        "file '/rec/b.mp4'",
+        "file '/rec/c.mp4'", "outpoint 16.000",
+    ]
+    # Middle segments are never probed
+    assert probed == ["/rec/a.mp4", "/rec/c.mp4"]
+    assert duration == 40 + 60 + 16
+
+
+def test_concat_offsets_count_from_the_segment_start_time(tmp_path):
+    # Timestamps of the file start at 1.4s (e.g. an edit list or B-frame delay)
+    keyframes = {"/rec/a.mp4": (1.4, [1.4, 3.4, 5.4, 7.4])}
+    lines, duration, _ = concat_lines(tmp_path, [seg("/rec/a.mp4", 0)], 3, 5, keyframes)
+    assert lines == ["file '/rec/a.mp4'", "inpoint 3.400", "outpoint 7.400"]
+    assert duration == 4.0
+
+
+def test_concat_without_keyframes_or_past_the_last_one(tmp_path):
+    # No keyframe map: unsnapped times
+    lines, duration, _ = concat_lines(tmp_path, [seg("/rec/a.mp4", 0)], 12.5, 50, {})
+    assert lines == ["file '/rec/a.mp4'", "inpoint 12.500", "outpoint 50.000"]
+    assert duration == 37.5
+
+    # End after the last keyframe: copy to the end of the segment
+    keyframes = {"/rec/it's.mp4": (0.0, [0.0, 30.0])}
+    lines, duration, _ = concat_lines(tmp_path, [seg("/rec/it's.mp4", 0)], 0, 45, keyframes)
+    assert lines == ["file '/rec/it'\\''s.mp4'"]
+    assert duration == 60.0
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from core.dvr_catalog import DVRCatalog
+from core.dvr_resolver import DVRResolver
+
+SEG = 12
+
+
+def epoch(hhmmss: str) -> int:
+    return int(datetime.fromisoformat(f"2026-01-15T{hhmmss}").timestamp())
+
+
+def iso(hhmmss: str) -> str:
+    return f"2026-01-15T{hhmmss}"
+
+
+# Continuous from 10:59:24 across the hour boundary to 11:00:24, then a
+# deliberate gap until 11:01:00
+RECORDED = [
+    ("10", "10:59:24"), ("10", "10:59:36"), ("10", "10:59:48"),
+    ("11", "11:00:00"), ("11", "11:00:12"),
+    ("11", "11:01:00"), ("11", "11:01:12"),
+]
+
+
+def write_recordings(root, segments, missing=()):
+    """Lay out root/YYYY-MM-DD/HH/seg_*.mp4 plus index.jsonl; `missing` are indexed but not on disk"""
+    rows = {}
+    for n, (hh, t) in enumerate(list(segments) + list(missing)):
+        hdir = root / "2026-01-15" / hh
+        hdir.mkdir(parents=True, exist_ok=True)
+        name = f"seg_{n:05d}.mp4"
+        if (hh, t) not in missing:
+            (hdir / name).write_bytes(b"")
+        rows.setdefault(hh, []).append((name, epoch(t), SEG))
+    for hh, hour_rows in rows.items():
+        with open(root / "2026-01-15" / hh / "index.jsonl", "w") as f:
+            for name, start, seg_sec in hour_rows:
+                f.write(json.dumps({"file": name, "start": start, "segSec": seg_sec}) + "\n")
+    return rows
+
+
+def starts(result):
+    return [datetime.fromtimestamp(s.start).strftime("%H:%M:%S") for s in result.segments]
+
+
+def test_resolve_range_from_hour_indexes(tmp_path):
+    write_recordings(tmp_path, RECORDED, missing=[("11", "11:01:24")])
+    result = DVRResolver(str(tmp_path), seg_sec=SEG).resolve_range(iso("10:59:30"), iso("11:01:30"))
+
+    assert starts(result) == ["10:59:24", "10:59:36", "10:59:48", "11:00:00", "11:00:12", "11:01:00", "11:01:12"]
+    first, last = result.segments[0], result.segments[-1]
+    assert (first.in_offset_ms, first.out_offset_ms) == (6000, 12000)
+    assert (last.in_offset_ms, last.out_offset_ms) == (0, 12000)
+    assert all(s.file_path.endswith(".mp4") for s in result.segments)
+    # The recording gap, and the indexed segment whose file is gone
+    assert result.gaps == [(epoch("11:00:24"), epoch("11:01:00")), (epoch("11:01:24"), epoch("11:01:30"))]
+
+
+def test_coverage_from_hour_indexes(tmp_path):
+    write_recordings(tmp_path, RECORDED)
+    recorded, gaps = DVRResolver(str(tmp_path), seg_sec=SEG).coverage(iso("10:59:00"), iso("11:01:24"))
+
+    assert recorded == [(epoch("10:59:24"), epoch("11:00:24")), (epoch("11:01:00"), epoch("11:01:24"))]
+    assert gaps == [(epoch("10:59:00"), epoch("10:59:24")), (epoch("11:00:24"), epoch("11:01:00"))]
+
+
+def test_resolve_range_picks_up_appended_segments(tmp_path):
+    write_recordings(tmp_path, RECORDED[:3])
+    resolver = DVRResolver(str(tmp_path), seg_sec=SEG)
+    assert resolver.resolve_range(iso("10:59:30"), iso("11:00:24")).gaps == [(epoch("11:00:00"), epoch("11:00:24"))]
+
+    write_recordings(tmp_path, RECORDED)
+    result = resolver.resolve_range(iso("10:59:30"), iso("11:00:24"))
+    assert starts(result) == ["10:59:24", "10:59:36", "10:59:48", "11:00:00", "11:00:12"]
+    assert result.gaps == []
+
+
+@pytest.mark.parametrize("t0, t1, expected_gaps", [
+    ("10:59:30", "11:01:24", [("11:00:24", "11:01:00")]),
+    ("11:00:30", "11:00:50", [("11:00:30", "11:00:50")]),
+    ("11:00:13", "11:00:23", []),
+])
+def test_catalog_matches_hour_indexes(tmp_path, t0, t1, expected_gaps):
+    rows = write_recordings(tmp_path, RECORDED)
+    from_index = DVRResolver(str(tmp_path), seg_sec=SEG).resolve_range(iso(t0), iso(t1))
+
+    catalog = DVRCatalog(str(tmp_path))
+    for hh, hour_rows in rows.items():
+        catalog.add_segments(f"2026-01-15/{hh}", hour_rows)
+    from_catalog = DVRResolver(str(tmp_path), seg_sec=SEG).resolve_range(iso(t0), iso(t1))
+    catalog.close()
+
+    expected = [(epoch(a), epoch(b)) for a, b in expected_gaps]
+    assert from_index.gaps == from_catalog.gaps == expected
+    assert from_index.segments == from_catalog.segments
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import dvr_retention
+from core.dvr_catalog import DVRCatalog
+from dvr_indexer import write_index_atomic
+from dvr_retention import Retention
+
+DAY = "2026-01-15"
+SEG = 600
+
+
+def at(hhmm: str) -> int:
+    return int(datetime.fromisoformat(f"{DAY}T{hhmm}").timestamp())
+
+
+NOW = at("12:30")
+
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    """Six 10-minute segments per hour from 06:00 to 12:00, indexed and cataloged"""
+    root = tmp_path / "recordings"
+    runtime = tmp_path / "runtime"
+    runtime.mkdir()
+    catalog = DVRCatalog(str(root))
+    for hh in range(6, 13):
+        hdir = root / DAY / f"{hh:02d}"
+        hdir.mkdir(parents=True)
+        rows = []
+        for n in range(6):
+            name = f"seg_{hh:02d}{n}.mp4"
+            (hdir / name).write_bytes(b"\0" * 16)
+            rows.append((name, at(f"{hh:02d}:{n}0"), SEG))
+        write_index_atomic(hdir / "index.jsonl", rows)
+        catalog.add_segments(f"{DAY}/{hh:02d}", rows)
+    catalog.close()
+
+    # A finished match at 07:20-07:40 and one running since 12:05
+    (runtime / "match_windows.json").write_text(json.dumps([[at("07:20"), at("07:40")]]))
+    (runtime / "match_start_times.json").write_text(json.dumps({"42": at("12:05")}))
+    monkeypatch.setattr(dvr_retention, "RUNTIME_DIR", runtime)
+    monkeypatch.setattr(dvr_retention.time, "time", lambda: NOW)
+    return root
+
+
+def hours_on_disk(root):
+    return sorted(p.name for p in (root / DAY).iterdir())
+
+
+def use_disk(monkeypatch, base, per_hour):
+    """Fake disk usage growing with the number of hour directories left"""
+    monkeypatch.setattr(
+        dvr_retention, "disk_used_pct",
+        lambda root: base + per_hour * len(list(root.glob("????-??-??/??"))),
+    )
+
+
+def test_age_pass_keeps_match_hours_and_trims_boundary(recordings, monkeypatch):
+    use_disk(monkeypatch, 10, 0)
+    retention = Retention(recordings, max_hours=3, high_pct=90, low_pct=80, protect_hours=48)
+    retention.run_once()
+
+    # Cutoff 09:30: 06 and 08 are gone, 07 overlaps a match and is kept whole
+    assert hours_on_disk(recordings) == ["07", "09", "10", "11", "12"]
+    assert len(list((recordings / DAY / "07").glob("seg_*.mp4"))) == 6
+
+    # Boundary hour: segments that ended before 09:30 are dropped, file and index alike
+    boundary = recordings / DAY / "09"
+    kept = ["seg_092.mp4", "seg_093.mp4", "seg_094.mp4", "seg_095.mp4"]
+    assert sorted(p.name for p in boundary.glob("seg_*.mp4")) == kept
+    index = [json.loads(ln)["file"] for ln in (boundary / "index.jsonl").read_text().splitlines()]
+    assert index == kept
+
+    catalog = DVRCatalog(str(recordings))
+    assert catalog.hours() == [f"{DAY}/{hh}" for hh in ("07", "09", "10", "11", "12")]
+    assert sorted(catalog.files_in_hour(f"{DAY}/09")) == kept
+    catalog.close()
+
+
+def test_watermark_deletes_oldest_ordinary_hours_down_to_low(recordings, monkeypatch):
+    use_disk(monkeypatch, 40, 10)   # 7 hours -> 110%
+    Retention(recordings, max_hours=24, high_pct=90, low_pct=80, protect_hours=48).run_once()
+
+    # 06, 08 and 09 go (110 -> 80%), the match hour 07 is skipped
+    assert hours_on_disk(recordings) == ["07", "10", "11", "12"]
+
+
+def test_watermark_sacrifices_match_hours_last_and_spares_active_hour(recordings, monkeypatch, capsys):
+    use_disk(monkeypatch, 40, 10)
+    Retention(recordings, max_hours=24, high_pct=90, low_pct=10, protect_hours=48).run_once()
+
+    # The hour still being recorded is never deleted
+    assert hours_on_disk(recordings) == ["12"]
+    # 07 (finished match) and 11 (padding of the match running since 12:05) go last
+    deleted = [ln.split()[2] for ln in capsys.readouterr().out.splitlines() if "Deleting" in ln]
+    assert deleted == [f"{DAY}/{hh}" for hh in ("06", "08", "09", "10", "07", "11")]
+
+
+def test_below_high_watermark_nothing_is_deleted(recordings, monkeypatch):
+    use_disk(monkeypatch, 80, 1)
+    Retention(recordings, max_hours=24, high_pct=90, low_pct=80, protect_hours=48).run_once()
+    assert hours_on_disk(recordings) == ["06", "07", "08", "09", "10", "11", "12"]
+
+
+def test_dry_run_deletes_nothing(recordings, monkeypatch):
+    use_disk(monkeypatch, 40, 10)
+    Retention(recordings, max_hours=3, high_pct=90, low_pct=80, protect_hours=48, dry_run=True).run_once()
+    assert hours_on_disk(recordings) == ["06", "07", "08", "09", "10", "11", "12"]
+    assert len(list((recordings / DAY / "09").glob("seg_*.mp4"))) == 6
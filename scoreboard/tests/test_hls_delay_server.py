@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import hls_delay_server
+from hls_delay_server import DelayedHLSHandler, SegmentRing
+
+SEG = 2.0
+NOW = 1_800_000_000.0
+
+
+def seg_name(num: int) -> str:
+    return f"segment{num:05d}.ts"
+
+
+def write_segment(hls_dir, num, arrived, data=None):
+    """A finished segment whose mtime (its arrival) is `arrived`"""
+    path = hls_dir / seg_name(num)
+    path.write_bytes(data if data is not None else bytes([num % 256]) * 188)
+    os.utime(path, (arrived, arrived))
+    return path
+
+
+def write_playlist(hls_dir, nums, duration=SEG):
+    """hlssink's raw playlist listing `nums`"""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(duration)}",
+             f"#EXT-X-MEDIA-SEQUENCE:{nums[0]}"]
+    for n in nums:
+        lines += [f"#EXTINF:{duration:.6f},", seg_name(n)]
+    tmp = hls_dir / "playlist.m3u8.tmp"
+    tmp.write_text("\n".join(lines) + "\n")
+    tmp.replace(hls_dir / "playlist.m3u8")
+
+
+def listed(playlist):
+    return [ln for ln in playlist.splitlines() if ln.endswith(".ts")]
+
+
+def header(playlist, tag):
+    return next((ln.split(":", 1)[1] for ln in playlist.splitlines() if ln.startswith(tag + ":")), None)
+
+
+@pytest.fixture
+def hls_dir(tmp_path):
+    """Segments 0..5 finished every 2s up to NOW, hlssink listing the last three"""
+    for n in range(6):
+        write_segment(tmp_path, n, NOW - (5 - n) * SEG)
+    write_playlist(tmp_path, [3, 4, 5])
+    return tmp_path
+
+
+@pytest.fixture
+def live_dir(tmp_path, monkeypatch):
+    """Like hls_dir but finished on the real clock, for tests that wait; poll mode"""
+    monkeypatch.setattr(hls_delay_server, "POLL_INTERVAL_SEC", 0.05)
+    now = time.time()
+    for n in range(6):
+        write_segment(tmp_path, n, now - (5 - n) * SEG)
+    write_playlist(tmp_path, [3, 4, 5])
+    return tmp_path
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start the HTTP server on a ring; returns a GET helper giving (status, body)"""
+    servers = []
+
+    def start(ring, max_delay=60):
+        monkeypatch.setattr(DelayedHLSHandler, "ring", ring)
+        monkeypatch.setattr(DelayedHLSHandler, "hls_dir", str(ring.hls_dir))
+        monkeypatch.setattr(DelayedHLSHandler, "delay_seconds", ring.delay_seconds)
+        monkeypatch.setattr(DelayedHLSHandler, "max_delay", max_delay)
+        monkeypatch.setattr(DelayedHLSHandler, "log_message", lambda *a: None)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), DelayedHLSHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        def get(path):
+            try:
+                with urllib.request.urlopen(base + path, timeout=10) as resp:
+                    return resp.status, resp.read().decode()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read().decode()
+        return get
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_in_progress_segment_is_not_published_or_cached(hls_dir):
+    partial = b"\x47" * 100
+    (hls_dir / seg_name(6)).write_bytes(partial)
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+
+    assert listed(ring.playlist(now=NOW + 1, delay=0))[-1] == seg_name(5)
+    assert ring.get_segment(seg_name(6)) is None
+
+    # hlssink finishes it and lists it: the full file is served, not the early read
+    full = write_segment(hls_dir, 6, NOW + 2, partial * 4)
+    write_playlist(hls_dir, [4, 5, 6])
+    ring.load()
+    assert listed(ring.playlist(now=NOW + 3, delay=0))[-1] == seg_name(6)
+    assert ring.get_segment(seg_name(6)) == full.read_bytes()
+
+
+def test_closed_segment_is_admitted_before_it_is_listed(hls_dir):
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+    write_segment(hls_dir, 6, NOW + 2)
+    ring.segment_closed(seg_name(6))
+    assert seg_name(6) in listed(ring.playlist(delay=0))
+
+    # A reload (IN_Q_OVERFLOW, poll mode) keeps it, and does not pick up the next one in progress
+    (hls_dir / seg_name(7)).write_bytes(b"\x47" * 10)
+    ring.load()
+    assert listed(ring.playlist(delay=0))[-1] == seg_name(6)
+
+
+def test_changed_segment_file_drops_cached_bytes(hls_dir):
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+    assert ring.get_segment(seg_name(5)) == bytes([5]) * 188
+
+    # Rewritten with another size (e.g. hlssink restarted its numbering)
+    write_segment(hls_dir, 5, NOW + 10, b"\x47" * 376)
+    ring.load()
+    assert ring.get_segment(seg_name(5)) == b"\x47" * 376
+
+
+def test_poll_mode_prefetches_due_segments(hls_dir, monkeypatch):
+    monkeypatch.setattr(hls_delay_server, "POLL_INTERVAL_SEC", 0)
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+    ring.playlist(delay=0)
+    assert ring.stats()["cached"] == 0
+
+    write_segment(hls_dir, 6, time.time())
+    write_playlist(hls_dir, [4, 5, 6])
+    ring.playlist(delay=0)
+    assert ring.stats()["cached"] >= 3
+    assert not ring.stats()["watching"]
+
+
+def test_discontinuity_sequence_survives_the_tagged_segment_sliding_out(hls_dir):
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+    assert header(ring.playlist(now=NOW, delay=0), "#EXT-X-DISCONTINUITY-SEQUENCE") == "0"
+
+    # The relay restarted: numbering jumps from 5 to 10
+    for n in (10, 11, 12):
+        write_segment(hls_dir, n, NOW + (n - 9) * SEG)
+    write_playlist(hls_dir, [10, 11, 12])
+    ring.reload_playlist()
+    text = ring.playlist(now=NOW + 2.5, delay=0)
+    assert listed(text) == [seg_name(4), seg_name(5), seg_name(10)]
+    assert "#EXT-X-DISCONTINUITY\n#EXT-X-PROGRAM-DATE-TIME" in text
+    assert header(text, "#EXT-X-DISCONTINUITY-SEQUENCE") == "0"
+
+    # Once segment 5 is out of the window the tag is gone and the sequence counts it
+    text = ring.playlist(now=NOW + 100, delay=0)
+    assert listed(text) == [seg_name(10), seg_name(11), seg_name(12)]
+    assert "#EXT-X-DISCONTINUITY\n" not in text
+    assert header(text, "#EXT-X-DISCONTINUITY-SEQUENCE") == "1"
+
+    # Evicting the old segments from the ring does not renumber
+    for n in range(6):
+        (hls_dir / seg_name(n)).unlink()
+        ring.remove_segment(seg_name(n))
+    ring.load()
+    assert header(ring.playlist(now=NOW + 100, delay=0), "#EXT-X-DISCONTINUITY-SEQUENCE") == "1"
+
+
+def test_blocking_reload_waits_for_the_next_segment(live_dir):
+    ring = SegmentRing(str(live_dir), 0)
+    ring.load()
+    assert ring.wait_for_msn(5, delay=0, timeout=1) is True
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(ring.wait_for_msn(6, delay=0, timeout=5)))
+    started = time.monotonic()
+    waiter.start()
+    time.sleep(0.3)
+    assert waiter.is_alive()
+
+    write_segment(live_dir, 6, time.time())
+    write_playlist(live_dir, [4, 5, 6])
+    waiter.join(5)
+    assert result == [True]
+    assert 0.3 <= time.monotonic() - started < 2
+    assert listed(ring.playlist(delay=0))[-1] == seg_name(6)
+
+
+def test_blocking_reload_times_out_or_rejects_far_ahead(live_dir):
+    ring = SegmentRing(str(live_dir), 0)
+    ring.load()
+    started = time.monotonic()
+    assert ring.wait_for_msn(6, delay=0, timeout=0.2) is False
+    assert time.monotonic() - started >= 0.2
+    assert ring.wait_for_msn(8, delay=0, timeout=5) is None
+
+
+def test_blocking_reload_over_http(live_dir, serve):
+    ring = SegmentRing(str(live_dir), 0)
+    ring.load()
+    get = serve(ring)
+
+    status, text = get("/playlist.m3u8?delay=0")
+    assert status == 200
+    assert header(text, "#EXT-X-VERSION") == "9"
+    assert "#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES" in text.splitlines()
+
+    result = []
+    client = threading.Thread(target=lambda: result.append(get("/playlist.m3u8?delay=0&_HLS_msn=6")))
+    client.start()
+    time.sleep(0.3)
+    assert client.is_alive()
+    write_segment(live_dir, 6, time.time())
+    write_playlist(live_dir, [4, 5, 6])
+    client.join(5)
+    status, text = result[0]
+    assert status == 200 and listed(text)[-1] == seg_name(6)
+
+    assert get("/playlist.m3u8?_HLS_msn=99")[0] == 400
+    assert get("/playlist.m3u8?_HLS_msn=x")[0] == 400
+    assert get("/playlist.m3u8?_HLS_part=0")[0] == 400
+
+
+def test_window_ends_at_newest_segment_old_enough_for_the_delay(hls_dir):
+    ring = SegmentRing(str(hls_dir), 4)
+    ring.load()
+    # Segment 3 finished at NOW-4, segment 4 at NOW-2
+    assert listed(ring.playlist(now=NOW)) == [seg_name(1), seg_name(2), seg_name(3)]
+    assert listed(ring.playlist(now=NOW - 0.1)) == [seg_name(0), seg_name(1), seg_name(2)]
+    assert listed(ring.playlist(now=NOW + 2)) == [seg_name(2), seg_name(3), seg_name(4)]
+    # Other delays are cut from the same segments
+    assert listed(ring.playlist(now=NOW, delay=0))[-1] == seg_name(5)
+    assert listed(ring.playlist(now=NOW, delay=9.9)) == [seg_name(0)]
+    assert listed(ring.playlist(now=NOW, delay=10.1)) == []
+
+
+def test_delay_parameter_bounds(hls_dir, serve):
+    ring = SegmentRing(str(hls_dir), 0)
+    ring.load()
+    get = serve(ring, max_delay=30)
+    assert get("/playlist.m3u8?delay=0")[0] == 200
+    assert get("/playlist.m3u8?delay=30")[0] == 200
+    assert get("/playlist.m3u8?delay=30.5")[0] == 400
+    assert get("/playlist.m3u8?delay=-1")[0] == 400
+    assert get("/playlist.m3u8?delay=abc")[0] == 400
+
+
+def test_media_sequence_is_monotonic_under_eviction(hls_dir):
+    ring = SegmentRing(str(hls_dir), 6)
+    ring.load()
+    seqs = []
+
+    def check(now):
+        seq = int(header(ring.playlist(now=now), "#EXT-X-MEDIA-SEQUENCE"))
+        assert not seqs or seq >= seqs[-1], (seqs, seq)
+        seqs.append(seq)
+
+    check(NOW)
+    # hlssink keeps writing and deletes the oldest segment each time
+    for n in range(6, 12):
+        write_segment(hls_dir, n, NOW + (n - 5) * SEG)
+        write_playlist(hls_dir, [n - 2, n - 1, n])
+        (hls_dir / seg_name(n - 6)).unlink()
+        ring.remove_segment(seg_name(n - 6))
+        ring.reload_playlist()
+        check(NOW + (n - 5) * SEG - 0.5)
+        check(NOW + (n - 5) * SEG)
+
+    # A stall evicts everything the delayed window still points at
+    for n in range(6, 10):
+        (hls_dir / seg_name(n)).unlink()
+        ring.remove_segment(seg_name(n))
+    check(NOW + 12)
+    assert listed(ring.playlist(now=NOW + 12)) == []
+    check(NOW + 16)
+    assert seqs[-1] >= seqs[0] + 4
@@ -0,0 +1,113 @@
+import struct
+
+import pytest
+
+from core.mp4_info import probe, probe_duration
+
+MEDIA_TIMESCALE = 90000
+FRAME = 3600        # 25 fps at 90 kHz
+FRAMES = 100        # 4 seconds
+GOP = 25            # one keyframe per second
+
+
+def box(btype: bytes, *payload: bytes) -> bytes:
+    body = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(body), btype) + body
+
+
+def full_box(btype: bytes, version: int, payload: bytes) -> bytes:
+    return box(btype, struct.pack(">B3x", version), payload)
+
+
+def table(btype: bytes, fmt: str, rows, version: int = 0) -> bytes:
+    return full_box(btype, version, struct.pack(">I", len(rows)) + b"".join(struct.pack(">" + fmt, *r) for r in rows))
+
+
+def header_box(btype: bytes, version: int, timescale: int, duration: int) -> bytes:
+    if version == 1:
+        return full_box(btype, 1, struct.pack(">QQIQ", 0, 0, timescale, duration))
+    return full_box(btype, 0, struct.pack(">IIII", 0, 0, timescale, duration))
+
+
+def make_mp4(path, version=0, movie_duration_ms=4000, ctts=None, elst=None, stss=True):
+    """Write a tiny MP4: ftyp, an mdat placeholder and a moov with one video track"""
+    stbl = [table(b"stts", "II", [(FRAMES, FRAME)])]
+    if ctts:
+        stbl.append(table(b"ctts", "II", ctts))
+    if stss:
+        stbl.append(table(b"stss", "I", [(n,) for n in range(1, FRAMES + 1, GOP)]))
+    mdia = box(
+        b"mdia",
+        header_box(b"mdhd", version, MEDIA_TIMESCALE, FRAMES * FRAME),
+        full_box(b"hdlr", 0, struct.pack(">I4s12x", 0, b"vide") + b"\0"),
+        box(b"minf", box(b"stbl", *stbl)),
+    )
+    trak = [mdia]
+    if elst:
+        fmt = "QqI" if version == 1 else "IiI"
+        trak.insert(0, box(b"edts", table(b"elst", fmt, elst, version=version)))
+    moov = box(b"moov", header_box(b"mvhd", version, 1000, movie_duration_ms), box(b"trak", *trak))
+    with open(path, "wb") as f:
+        f.write(box(b"ftyp", b"isom", struct.pack(">I", 512), b"isomavc1"))
+        f.write(box(b"mdat", b"\0" * 64))
+        f.write(moov)
+    return str(path)
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_duration_and_keyframes(tmp_path, version):
+    path = make_mp4(tmp_path / "seg.mp4", version=version)
+
+    info = probe(path, keyframes=True)
+    assert info.duration == pytest.approx(4.0)
+    assert info.first_sample == 0.0
+    assert info.last_sample_end == pytest.approx(4.0)
+    assert info.keyframes == pytest.approx([0.0, 1.0, 2.0, 3.0])
+    assert probe_duration(path) == pytest.approx(4.0)
+
+
+def test_keyframes_only_when_asked(tmp_path):
+    info = probe(make_mp4(tmp_path / "seg.mp4"))
+    assert info.keyframes == []
+
+
+def test_every_sample_is_sync_without_stss(tmp_path):
+    info = probe(make_mp4(tmp_path / "seg.mp4", stss=False), keyframes=True)
+    assert len(info.keyframes) == FRAMES
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_composition_offset_and_edit_list_shift(tmp_path, version):
+    # B-frame style one-frame composition delay, removed again by the edit list;
+    # the leading empty edit (media_time -1) must be skipped
+    path = make_mp4(
+        tmp_path / "seg.mp4",
+        version=version,
+        ctts=[(FRAMES, FRAME)],
+        elst=[(0, -1, 0x10000), (4000, FRAME, 0x10000)],
+    )
+    info = probe(path, keyframes=True)
+    assert info.first_sample == 0.0
+    assert info.last_sample_end == pytest.approx(4.0)
+    assert info.keyframes == pytest.approx([0.0, 1.0, 2.0, 3.0])
+
+
+def test_unshifted_composition_offset(tmp_path):
+    info = probe(make_mp4(tmp_path / "seg.mp4", ctts=[(FRAMES, FRAME)]), keyframes=True)
+    assert info.first_sample == pytest.approx(FRAME / MEDIA_TIMESCALE)
+    assert info.keyframes[0] == pytest.approx(0.04)
+
+
+def test_unusable_files(tmp_path):
+    # Fragmented output carries an empty moov (zero duration)
+    assert probe(make_mp4(tmp_path / "frag.mp4", movie_duration_ms=0)) is None
+
+    no_moov = tmp_path / "recording.mp4"
+    no_moov.write_bytes(box(b"ftyp", b"isom\0\0\0\0") + box(b"mdat", b"\0" * 32))
+    assert probe(str(no_moov)) is None
+
+    truncated = tmp_path / "truncated.mp4"
+    truncated.write_bytes(open(make_mp4(tmp_path / "whole.mp4"), "rb").read()[:-20])
+    assert probe(str(truncated)) is None
+
+    assert probe_duration(str(tmp_path / "missing.mp4")) is None